@@ -1,10 +1,70 @@
+import base64
 import json
+import math
+from contextlib import contextmanager
 import uuid
 import os
-from typing import Optional, Dict, Any, List
-from base_dir import ALL_GAMES_METADATA
+from bisect import bisect_right
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional, Dict, Any, List
+from base_dir import ALL_GAMES_METADATA, ALL_GAMES_DB_PATH
+from search_index import index_game, init_search_index, remove_game, search_ids
 
 
+# 게임 메타데이터 저장소 (SQLite, WAL)
+# 원본 메타데이터는 data 컬럼에 JSON 그대로 저장하고, 검색/정렬에 쓰는 필드만 따로 컬럼으로 뽑아 인덱스를 둡니다.
+# rowid 가 추가된 순서이므로, 목록은 예전 JSON 파일과 같은 순서로 반환됩니다.
+# trend_score 는 trend_at 시각 기준으로 감쇠된 트렌딩 점수입니다. (NULL 이면 plays/likes 를 trend_at 시각의 이벤트로 봅니다)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id TEXT PRIMARY KEY,
+    game_title TEXT,
+    author TEXT,
+    category TEXT COLLATE NOCASE,
+    plays INTEGER NOT NULL DEFAULT 0,
+    likes INTEGER NOT NULL DEFAULT 0,
+    trend_score REAL,
+    trend_at REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_games_category ON games(category);
+CREATE INDEX IF NOT EXISTS idx_games_author ON games(author);
+CREATE INDEX IF NOT EXISTS idx_games_plays ON games(plays);
+CREATE INDEX IF NOT EXISTS idx_games_likes ON games(likes);
+"""
+
+_initialized = False
+_init_lock = threading.Lock()
+
+# list_metadata 의 정렬 순서. 모두 마지막에 저장 순서(rowid)로 동점을 가르므로 순서가 항상 같습니다.
+SORT_ORDERS = ("default", "newest", "plays", "likes", "title")
+# 정렬/필터별 인덱스 캐시 최대 개수 (작성자별 목록이 많아져도 메모리가 계속 늘지 않도록)
+_SORTED_CACHE_MAX = 256
+
+
+def _connect(check_same_thread: bool = True) -> sqlite3.Connection:
+    """메타데이터 DB 연결을 엽니다. 여러 uvicorn 워커가 공유하므로 WAL 모드를 사용합니다."""
+    global _initialized
+    db_path = ALL_GAMES_DB_PATH()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 30000")
+    if not _initialized:
+        # 여러 스레드가 처음 동시에 연결해도 스키마 생성/이전은 한 번만 합니다.
+        with _init_lock:
+            if not _initialized:
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.executescript(_SCHEMA)
+                _add_trend_columns(conn)
+                init_search_index(conn)
+                _migrate_json(conn)
+                _backfill_search_index(conn)
+                _initialized = True
+    return conn
+
 
 def _load_metadata(file_path: str) -> List[Dict[str, Any]]:
     """JSON 파일을 읽어 메타데이터 리스트를 반환합니다. 파일이 없으면 빈 리스트를 반환합니다."""
@@ -17,54 +77,343 @@ def _load_metadata(file_path: str) -> List[Dict[str, Any]]:
             return []
     return []
 
-def _save_metadata(file_path: str, data: List[Dict[str, Any]]):
-    """메타데이터 리스트를 JSON 파일에 저장합니다."""
+
+def _migrate_json(conn: sqlite3.Connection):
+    """
+    예전 all_games_metadata.json 을 DB 로 한 번 옮기고, 파일은 all_games_metadata.json.migrated 로 이름을 바꿉니다.
+    """
+    json_path = ALL_GAMES_METADATA()
+    if not json_path.exists():
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # 다른 워커가 먼저 옮겼으면 아무것도 하지 않습니다.
+        if not json_path.exists():
+            conn.execute("ROLLBACK")
+            return
+        entries = _load_metadata(json_path)
+        for entry in entries:
+            if not entry.get('id'):
+                entry['id'] = str(uuid.uuid4())
+            _upsert_row(conn, entry)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    json_path.replace(json_path.with_name(json_path.name + ".migrated"))
+    print(f"📦 {json_path} → {ALL_GAMES_DB_PATH().name} 이전 완료 ({len(entries)}개)")
+
+
+def _add_trend_columns(conn: sqlite3.Connection):
+    """
+    트렌딩 점수 컬럼이 생기기 전의 DB 에 컬럼을 추가합니다. 이미 쌓인 plays/likes 는 지금 시각의 이벤트로 한 번 반영되고,
+    그 뒤로는 반감기에 따라 줄어듭니다.
+    """
+    def has_columns():
+        return 'trend_at' in {row['name'] for row in conn.execute("PRAGMA table_info(games)")}
+
+    if has_columns():
+        return
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        with open(file_path, 'w', encoding='utf-8') as outfile:
-            json.dump(data, outfile, ensure_ascii=False, indent=4)
-        print(f"✅ 메타데이터 파일에 저장 완료: {file_path}")
-    except Exception as e:
-        print(f"❌ 최종 파일 저장 중 오류 발생: {e}")
+        # 다른 워커가 먼저 추가했으면 아무것도 하지 않습니다.
+        if not has_columns():
+            conn.execute("ALTER TABLE games ADD COLUMN trend_score REAL")
+            conn.execute("ALTER TABLE games ADD COLUMN trend_at REAL")
+            conn.execute("UPDATE games SET trend_at = ?", (time.time(),))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _backfill_search_index(conn: sqlite3.Connection):
+    """검색 색인이 생기기 전에 저장된 게임들을 한 번 색인합니다."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        missing = conn.execute(
+            "SELECT rowid, data FROM games WHERE rowid NOT IN (SELECT rowid FROM games_fts) ORDER BY rowid"
+        ).fetchall()
+        for row in missing:
+            index_game(conn, row['rowid'], json.loads(row['data']))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if missing:
+        print(f"🔎 검색 색인 생성: {len(missing)}개 게임")
+
+
+def _to_int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _upsert_row(conn: sqlite3.Connection, entry: Dict[str, Any]):
+    # 이미 있는 ID 는 내용만 교체하므로 목록에서의 위치(rowid)가 유지됩니다.
+    # 게임별 meta.json 에는 plays/likes 가 없으므로, 호출자가 직접 넘기지 않은 카운트는 DB 에 쌓인 값을 유지합니다.
+    # (SET 의 오른쪽에서 games.* 는 갱신 전 값입니다)
+    conn.execute(
+        """
+        INSERT INTO games (id, game_title, author, category, plays, likes, trend_at, data)
+        VALUES (:id, :game_title, :author, :category, :plays, :likes, :now, :data)
+        ON CONFLICT(id) DO UPDATE SET
+            game_title = excluded.game_title,
+            author = excluded.author,
+            category = excluded.category,
+            plays = CASE WHEN :has_plays THEN excluded.plays ELSE games.plays END,
+            likes = CASE WHEN :has_likes THEN excluded.likes ELSE games.likes END,
+            data = json_set(
+                excluded.data,
+                '$.plays', CASE WHEN :has_plays THEN excluded.plays ELSE games.plays END,
+                '$.likes', CASE WHEN :has_likes THEN excluded.likes ELSE games.likes END
+            )
+        """,
+        {
+            "id": entry['id'],
+            "game_title": entry.get('game_title'),
+            "author": entry.get('author'),
+            "category": entry.get('category', ''),
+            "plays": _to_int(entry.get('plays')),
+            "likes": _to_int(entry.get('likes')),
+            "has_plays": entry.get('plays') is not None,
+            "has_likes": entry.get('likes') is not None,
+            "now": time.time(),
+            "data": json.dumps(entry, ensure_ascii=False),
+        }
+    )
+    # 제목/설명이 바뀌었을 수 있으므로 검색 색인도 같이 교체합니다.
+    row = conn.execute("SELECT rowid, data, trend_score, trend_at FROM games WHERE id = ?", (entry['id'],)).fetchone()
+    index_game(conn, row['rowid'], entry)
+    return row['rowid'], json.loads(row['data']), _row_trend(row)
+
+
+def _rows_to_metadata(rows) -> List[Dict[str, Any]]:
+    return [json.loads(row['data']) for row in rows]
+
+
+def _row_trend(row) -> tuple:
+    return (row['trend_score'], row['trend_at'])
+
+
+def trend_score_at(trend: tuple, plays: int, likes: int, at: float, decay: float, weights: tuple) -> float:
+    """
+    저장된 트렌딩 점수 trend=(trend_score, trend_at) 를 시각 at 의 값으로 감쇠시킵니다. (decay: 초당 감쇠율 λ)
+    trend_score 가 NULL 이면 plays/likes 에 weights=(플레이 가중치, 좋아요 가중치) 를 곱한 값을 trend_at 의 점수로 씁니다.
+    """
+    score, since = trend
+    if score is None:
+        score = weights[0] * plays + weights[1] * likes
+    if since is None:
+        return score
+    return score * math.exp(-decay * (at - since))
+
+
+class CatalogState:
+    """
+    한 시점의 메타데이터 목록과 보조 인덱스. 다시 읽을 때는 새 객체로 통째로 바뀌므로 읽는 쪽은 잠금이 필요 없습니다.
+    position 은 games 테이블의 rowid 입니다. 다른 게임이 삭제되어도 바뀌지 않으므로 커서의 정렬 키로 쓸 수 있습니다.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], rowids: List[int], trends: List[tuple], generation: int = 0):
+        self.entries = entries
+        # 다른 프로세스의 커밋을 읽어 들일 때마다 올라가는 번호 (이 프로세스의 쓰기로는 바뀌지 않습니다)
+        self.generation = generation
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.position: Dict[str, int] = {}
+        # 게임별 (trend_score, trend_at). 메타데이터 JSON 에는 넣지 않습니다.
+        self.trend: Dict[str, tuple] = {}
+        self.by_category: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_author: Dict[str, List[Dict[str, Any]]] = {}
+        for rowid, trend, item in zip(rowids, trends, entries):
+            self.by_id[item.get('id')] = item
+            self.position[item.get('id')] = rowid
+            self.trend[item.get('id')] = trend
+            self.by_category.setdefault(str(item.get('category', '')).lower(), []).append(item)
+            self.by_author.setdefault(item.get('author'), []).append(item)
+        self._sorted: Dict[tuple, tuple] = {}
+
+    def replace_rows(self, rows: Dict[str, tuple]) -> 'CatalogState':
+        """
+        rows={game_id: (메타데이터, trend)} 의 게임만 바꾼 새 상태를 돌려줍니다. DB 와 JSON 을 다시 읽지 않고 인덱스만 다시 묶습니다.
+        """
+        entries, rowids, trends = [], [], []
+        for item in self.entries:
+            game_id = item.get('id')
+            entry, trend = rows.get(game_id, (item, self.trend[game_id]))
+            entries.append(entry)
+            rowids.append(self.position[game_id])
+            trends.append(trend)
+        return CatalogState(entries, rowids, trends, self.generation)
+
+    def _sort_key(self, sort: str, item: Dict[str, Any]) -> tuple:
+        position = self.position[item.get('id')]
+        if sort == "newest":
+            return (-position,)
+        if sort == "plays":
+            return (-_to_int(item.get('plays')), position)
+        if sort == "likes":
+            return (-_to_int(item.get('likes')), position)
+        if sort == "title":
+            return (str(item.get('game_title') or '').lower(), position)
+        return (position,)
+
+    def sorted_index(self, sort: str, category: Optional[str] = None, author: Optional[str] = None):
+        """
+        (정렬 키 리스트, 항목 리스트) 를 돌려줍니다. 필터/정렬 조합마다 처음 한 번만 만들고 이 상태 객체에 캐시합니다.
+        """
+        cache_key = (sort, category.lower() if category else None, author)
+        cached = self._sorted.get(cache_key)
+        if cached is not None:
+            return cached
+
+        if author is not None:
+            items = self.by_author.get(author, [])
+        elif category:
+            items = self.by_category.get(category.lower(), [])
+        else:
+            items = self.entries
+        pairs = sorted(((self._sort_key(sort, item), item) for item in items), key=lambda pair: pair[0])
+        cached = ([k for k, _ in pairs], [item for _, item in pairs])
+
+        if len(self._sorted) >= _SORTED_CACHE_MAX:
+            self._sorted.clear()
+        self._sorted[cache_key] = cached
+        return cached
+
+
+class MetadataCatalog:
+    """
+    프로세스 안에 한 번 읽어 둔 전체 메타데이터와 보조 인덱스(id, category, author)입니다.
+    조회할 때마다 PRAGMA data_version 으로 다른 연결(다른 uvicorn 워커 포함)의 커밋 여부만 확인하고,
+    바뀌었거나 이 모듈이 직접 쓴 뒤라면 다시 읽습니다. 그 외에는 디스크를 읽지 않고 메모리에서 바로 응답합니다.
+    이 프로세스의 쓰기는 모두 write() 로 카탈로그 연결을 통해 하므로, data_version 이 바뀌었다면 다른 프로세스가 쓴 것입니다.
+    CatalogState 의 dict 는 모든 요청이 공유하므로, 모듈의 공개 조회 함수는 얕은 복사본을 반환합니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._data_version = None
+        self._dirty = True
+        self._generation = 0
+        self._state = CatalogState([], [], [])
+
+    def _ensure_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # FastAPI 스레드 풀의 여러 스레드에서 쓰이므로 (항상 self._lock 안에서만 사용)
+            self._conn = _connect(check_same_thread=False)
+        return self._conn
+
+    def _check(self):
+        data_version = self._ensure_conn().execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._generation += 1
+            self._reload(data_version)
+        elif self._dirty:
+            self._reload(data_version)
+
+    def _reload(self, data_version):
+        # dirty 를 먼저 내려야, 다시 읽는 동안 들어온 쓰기가 다음 조회에서 반영됩니다.
+        self._dirty = False
+        self._data_version = data_version
+        rows = self._conn.execute("SELECT rowid, data, trend_score, trend_at FROM games ORDER BY rowid").fetchall()
+        self._state = CatalogState(
+            _rows_to_metadata(rows), [row['rowid'] for row in rows], [_row_trend(row) for row in rows], self._generation
+        )
+
+    @contextmanager
+    def write(self, invalidate: bool = True):
+        """
+        이 프로세스의 쓰기 트랜잭션 (BEGIN IMMEDIATE ~ COMMIT). 카탈로그 연결로 쓰므로 data_version 은 바뀌지 않고,
+        다음 조회에서 generation 을 올리지 않은 채 다시 읽습니다. (invalidate=False 면 다시 읽지 않습니다)
+        """
+        with self._lock:
+            conn = self._ensure_conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                # 트랜잭션 안에서 replace_rows() 로 메모리 상태를 바꿨을 수 있으므로 다시 읽습니다.
+                self._dirty = True
+                raise
+            finally:
+                if invalidate:
+                    self._dirty = True
+
+    def replace_rows(self, rows: Dict[str, tuple]):
+        """
+        write(invalidate=False) 안에서, 방금 쓴 행을 메모리 상태에만 바로 반영합니다. (rows={game_id: (메타데이터, trend)})
+        """
+        self._state = self._state.replace_rows(rows)
+
+    def snapshot(self) -> CatalogState:
+        """최신 상태를 확인한 뒤 현재 CatalogState 를 돌려줍니다."""
+        with self._lock:
+            self._check()
+            return self._state
+
+
+_catalog = MetadataCatalog()
+
+
+def get_catalog() -> MetadataCatalog:
+    return _catalog
+
+
+# 이 프로세스에서 게임 하나가 추가/수정/삭제될 때 부를 함수들 (ranking.py 가 해당 게임의 순위 키만 옮기는 데 사용)
+ChangeListener = Callable[[str, Optional[int], Optional[Dict[str, Any]], Optional[tuple], Optional[Dict[str, int]]], None]
+_change_listeners: List[ChangeListener] = []
+
+
+def add_change_listener(listener: ChangeListener):
+    """
+    쓰기가 커밋된 뒤 listener(game_id, rowid, 저장된 메타데이터, (trend_score, trend_at), flushed) 를 부릅니다.
+    삭제된 게임이면 rowid, 메타데이터, trend 가 None 입니다.
+    flushed 는 increment_counters 가 이번에 더한 {"plays": n, "likes": m} 이고, 그 외의 쓰기에서는 None 입니다.
+    다른 프로세스의 쓰기는 알리지 않으므로 CatalogState.generation 이 바뀌면 통째로 다시 읽어야 합니다.
+    """
+    _change_listeners.append(listener)
+
+
+def _notify(game_id: str, rowid: Optional[int], entry: Optional[Dict[str, Any]], trend: Optional[tuple],
+            flushed: Optional[Dict[str, int]] = None):
+    for listener in _change_listeners:
+        try:
+            listener(game_id, rowid, entry, trend, flushed)
+        except Exception as e:
+            print(f"❌ 메타데이터 변경 알림 처리 실패 (ID={game_id}): {e}")
 
 
 
 
-def upsert_metadata(new_entry: Dict[str, Any]) -> str:    
-    # 1. 파일에서 기존 메타데이터 불러오기
-    all_metadata = _load_metadata(ALL_GAMES_METADATA())
-    
-    # 2. 입력 데이터에서 ID 추출 및 처리
+def upsert_metadata(new_entry: Dict[str, Any]) -> str:
+    # 1. 입력 데이터에서 ID 추출 및 처리
     entry_id = new_entry.get('id')
-    
+
     # ID가 없는 경우, 새로 ID를 생성하고 추가 처리로 전환
     if not entry_id:
         entry_id = str(uuid.uuid4())
         new_entry['id'] = entry_id
-        
-    # 3. ID를 기준으로 기존 항목 검색
-    found_index = -1
-    for i, item in enumerate(all_metadata):
-        if item.get('id') == entry_id:
-            found_index = i
-            break
-            
-    # 4. 로직 분기 및 처리
-    if found_index != -1:
-        # --- UPDATE/REPLACE 로직 ---
-        # 기존 항목을 새 항목으로 완전히 교체합니다.
-        all_metadata[found_index] = new_entry
-        action = "업데이트/교체"
+
+    with _catalog.write() as conn:
+        # 2. ID를 기준으로 기존 항목 확인 (로그용)
+        exists = conn.execute("SELECT 1 FROM games WHERE id = ?", (entry_id,)).fetchone() is not None
+
+        # 3. 추가 또는 교체 (기존 항목은 새 항목으로 완전히 교체합니다.)
+        rowid, stored, trend = _upsert_row(conn, new_entry)
+    _notify(entry_id, rowid, stored, trend)
+
+    if exists:
         print(f"🔄 ID '{entry_id}' 항목을 성공적으로 교체했습니다.")
     else:
-        # --- INSERT/ADD 로직 ---
-        # 리스트의 끝에 새 항목을 추가합니다.
-        all_metadata.append(new_entry)
-        action = "추가"
         print(f"➕ ID '{entry_id}' 항목을 새로운 데이터로 추가했습니다.")
-        
-    # 5. 파일에 다시 저장
-    _save_metadata(ALL_GAMES_METADATA(), all_metadata)
-    
+
     return entry_id
 
 
@@ -72,23 +421,20 @@ def upsert_metadata(new_entry: Dict[str, Any]) -> str:
 
 def add_existing_metadata(new_entry: Dict[str, Any]) -> Dict[str, Any]:
     """
-    구성된 JSON 데이터를 받아서 파일을 읽고 바로 추가한 후 저장합니다.
-    (ID 생성이나 필드 유효성 검사는 수행하지 않습니다.)
-    """
-    
-    # 1. 파일에서 기존 메타데이터 불러오기
-    all_metadata = _load_metadata(ALL_GAMES_METADATA())
-    
-    # 2. 리스트에 새로운 데이터 추가 (입력받은 데이터를 그대로 사용)
-    all_metadata.append(new_entry)
-    
-    # 3. 파일에 다시 저장
-    _save_metadata(ALL_GAMES_METADATA(), all_metadata)
-    
-    # ID가 존재하는지 확인하고 출력
+    구성된 JSON 데이터를 받아서 바로 저장합니다.
+    (필드 유효성 검사는 수행하지 않습니다. ID 가 없으면 DB 키로 쓸 ID 만 새로 붙입니다.)
+    """
+    if not new_entry.get('id'):
+        new_entry['id'] = str(uuid.uuid4())
+
+    with _catalog.write() as conn:
+        rowid, stored, trend = _upsert_row(conn, new_entry)
+    _notify(new_entry['id'], rowid, stored, trend)
+
+    # ID 및 제목 출력
     entry_id = new_entry.get('id', 'ID_MISSING')
     entry_title = new_entry.get('game_title', 'TITLE_MISSING')
-    
+
     print(f"➕ JSON 데이터 추가 완료: ID={entry_id}, Title={entry_title}")
     return new_entry
 
@@ -96,78 +442,114 @@ def add_existing_metadata(new_entry: Dict[str, Any]) -> Dict[str, Any]:
 
 def add_new_game_metadata(game_title: str, author: str = "unknown", category: str = "etc", description: str = "새로 추가된 재미있는 게임") -> Dict[str, Any]:
     """
-    새로운 게임 메타데이터를 생성하고, 파일에 추가하여 저장합니다.
+    새로운 게임 메타데이터를 생성하고 저장합니다.
     """
-    
-    # 1. 파일에서 기존 메타데이터 불러오기
-    all_metadata = _load_metadata(ALL_GAMES_METADATA())
-    
-    # 2. 새로운 메타데이터 객체 생성
+
+    # 1. 새로운 메타데이터 객체 생성
     new_entry = {
         "id": str(uuid.uuid4()),  # 새로운 고유 ID 생성
         "game_title": game_title,
         "author": author,
         "category": category,
-        "thumbnail": f"/static/{game_title}/assets/thumbnail.png", 
+        "thumbnail": f"/static/{game_title}/assets/thumbnail.png",
         "plays": 0,
         "description": description,
         "likes":0
     }
-    
-    # 3. 리스트에 추가
-    all_metadata.append(new_entry)
-    
-    # 4. 파일에 다시 저장
-    _save_metadata(ALL_GAMES_METADATA(), all_metadata)
-    
+
+    # 2. 저장
+    with _catalog.write() as conn:
+        rowid, stored, trend = _upsert_row(conn, new_entry)
+    _notify(new_entry['id'], rowid, stored, trend)
+
     print(f"➕ 새 요소 추가 완료: ID={new_entry['id']}, Title={game_title}")
     return new_entry
 
 
 def find_metadata_by_id(target_id: str) -> Optional[Dict[str, Any]]:
     """
-    파일을 읽어 ID를 사용하여 요소를 검색하고 반환합니다.
+    ID를 사용하여 요소를 검색하고 반환합니다. (카탈로그의 id 인덱스 조회)
     """
-    # 1. 파일에서 기존 메타데이터 불러오기
-    all_metadata = _load_metadata(ALL_GAMES_METADATA())
-    
-    # 2. 리스트에서 검색
-    found_item = next((item for item in all_metadata if item.get('id') == target_id), None)
-    
+    found_item = _catalog.snapshot().by_id.get(target_id)
+
     if found_item:
-        print(f"🔎 요소 검색 성공: ID={target_id}, Title={found_item['game_title']}")
+        found_item = dict(found_item)
+        print(f"🔎 요소 검색 성공: ID={target_id}, Title={found_item.get('game_title')}")
     else:
         print(f"⚠️ 요소 검색 실패: ID={target_id}에 해당하는 요소를 찾을 수 없습니다.")
-        
+
     return found_item
 
 
 def delete_metadata_by_id(target_id: str) -> bool:
     """
-    파일을 읽어 ID를 사용하여 요소를 검색하고 삭제한 후, 파일에 저장합니다.
-    """
-    # 1. 파일에서 기존 메타데이터 불러오기
-    all_metadata = _load_metadata(ALL_GAMES_METADATA())
-    
-    # 2. 삭제 전 리스트 길이 저장
-    initial_length = len(all_metadata)
-    
-    # 3. ID가 target_id와 같지 않은 요소들만 남기고 리스트를 재구성 (삭제)
-    new_metadata = [item for item in all_metadata if item.get('id') != target_id]
-    
-    # 4. 삭제가 실제로 일어났는지 확인
-    if len(new_metadata) < initial_length:
-        # 5. 파일에 다시 저장
-        _save_metadata(ALL_GAMES_METADATA(), new_metadata)
-        print(f"🗑️ 요소 삭제 성공 및 파일 저장 완료: ID={target_id}")
+    ID를 사용하여 요소를 삭제합니다.
+    """
+    with _catalog.write() as conn:
+        row = conn.execute("SELECT rowid FROM games WHERE id = ?", (target_id,)).fetchone()
+        deleted = 0
+        if row is not None:
+            remove_game(conn, row[0])
+            deleted = conn.execute("DELETE FROM games WHERE rowid = ?", (row[0],)).rowcount
+
+    if deleted:
+        _notify(target_id, None, None, None)
+        print(f"🗑️ 요소 삭제 성공: ID={target_id}")
         return True
     else:
         print(f"⚠️ 요소 삭제 실패: ID={target_id}에 해당하는 요소를 찾을 수 없습니다.")
         return False
-    
 
 
 
+
+def increment_counters(deltas: Dict[str, Dict[str, int]], trend_decay: float = 0.0, trend_weights: tuple = (1.0, 1.0)) -> int:
+    """
+    여러 게임의 plays/likes 를 한 트랜잭션으로 증가시킵니다. (counters.py 의 일괄 반영용)
+    deltas: {game_id: {"plays": n, "likes": m}}. 갱신된 게임 수를 반환합니다.
+    트렌딩 점수도 지금 시각으로 감쇠시킨 뒤(trend_decay) 이번 카운트에 trend_weights 를 곱해 더해 둡니다.
+    """
+    if not deltas:
+        return 0
+
+    now = time.time()
+    play_weight, like_weight = trend_weights
+    stored_rows = []
+    # 카운트만 바뀌므로 카탈로그를 통째로 다시 읽지 않고, 갱신한 행만 메모리 상태에 바꿔 넣습니다.
+    with _catalog.write(invalidate=False) as conn:
+        for game_id, delta in deltas.items():
+            plays = delta.get('plays', 0)
+            likes = delta.get('likes', 0)
+            row = conn.execute(
+                "SELECT plays, likes, trend_score, trend_at FROM games WHERE id = ?", (game_id,)
+            ).fetchone()
+            if row is None:
+                continue
+            trend_score = trend_score_at(
+                _row_trend(row), row['plays'], row['likes'], now, trend_decay, trend_weights
+            ) + play_weight * plays + like_weight * likes
+            # data 의 JSON 도 같은 값으로 맞춰 둡니다. (SET 의 오른쪽은 갱신 전 값을 봅니다)
+            conn.execute(
+                """
+                UPDATE games SET
+                    plays = plays + ?,
+                    likes = likes + ?,
+                    trend_score = ?,
+                    trend_at = ?,
+                    data = json_set(data, '$.plays', plays + ?, '$.likes', likes + ?)
+                WHERE id = ?
+                """,
+                (plays, likes, trend_score, now, plays, likes, game_id)
+            )
+            row = conn.execute("SELECT rowid, data, trend_score, trend_at FROM games WHERE id = ?", (game_id,)).fetchone()
+            stored_rows.append((game_id, row['rowid'], json.loads(row['data']), _row_trend(row), {"plays": plays, "likes": likes}))
+        _catalog.replace_rows({game_id: (entry, trend) for game_id, _, entry, trend, _ in stored_rows})
+
+    for game_id, rowid, entry, trend, flushed in stored_rows:
+        _notify(game_id, rowid, entry, trend, flushed)
+    return len(stored_rows)
+
+
 def get_metadata_by_id_list(id_list: List[str]) -> List[Dict[str, Any]]:
     """
     ID 리스트를 받아 해당 ID에 해당하는 모든 메타데이터 항목을 검색하여 리스트로 반환합니다.
@@ -176,82 +558,155 @@ def get_metadata_by_id_list(id_list: List[str]) -> List[Dict[str, Any]]:
         print("⚠️ ID 리스트가 비어 있어 빈 결과를 반환합니다.")
         return []
 
-    # 1. 파일에서 전체 메타데이터 불러오기
-    all_metadata = _load_metadata(ALL_GAMES_METADATA())
-    
-    # 2. 검색을 빠르게 하기 위해 ID를 Set 형태로 변환
+    # 1. 검색을 빠르게 하기 위해 ID를 Set 형태로 변환
     target_ids = set(id_list)
-    
-    # 3. 리스트 컴프리헨션을 사용하여 검색 및 필터링
-    # 전체 메타데이터를 순회하며 ID가 target_ids Set에 포함된 항목만 필터링합니다.
-    found_items = [
-        item for item in all_metadata 
-        if item.get('id') in target_ids
-    ]
-    
-    # 검색 결과를 원래 요청된 ID 리스트의 순서대로 정렬해야 하는 경우, 
-    # 추가적인 작업이 필요하지만, 여기서는 검색된 항목만 반환합니다.
-    
+
+    # 2. 카탈로그의 id 인덱스로 조회 후 저장된 순서대로 정렬 (예전 JSON 파일 순회와 같은 순서)
+    state = _catalog.snapshot()
+    found_ids = sorted((t for t in target_ids if t in state.by_id), key=state.position.__getitem__)
+    found_items = [dict(state.by_id[t]) for t in found_ids]
+
     # 검색 성공/실패 여부 출력 (선택 사항)
     found_count = len(found_items)
     missing_count = len(id_list) - found_count
-    
+
     if missing_count > 0:
         print(f"⚠️ 요청된 {len(id_list)}개 중 {found_count}개만 찾았습니다. {missing_count}개의 ID에 해당하는 항목을 찾을 수 없습니다.")
     else:
         print(f"🔎 요청된 ID {len(id_list)}개 모두에 해당하는 항목을 찾았습니다.")
-        
+
     return found_items
 
 
 
+def search_metadata(query: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    제목/설명/카테고리/사양서(spec.md) 전문 검색. 관련도 순으로 메타데이터 리스트를 반환합니다.
+    """
+    conn = _connect()
+    try:
+        ids = search_ids(conn, query, limit, offset)
+    finally:
+        conn.close()
+    by_id = _catalog.snapshot().by_id
+    return [dict(by_id[game_id]) for game_id in ids if game_id in by_id]
+
+
+def reindex_game_search(game_id: str) -> bool:
+    """spec.md 가 바뀐 뒤 게임 하나의 검색 색인을 다시 만듭니다. 메타데이터가 없는 게임이면 False."""
+    # 메타데이터는 그대로이므로 카탈로그를 다시 읽지 않습니다.
+    with _catalog.write(invalidate=False) as conn:
+        row = conn.execute("SELECT rowid, data FROM games WHERE id = ?", (game_id,)).fetchone()
+        if row is not None:
+            index_game(conn, row['rowid'], json.loads(row['data']))
+    return row is not None
+
+
+# 정렬별 커서 키의 모양 (CatalogState._sort_key 와 같은 순서). "trending" 은 /showcase/games 의 offset 커서입니다.
+_CURSOR_KEY_TYPES = {
+    "default": (int,),
+    "newest": (int,),
+    "plays": (int, int),
+    "likes": (int, int),
+    "title": (str, int),
+    "trending": (int,),
+}
+
+
+def encode_cursor(sort: str, key) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort, list(key)]).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    """커서를 정렬 키로 되돌립니다. 형식이 틀리거나 다른 정렬의 커서면 ValueError."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("잘못된 cursor 입니다.")
+    if cursor_sort != sort:
+        raise ValueError(f"cursor 의 정렬({cursor_sort})이 요청한 정렬({sort})과 다릅니다.")
+    # 키를 그대로 bisect 에 넘기므로 길이와 타입이 정렬 키와 같아야 합니다. (bool 은 int 가 아닌 것으로 봅니다)
+    types = _CURSOR_KEY_TYPES.get(sort)
+    if (
+        types is None
+        or not isinstance(key, list)
+        or len(key) != len(types)
+        or any(isinstance(k, bool) or not isinstance(k, t) for k, t in zip(key, types))
+    ):
+        raise ValueError("잘못된 cursor 입니다.")
+    return tuple(key)
+
+
+def project_fields(item: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """fields 에 있는 키만 남긴 새 dict 를 반환합니다. (id 는 항상 포함, fields 가 없으면 전체 복사본)"""
+    if not fields:
+        return dict(item)
+    return {f: item[f] for f in ['id', *fields] if f in item}
+
+
+def list_metadata(
+    category: Optional[str] = None,
+    author: Optional[str] = None,
+    sort: str = "default",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    카탈로그의 정렬 인덱스에서 한 페이지를 꺼냅니다.
+    커서는 마지막 항목의 정렬 키라서, 페이지 사이에 게임이 추가/삭제되어도 건너뛰거나 중복되지 않습니다.
+
+    Returns:
+        dict: {'games': [...], 'next_cursor': 다음 페이지 커서 (마지막 페이지면 None)}
+    """
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"sort 는 {', '.join(SORT_ORDERS)} 중 하나여야 합니다.")
+    if category and category.lower() == "all":
+        category = None
+
+    keys, items = _catalog.snapshot().sorted_index(sort, category, author)
+    start = bisect_right(keys, decode_cursor(cursor, sort)) if cursor else 0
+    end = len(items) if limit is None else min(len(items), start + limit)
+
+    next_cursor = encode_cursor(sort, keys[end - 1]) if end < len(items) and end > start else None
+    return {
+        "games": [project_fields(item, fields) for item in items[start:end]],
+        "next_cursor": next_cursor,
+    }
+
+
 def search_metadata_by_category(target_category: str) -> List[Dict[str, Any]]:
     """
-    특정 Category를 사용하여 메타데이터 리스트에서 일치하는 모든 요소를 검색하여 배열로 반환합니다.
+    특정 Category를 사용하여 일치하는 모든 요소를 검색하여 배열로 반환합니다. (대소문자 구분 없음, 'all' 은 전체)
     """
-    # 1. 파일에서 전체 메타데이터 불러오기
-    all_metadata = _load_metadata(ALL_GAMES_METADATA())
-    
-    # 2. 리스트 컴프리헨션을 사용하여 Category가 일치하는 모든 항목 검색
-    # 검색 시 대소문자를 구분하지 않으려면 .lower()를 사용할 수 있습니다.
-    # 예: item.get('category', '').lower() == target_category.lower()
+    state = _catalog.snapshot()
 
     if target_category.lower() == "all":
-        return all_metadata
-    
-    found_items = [
-        item for item in all_metadata 
-        if item.get('category', '').lower() == target_category.lower()
-    ]
-    
+        return [dict(item) for item in state.entries]
+
+    found_items = [dict(item) for item in state.by_category.get(target_category.lower(), [])]
+
     found_count = len(found_items)
     if found_count > 0:
         print(f"🔎 Category '{target_category}' 검색 성공: {found_count}개의 항목 반환.")
     else:
         print(f"⚠️ Category '{target_category}'에 해당하는 항목을 찾을 수 없습니다.")
-        
+
     return found_items
 
 
 
 def search_metadata_by_author(target_author: str) -> List[Dict[str, Any]]:
     """
-    특정 Author(저자)를 사용하여 메타데이터 리스트에서 일치하는 모든 요소를 검색하여 배열로 반환합니다.
-    """
-    # 1. 파일에서 전체 메타데이터 불러오기
-    all_metadata = _load_metadata(ALL_GAMES_METADATA())
-    
-    # 2. 리스트 컴프리헨션을 사용하여 Author가 일치하는 모든 항목 검색
-    # item.get('author')를 사용하여 해당 키가 없더라도 오류를 방지합니다.
-    found_items = [
-        item for item in all_metadata 
-        if item.get('author') == target_author
-    ]
-    
+    특정 Author(저자)를 사용하여 일치하는 모든 요소를 검색하여 배열로 반환합니다.
+    """
+    found_items = [dict(item) for item in _catalog.snapshot().by_author.get(target_author, [])]
+
     found_count = len(found_items)
     if found_count > 0:
         print(f"🔎 Author '{target_author}' 검색 성공: 총 {found_count}개의 항목 반환.")
     else:
         print(f"⚠️ Author '{target_author}'에 해당하는 항목을 찾을 수 없습니다.")
-        
-    return found_items
\ No newline at end of file
+
+    return found_items
@@ -20,6 +20,9 @@ def BASE_PUBLIC_DIR():
 def ALL_GAMES_METADATA():
     return BASE_PUBLIC_DIR() / "all_games_metadata.json"
 
+def ALL_GAMES_DB_PATH():
+    return BASE_PUBLIC_DIR() / "all_games_metadata.db"
+
 def GAME_DIR(game_name:str):
     return BASE_PUBLIC_DIR() / game_name
 
@@ -43,3 +46,6 @@ def ASSETS_PATH(game_name:str):
 
 def ARCHIVE_LOG_PATH(game_name:str):
      return BASE_PUBLIC_DIR() / game_name / "archive" / "change_log.json"
+
+def JOBS_DB_PATH():
+    return BASE_PUBLIC_DIR() / "jobs.db"
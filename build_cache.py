@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from base_dir import PROJECT_ROOT
+
+load_dotenv()
+
+# tsc 진단 결과 + esbuild 결과물(game.js, sourcemap) 캐시 위치와 최대 크기
+BUILD_CACHE_DIR = Path(os.getenv('BUILD_CACHE_DIR', str(PROJECT_ROOT / ".build_cache")))
+BUILD_CACHE_MAX_BYTES = int(os.getenv('BUILD_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+DIAGNOSTICS_FILE = "diagnostics.json"
+OUTPUT_FILE = "output.js"
+SOURCEMAP_FILE = "output.js.map"
+
+
+def build_cache_key(ts_file_path: Path, build_options: str = "") -> str:
+    """
+    game.ts 내용 + 같은 폴더의 tsconfig.json 내용 (+ esbuild 옵션) 으로 SHA-256 키를 만듭니다.
+    코드가 같으면 /revert, /restore-version, /data-update, 같은 코드를 다시 생성한 LLM 재시도 모두 같은 키가 됩니다.
+    """
+    ts_file_path = Path(ts_file_path)
+    h = hashlib.sha256()
+    h.update(ts_file_path.read_bytes())
+    h.update(b"\0")
+    tsconfig = ts_file_path.parent / "tsconfig.json"
+    if tsconfig.exists():
+        h.update(tsconfig.read_bytes())
+    h.update(b"\0")
+    h.update(build_options.encode('utf-8'))
+    return h.hexdigest()
+
+
+def load_cached_build(key: str, output_path: Path) -> Optional[Dict[str, Any]]:
+    """
+    캐시 적중 시 저장된 game.js(와 sourcemap)를 output_path 로 복사하고 tsc 진단 결과를 반환합니다.
+    적중하지 않으면 None.
+    """
+    entry = BUILD_CACHE_DIR / key
+    diagnostics_file = entry / DIAGNOSTICS_FILE
+    if not diagnostics_file.exists():
+        return None
+
+    try:
+        analysis_result = json.loads(diagnostics_file.read_text(encoding='utf-8'))
+        output_path = Path(output_path)
+        shutil.copyfile(entry / OUTPUT_FILE, output_path)
+        if (entry / SOURCEMAP_FILE).exists():
+            shutil.copyfile(entry / SOURCEMAP_FILE, output_path.with_name(output_path.name + ".map"))
+        # LRU: 사용한 항목의 mtime 을 갱신합니다.
+        os.utime(entry)
+    except Exception as e:
+        print(f"⚠️ 빌드 캐시 읽기 실패 ({key[:12]}): {e}")
+        return None
+
+    print(f"⚡ 빌드 캐시 적중: {key[:12]} (tsc/esbuild 생략)")
+    return analysis_result
+
+
+def store_build(key: str, analysis_result: Dict[str, Any], output_path: Path):
+    """tsc 진단 결과와 esbuild 결과물을 캐시에 저장합니다. 임시 폴더에 쓴 뒤 rename 하므로 반쯤 쓰인 항목은 보이지 않습니다."""
+    entry = BUILD_CACHE_DIR / key
+    if entry.exists():
+        os.utime(entry)
+        return
+
+    output_path = Path(output_path)
+    tmp = BUILD_CACHE_DIR / f".tmp-{key}-{os.getpid()}-{time.monotonic_ns()}"
+    try:
+        tmp.mkdir(parents=True)
+        (tmp / DIAGNOSTICS_FILE).write_text(json.dumps(analysis_result, ensure_ascii=False), encoding='utf-8')
+        shutil.copyfile(output_path, tmp / OUTPUT_FILE)
+        sourcemap = output_path.with_name(output_path.name + ".map")
+        if sourcemap.exists():
+            shutil.copyfile(sourcemap, tmp / SOURCEMAP_FILE)
+        os.replace(tmp, entry)
+    except OSError as e:
+        # 다른 워커가 같은 키를 먼저 저장한 경우 등
+        print(f"⚠️ 빌드 캐시 저장 생략 ({key[:12]}): {e}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+
+    evict_build_cache()
+
+
+def evict_build_cache(max_bytes: int = BUILD_CACHE_MAX_BYTES):
+    """캐시 전체 크기가 max_bytes 를 넘으면 가장 오래 사용하지 않은 항목부터 삭제합니다."""
+    if not BUILD_CACHE_DIR.exists():
+        return
+
+    entries = []
+    total = 0
+    for entry in BUILD_CACHE_DIR.iterdir():
+        if not entry.is_dir() or entry.name.startswith(".tmp-"):
+            continue
+        size = sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+        entries.append((entry.stat().st_mtime, size, entry))
+        total += size
+
+    if total <= max_bytes:
+        return
+
+    entries.sort(key=lambda e: e[0])
+    for _, size, entry in entries:
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        print(f"🧹 빌드 캐시 제거: {entry.name[:12]}")
@@ -0,0 +1,121 @@
+import atexit
+import os
+import threading
+import zlib
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+from all_games_metadata import increment_counters
+from ranking import TREND_WEIGHTS, get_ranking
+
+load_dotenv()
+
+# 카운터 샤드 수 (샤드마다 잠금이 따로 있어 동시에 들어오는 클릭끼리 덜 기다립니다)
+COUNTER_SHARDS = int(os.getenv('COUNTER_SHARDS', '16'))
+# 모아 둔 증가분을 메타데이터 DB 에 반영하는 주기(초)
+COUNTER_FLUSH_INTERVAL = float(os.getenv('COUNTER_FLUSH_INTERVAL', '5'))
+# 주기 전이라도 쌓인 이벤트가 이 수를 넘으면 바로 반영합니다.
+COUNTER_FLUSH_THRESHOLD = int(os.getenv('COUNTER_FLUSH_THRESHOLD', '1000'))
+
+
+class _Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: Dict[str, Dict[str, int]] = {}
+
+
+class ShardedCounter:
+    """
+    게임별 plays/likes 증가분을 메모리에 모아 두었다가 한 번에 DB 에 반영합니다. (write-behind)
+    인기 게임에 클릭이 몰려도 반영 주기마다 게임당 UPDATE 한 번이면 됩니다.
+    """
+
+    def __init__(self, shards: int = COUNTER_SHARDS):
+        self._shards = [_Shard() for _ in range(max(1, shards))]
+        self._pending_events = 0
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _shard(self, game_id: str) -> _Shard:
+        # hash() 는 프로세스마다 달라지므로 crc32 로 고정된 샤드를 고릅니다.
+        return self._shards[zlib.crc32(game_id.encode('utf-8')) % len(self._shards)]
+
+    def add(self, game_id: str, plays: int = 0, likes: int = 0):
+        shard = self._shard(game_id)
+        with shard.lock:
+            counts = shard.counts.setdefault(game_id, {"plays": 0, "likes": 0})
+            counts["plays"] += plays
+            counts["likes"] += likes
+        # 순위는 바로 반영합니다. (DB 반영은 flush 에서)
+        get_ranking().record(game_id, plays=plays, likes=likes)
+
+        # 반영 시점을 정하는 용도라 잠금 없이 대략적으로 셉니다.
+        self._pending_events += 1
+        if self._pending_events >= COUNTER_FLUSH_THRESHOLD:
+            self._wakeup.set()
+
+    def pending(self, game_id: str) -> Dict[str, int]:
+        """아직 DB 에 반영되지 않은 증가분."""
+        shard = self._shard(game_id)
+        with shard.lock:
+            return dict(shard.counts.get(game_id, {"plays": 0, "likes": 0}))
+
+    def flush(self) -> int:
+        """모아 둔 증가분을 DB 에 반영하고, 반영한 게임 수를 반환합니다."""
+        with self._flush_lock:
+            deltas: Dict[str, Dict[str, int]] = {}
+            for shard in self._shards:
+                with shard.lock:
+                    counts, shard.counts = shard.counts, {}
+                deltas.update(counts)
+            self._pending_events = 0
+            if not deltas:
+                return 0
+
+            try:
+                updated = increment_counters(deltas, get_ranking().decay, TREND_WEIGHTS)
+            except Exception as e:
+                # 실패한 증가분은 다시 쌓아 두고 다음 주기에 재시도합니다.
+                print(f"❌ 카운터 반영 실패, 다음 주기에 다시 시도합니다: {e}")
+                for game_id, delta in deltas.items():
+                    shard = self._shard(game_id)
+                    with shard.lock:
+                        counts = shard.counts.setdefault(game_id, {"plays": 0, "likes": 0})
+                        counts["plays"] += delta["plays"]
+                        counts["likes"] += delta["likes"]
+                return 0
+
+            print(f"📊 카운터 반영: {updated}개 게임")
+            return updated
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(COUNTER_FLUSH_INTERVAL)
+            self._wakeup.clear()
+            self.flush()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="counter-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """반영 스레드를 멈추고 남은 증가분을 반영합니다."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=COUNTER_FLUSH_INTERVAL + 5)
+            self._thread = None
+        self.flush()
+
+
+_counter = ShardedCounter()
+atexit.register(_counter.flush)
+
+
+def get_counter() -> ShardedCounter:
+    return _counter
@@ -0,0 +1,181 @@
+import atexit
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from base_dir import BASE_PUBLIC_DIR, PROJECT_ROOT
+
+load_dotenv()
+
+# 상주 esbuild 서비스를 사용할지 여부 (False 면 항상 npx esbuild 사용)
+ESBUILD_SERVICE_ENABLED = os.getenv('ESBUILD_SERVICE', 'True') == 'True'
+ESBUILD_SERVICE_TIMEOUT = float(os.getenv('ESBUILD_SERVICE_TIMEOUT', '120'))
+ESBUILD_SERVICE_SCRIPT = PROJECT_ROOT / "tools" / "esbuild_service.js"
+# 서비스 시작에 실패하면 이 시간(초) 동안 npx esbuild 를 쓰고 다시 시도합니다. 연속으로 실패하면 최대값까지 두 배씩 늘립니다.
+ESBUILD_SERVICE_RETRY_SECONDS = float(os.getenv('ESBUILD_SERVICE_RETRY_SECONDS', '30'))
+ESBUILD_SERVICE_RETRY_MAX_SECONDS = float(os.getenv('ESBUILD_SERVICE_RETRY_MAX_SECONDS', '600'))
+
+
+class EsbuildService:
+    """
+    tools/esbuild_service.js (Node 사이드카)를 한 번 띄워 두고 파이프로 빌드 요청을 보냅니다.
+    요청마다 id 를 붙이므로 여러 스레드가 동시에 요청해도 됩니다.
+    """
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        cwd = BASE_PUBLIC_DIR() if BASE_PUBLIC_DIR().exists() else PROJECT_ROOT
+        env = dict(os.environ)
+        env.setdefault('ESBUILD_RESOLVE_PATHS', os.pathsep.join([str(cwd), str(cwd.parent)]))
+        self.process = subprocess.Popen(
+            [shutil.which('node') or 'node', str(ESBUILD_SERVICE_SCRIPT)],
+            cwd=cwd,
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+        )
+        threading.Thread(target=self._read_loop, daemon=True).start()
+
+    def _read_loop(self):
+        for line in self.process.stdout:
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            with self._lock:
+                future = self._pending.pop(message.get('id'), None)
+            if future is not None:
+                future.set_result(message)
+
+        # 프로세스가 종료되면 대기 중인 요청을 모두 실패 처리합니다.
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(RuntimeError("esbuild 서비스가 종료되었습니다."))
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def request(self, command: str, timeout: float = ESBUILD_SERVICE_TIMEOUT, **fields) -> Dict[str, Any]:
+        request_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            if not self.is_alive():
+                raise RuntimeError("esbuild 서비스가 실행 중이 아닙니다.")
+            self._pending[request_id] = future
+            self.process.stdin.write(json.dumps({"id": request_id, "command": command, **fields}) + "\n")
+            self.process.stdin.flush()
+        return future.result(timeout=timeout)
+
+    def ping(self) -> bool:
+        try:
+            return self.request("ping", timeout=10).get('success', False)
+        except Exception:
+            return False
+
+    def stop(self):
+        if self.is_alive():
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def _build_options(ts_file_path, output_path, format, target, sourcemap, incremental):
+    ts_file_path = os.path.abspath(ts_file_path)
+    return {
+        "entry": ts_file_path,
+        "outfile": os.path.abspath(output_path or ts_file_path.replace(".ts", ".js")),
+        "format": format,
+        "target": target,
+        "sourcemap": sourcemap,
+        "incremental": incremental,
+    }
+
+
+_service: Optional[EsbuildService] = None
+_service_lock = threading.Lock()
+# 시작에 실패한 뒤 다시 시도할 시각과 다음 대기 시간
+_retry_at = 0.0
+_retry_delay = ESBUILD_SERVICE_RETRY_SECONDS
+
+
+def _start_failed(reason: str):
+    global _retry_at, _retry_delay
+    print(f"⚠️ esbuild 서비스를 시작할 수 없어 {_retry_delay:.0f}초 동안 npx esbuild 로 빌드합니다: {reason}")
+    _retry_at = time.monotonic() + _retry_delay
+    _retry_delay = min(_retry_delay * 2, ESBUILD_SERVICE_RETRY_MAX_SECONDS)
+
+
+def get_service() -> Optional[EsbuildService]:
+    """esbuild 서비스를 (처음 한 번) 띄워 반환합니다. 죽었으면 다시 띄우고, 사용할 수 없으면 None."""
+    global _service, _retry_delay
+    if not ESBUILD_SERVICE_ENABLED or time.monotonic() < _retry_at:
+        return None
+    with _service_lock:
+        if _service is not None and _service.is_alive():
+            return _service
+        if time.monotonic() < _retry_at:
+            return None
+        if not shutil.which('node'):
+            _start_failed("node 를 찾을 수 없습니다.")
+            return None
+        try:
+            service = EsbuildService()
+            if not service.ping():
+                service.stop()
+                raise RuntimeError("esbuild 모듈을 불러오지 못했습니다.")
+        except Exception as e:
+            _start_failed(str(e))
+            return None
+        if _service is None:
+            atexit.register(lambda: _service and _service.stop())
+        _service = service
+        _retry_delay = ESBUILD_SERVICE_RETRY_SECONDS
+        print("✅ esbuild 서비스 시작")
+        return _service
+
+
+def build_with_service(ts_file_path, output_path=None, format='esm', target='es2020', sourcemap='inline', incremental=True) -> Optional[Dict[str, Any]]:
+    """
+    상주 esbuild 서비스로 빌드합니다. 같은 파일/옵션은 context.rebuild() 로 증분 빌드됩니다.
+    서비스를 사용할 수 없으면 None 을 반환합니다. (호출자는 npx esbuild 로 대체)
+    """
+    service = get_service()
+    if service is None:
+        return None
+    try:
+        response = service.request("build", options=_build_options(ts_file_path, output_path, format, target, sourcemap, incremental))
+    except Exception as e:
+        print(f"⚠️ esbuild 서비스 빌드 실패, npx esbuild 로 대체합니다: {e}")
+        return None
+    response.pop('id', None)
+    return response
+
+
+def build_many_with_service(ts_file_paths: List[str], format='esm', target='es2020', sourcemap='inline') -> Optional[List[Dict[str, Any]]]:
+    """여러 게임을 한 번의 요청으로 병렬 빌드합니다. 서비스를 사용할 수 없으면 None."""
+    service = get_service()
+    if service is None:
+        return None
+    builds = [_build_options(p, None, format, target, sourcemap, False) for p in ts_file_paths]
+    try:
+        response = service.request("buildMany", builds=builds)
+    except Exception as e:
+        print(f"⚠️ esbuild 서비스 일괄 빌드 실패: {e}")
+        return None
+    return response.get('results', [])
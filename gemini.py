@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import json
 from pathlib import Path
@@ -5,13 +6,17 @@ import random
 import re
 import shutil
 import subprocess
+import tarfile
 import tempfile
-from fastapi.responses import FileResponse, JSONResponse
+from typing import Optional
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
-from all_games_metadata import search_metadata_by_author, search_metadata_by_category, upsert_metadata
+from all_games_metadata import SORT_ORDERS, decode_cursor, encode_cursor, get_catalog, list_metadata, project_fields, reindex_game_search, search_metadata, search_metadata_by_author, search_metadata_by_category, upsert_metadata
 from tools.uuid import generate_uuid4
-from model_info_gemini import gemini_client, model_name
+from model_info_gemini import model_name
+from google.genai import types
+from llm_gateway import generate_content_async, generate_content_stream_async
 
 import os
 from dotenv import load_dotenv
@@ -27,12 +32,17 @@ from classes import PromptDeviderProcessor, AnswerTemplateProcessor, ClientError
 from make_default_game_folder import create_project_structure
 from make_dummy_image_asset import check_and_create_images_with_text
 from make_dummy_sound_asset import copy_and_rename_sound_files
-from save_chat import load_chat, save_chat
-from snapshot_manager import create_version, find_current_version_from_file, restore_version
+from job_queue import create_job, get_job, start_job_workers
+from save_chat import CHAT_COMPACT_INTERVAL_HOURS, compact_all_chats, load_chat, save_chat
+from snapshot_manager import SNAPSHOT_GC_INTERVAL_HOURS, create_version, detach_hardlink, diff_versions, find_current_version_from_file, gc_all_games, import_archive, iter_export_archive, iter_file_diff, load_change_log, restore_version
 from tools.debug_print import debug_print
-from tsc import check_typescript_compile_error
+from tsc import check_typescript_candidate, check_typescript_compile_error
+from tsc_daemon import daemon_health
+from ranking import TRENDING_BANNER_POOL, get_ranking
+from counters import get_counter
 
 from remove_code_fences_safe import remove_code_fences_safe
+from section_parser import SectionStreamParser, parse_sections
 
 from PIL import Image 
 
@@ -69,6 +79,10 @@ class CodeRequest(BaseModel):
 async def root():
     return {"status": "healthy", "message": "Gemini Code Assistant API is running"}
 
+@app.get("/health/tsc")
+async def tsc_health():
+    return daemon_health()
+
 
 
 
@@ -344,10 +358,7 @@ async def category(request: CodeRequest):
     }
     """
 
-    response = gemini_client.models.generate_content(
-        model=model_name,
-        contents=prompt
-    )
+    response = await generate_content_async(prompt)
 
     reply_content = json.loads(remove_code_fences_safe(response.text))
     cat = reply_content['category']
@@ -355,9 +366,9 @@ async def category(request: CodeRequest):
 
     result_text = ""
     if cat == 1:
-        code_content, result_text = modify_code(request)
+        code_content, result_text = await modify_code(request)
     elif cat == 2:
-        result_text = describe_code(request)
+        result_text = await describe_code(request)
     elif cat == 3:
         result_text = ""
     elif cat == 4:
@@ -370,7 +381,7 @@ async def category(request: CodeRequest):
 
 
 
-def describe_code(request: CodeRequest):
+async def describe_code(request: CodeRequest):
     code = remove_comments_from_file(CODE_PATH(request.game_name))
     
     if code == "":
@@ -381,11 +392,7 @@ def describe_code(request: CodeRequest):
 
     # 모델 호출 및 응답 생성
     print(f"AI 모델이 작업 중 입니다: {model_name}...")
-    response = gemini_client.models.generate_content(
-        model=model_name,
-        #config = config,
-        contents=prompt
-    )
+    response = await generate_content_async(prompt)
 
     reply_content = json.loads(remove_code_fences_safe(response.text))
     print(reply_content)
@@ -412,80 +419,50 @@ modifyPTP = ModifyPromptTemplateProcessor()
 # except Exception as e:
 #     print(e)
 
-def parse_ai_code_response(response_text):
-    result = {}
-    
-    # 1. 코드 블록 추출
-    code_start = response_text.find("###CODE_START###") + len("###CODE_START###")
-    code_end = response_text.find("###CODE_END###")
-    result['game_code'] = response_text[code_start:code_end].strip()
-
-    # 2. 데이터 블록 추출 (JSON 문자열)
-    data_start = response_text.find("###DATA_START###") + len("###DATA_START###")
-    data_end = response_text.find("###DATA_END###")
-    json_string = response_text[data_start:data_end].strip()
-    result['game_data'] = json_string
-    
-    # 3. 필요 Asset 리스트 (JSON 문자열)
-    asset_start = response_text.find("###NEW_ASSET_START###") + len("###NEW_ASSET_START###")
-    asset_end = response_text.find("###NEW_ASSET_END###")
-    json_asset_string = response_text[asset_start:asset_end].strip()
-    result['new_asset_list'] = json_asset_string
-    
-    # 4. 카테고리 (문자열)
-    category_start = response_text.find("###CATEGORY_START###") + len("###CATEGORY_START###")
-    category_end = response_text.find("###CATEGORY_END###")
-    category_string = response_text[category_start:category_end].strip()
-    result['category'] = category_string
-
-    # 5. 설명 블록 추출
-    desc_start = response_text.find("###DESCRIPTION_START###") + len("###DESCRIPTION_START###")
-    desc_end = response_text.find("###DESCRIPTION_END###")
-    result['description'] = response_text[desc_start:desc_end].strip()
+# AI 응답 섹션 이름 -> 결과 dict 키
+CODE_RESPONSE_SECTIONS = {
+    "CODE": "game_code",
+    "DATA": "game_data",
+    "NEW_ASSET": "new_asset_list",
+    "CATEGORY": "category",
+    "DESCRIPTION": "description",
+}
+QNA_RESPONSE_SECTIONS = {
+    "COMMENT": "comment",
+    "SPECIFICATION": "specification",
+}
+ANSWER_RESPONSE_SECTIONS = {
+    "ANSWER": "answer",
+}
+
+
+def _sections_to_result(parsed, key_map):
+    """
+    section_parser 결과를 기존 parse_ai_*_response 형식의 dict 로 변환합니다.
+    누락된 섹션은 빈 문자열이 되고, 'missing' / 'truncated' 키로 명시적으로 알려줍니다.
+    """
+    result = {key: parsed['sections'].get(name, "") for name, key in key_map.items()}
+    result['missing'] = [key_map[name] for name in parsed['missing']]
+    result['truncated'] = key_map.get(parsed['truncated'])
 
-    # 필요하다면 여기서 result['game_data']에 대해 json.loads()를 별도로 실행
-    # game_data 블록은 순수한 JSON 텍스트이므로 이스케이프 문제가 훨씬 적습니다.
-    # ...
+    if parsed['truncated']:
+        print(f"⚠️ 응답이 '{parsed['truncated']}' 섹션 중간에 끊겼습니다.")
+    if parsed['missing']:
+        print(f"⚠️ 응답에 누락된 섹션: {', '.join(parsed['missing'])}")
 
     return result
 
 
+def parse_ai_code_response(response_text):
+    return _sections_to_result(parse_sections(response_text, CODE_RESPONSE_SECTIONS), CODE_RESPONSE_SECTIONS)
 
 
 def parse_ai_qna_response(response_text):
-    result = {}
-    
-    # 1. 설명 블록 추출
-    code_start = response_text.find("###COMMENT_START###") + len("###COMMENT_START###")
-    code_end = response_text.find("###COMMENT_END###")
-    result['comment'] = response_text[code_start:code_end].strip()
-
-    # 2. 자연어 사양서 블록 추
-    code_start = response_text.find("###SPECIFICATION_START###") + len("###SPECIFICATION_START###")
-    code_end = response_text.find("###SPECIFICATION_END###")
-    result['specification'] = response_text[code_start:code_end].strip()
-
-    # 필요하다면 여기서 result['game_data']에 대해 json.loads()를 별도로 실행
-    # game_data 블록은 순수한 JSON 텍스트이므로 이스케이프 문제가 훨씬 적습니다.
-    # ...
-
-    return result
-
+    return _sections_to_result(parse_sections(response_text, QNA_RESPONSE_SECTIONS), QNA_RESPONSE_SECTIONS)
 
 
 def parse_ai_answer_response(response_text):
-    result = {}
-    
-    # 1. 설명 블록 추출
-    answer_start = response_text.find("###ANSWER_START###") + len("###ANSWER_START###")
-    answer_end = response_text.find("###ANSWER_END###")
-    result['answer'] = response_text[answer_start:answer_end].strip()
-
-    # 필요하다면 여기서 result['game_data']에 대해 json.loads()를 별도로 실행
-    # game_data 블록은 순수한 JSON 텍스트이므로 이스케이프 문제가 훨씬 적습니다.
-    # ...
-
-    return result
+    return _sections_to_result(parse_sections(response_text, ANSWER_RESPONSE_SECTIONS), ANSWER_RESPONSE_SECTIONS)
 
 
 
@@ -501,8 +478,20 @@ def validate_json(json_str):
     
 
 
-def modify_code(request, question, game_name):
-    """코드 처리 엔드포인트"""
+async def _generate_new_assets(game_name, json_new_asset_list, on_event=None):
+    """AI 가 요청한 새 이미지(생성)와 사운드(선택/복사) 에셋을 준비합니다."""
+    print(json_new_asset_list)
+
+    image_asset_info = json_new_asset_list.get('images', [])
+    sound_asset_info = json_new_asset_list.get('sounds', [])
+    await _emit(on_event, "assets_queued", images=len(image_asset_info), sounds=len(sound_asset_info))
+
+    await asyncio.to_thread(run_image_generation_with_delay, game_name, image_asset_info, delay=6)
+    await asyncio.to_thread(generate_sounds, game_name, sound_asset_info)
+
+
+def _prepare_modify_prompt(request, question, game_name):
+    """게임 폴더를 준비하고 코드 생성/수정 프롬프트를 만듭니다. (prompt, original_code, isFirstCreated) 를 반환합니다."""
     #original_code = remove_comments_from_file(CODE_PATH)
 
     #if not os.path.exists(GAME_DIR(game_name)):
@@ -549,24 +538,78 @@ def modify_code(request, question, game_name):
         
         upsert_metadata(metadata)
 
+    return prompt, original_code, isFirstCreated
 
 
+async def _generate_code_response(prompt, game_name, on_event=None, config=None, early_assets=True):
+    """
+    모델을 호출해 코드 응답 섹션을 파싱합니다. (on_event 가 있으면 모델 응답을 스트리밍하며 청크를 전달합니다)
+    (responseData, asset_task) 를 반환합니다. asset_task 는 스트리밍 중 미리 시작된 에셋 생성 작업입니다.
+    early_assets 가 False 면 에셋 생성을 미리 시작하지 않습니다. (채택되지 않을 수 있는 추측 후보용)
+    """
     # 💡 config 객체를 생성하여 응답 형식을 JSON으로 지정합니다.
     # config = types.GenerateContentConfig(
     #     response_mime_type="application/json"
     # )
     
     # 모델 호출 및 응답 생성
+    # 섹션이 완성되는 즉시 처리합니다. (스트리밍이면 모델이 설명을 쓰는 동안 에셋 생성이 시작됩니다)
+    parser = SectionStreamParser(CODE_RESPONSE_SECTIONS)
+    asset_task = None
+
+    async def on_sections(completed):
+        nonlocal asset_task
+        for name, text in completed:
+            await _emit(on_event, "section", name=CODE_RESPONSE_SECTIONS[name])
+            if name == "DATA":
+                await _emit(on_event, "data_validated", error=validate_json(remove_code_fences_safe(text)))
+            elif name == "NEW_ASSET" and early_assets:
+                asset_text = remove_code_fences_safe(text)
+                if asset_text != '' and validate_json(asset_text) == "":
+                    asset_task = asyncio.create_task(_generate_new_assets(game_name, json.loads(asset_text), on_event))
+
     print(f"AI 모델이 작업 중 입니다: {model_name}...")
-    response = gemini_client.models.generate_content(
-        model=model_name,
-        #config = config,
-        contents=prompt
-    )
+    try:
+        if on_event is None:
+            response = await generate_content_async(prompt, config=config)
+            await on_sections(parser.feed(response.text))
+        else:
+            received = 0
+            async for chunk in generate_content_stream_async(prompt, config=config):
+                if chunk.text:
+                    received += len(chunk.text)
+                    await _emit(on_event, "chunk", text=chunk.text)
+                    await on_sections(parser.feed(chunk.text))
+            await _emit(on_event, "code_received", length=received)
+    except BaseException:
+        # 스트림이 중간에 끊기면 이미 시작된 에셋 생성 작업을 받을 곳이 없습니다.
+        await _cancel_asset_task(asset_task)
+        raise
 
     #responseData = json.loads(remove_code_fences_safe(response.text))
-    responseData = parse_ai_code_response(response.text)
+    responseData = _sections_to_result(parser.close(), CODE_RESPONSE_SECTIONS)
+    return responseData, asset_task
 
+
+async def _cancel_asset_task(asset_task):
+    """미리 시작된 에셋 생성 작업을 취소하고 끝날 때까지 기다립니다. (결과를 쓰지 못하게 된 경우)"""
+    if asset_task is not None and not asset_task.done():
+        asset_task.cancel()
+    if asset_task is not None:
+        await asyncio.gather(asset_task, return_exceptions=True)
+
+
+async def _apply_code_response(game_name, responseData, isFirstCreated, asset_task=None, on_event=None):
+    """파싱된 코드 응답을 게임 폴더에 반영(코드/데이터/에셋 저장)하고 컴파일 검사 결과까지 반환합니다."""
+    try:
+        return await _write_code_response(game_name, responseData, isFirstCreated, asset_task, on_event)
+    except BaseException:
+        # 잘못된 DATA, 파일 쓰기 오류 등으로 중간에 실패하면 에셋 생성 작업이 주인 없이 계속 돌지 않게 합니다.
+        await _cancel_asset_task(asset_task)
+        raise
+
+
+async def _write_code_response(game_name, responseData, isFirstCreated, asset_task, on_event):
     game_code = remove_code_fences_safe(responseData['game_code'])
     game_data = remove_code_fences_safe(responseData['game_data'])
     description = remove_code_fences_safe(responseData['description'])
@@ -641,8 +684,8 @@ def modify_code(request, question, game_name):
         json_data = json.loads(game_data)
         #print(json_data.get('assets', {}))
 
-        check_and_create_images_with_text(json_data, GAME_DIR(game_name))
-        copy_and_rename_sound_files(json_data, GAME_DIR(game_name))
+        await asyncio.to_thread(check_and_create_images_with_text, json_data, GAME_DIR(game_name))
+        await asyncio.to_thread(copy_and_rename_sound_files, json_data, GAME_DIR(game_name))
 
         directory_path = os.path.dirname(DATA_PATH(game_name)) 
         if directory_path:
@@ -657,35 +700,12 @@ def modify_code(request, question, game_name):
 
 
     
-    if new_asset_list is not None and new_asset_list != '':        
+    if asset_task is not None:
+        # 스트리밍 중 NEW_ASSET 섹션이 완성되어 이미 시작된 에셋 생성 작업
+        await asset_task
+    elif new_asset_list is not None and new_asset_list != '':        
         error = error + validate_json(new_asset_list)
-        json_new_asset_list = json.loads(new_asset_list)
-        print(json_new_asset_list)
-
-        image_asset_info = json_new_asset_list.get('images', [])
-        run_image_generation_with_delay(game_name, image_asset_info, delay=6)
-
-        # for img in json_new_asset_list.get('images', []):
-        #     generate_image(
-        #         game_name=game_name,
-        #         file_name=img['file_name'],
-        #         description=img['description'],
-        #         isBackgroundImage=img['isBackgroundImage'],
-        #         width=img['width'],
-        #         height=img['height']
-        #     )
-
-        sound_asset_info = json_new_asset_list.get('sounds', [])
-        generate_sounds(game_name, sound_asset_info)
-
-        # for snd in json_new_asset_list.get('sounds', []):
-        #     generate_sound(
-        #         game_name=game_name,
-        #         file_name=snd['file_name'],
-        #         description=snd['description'],
-        #         isBackgroundMusic=snd['isBackgroundMusic'],
-        #         duration_seconds=snd['duration_seconds']
-        #     )
+        await _generate_new_assets(game_name, json.loads(new_asset_list), on_event)
 
 
     description = modify_check + description
@@ -695,14 +715,97 @@ def modify_code(request, question, game_name):
         with open(CODE_PATH_NOCOMMENT, 'w', encoding='utf-8') as f:
             f.write(remove_comments_from_file(CODE_PATH_NOCOMMENT))
 
+    # tsc / esbuild 는 서브프로세스이므로 스레드에서 실행합니다.
+    await _emit(on_event, "tsc")
+    compile_error = await asyncio.to_thread(check_typescript_compile_error, CODE_PATH(game_name))
     if error == "":
-        error = check_typescript_compile_error(CODE_PATH(game_name))
+        error = compile_error
     else:
-        error = error + '\n' + check_typescript_compile_error(CODE_PATH(game_name))
+        error = error + '\n' + compile_error
 
     return game_code, game_data, description, error
 
 
+async def modify_code(request, question, game_name, on_event=None):
+    """코드 처리 엔드포인트 (on_event 가 있으면 모델 응답을 스트리밍하며 청크를 전달합니다)"""
+    prompt, _, isFirstCreated = _prepare_modify_prompt(request, question, game_name)
+    responseData, asset_task = await _generate_code_response(prompt, game_name, on_event)
+    return await _apply_code_response(game_name, responseData, isFirstCreated, asset_task, on_event)
+
+
+# --------------------------------------------------------------------------------
+# 추측(speculative) 후보 생성: 여러 후보를 동시에 생성/타입 검사하고 먼저 통과한 후보를 채택
+# --------------------------------------------------------------------------------
+# 한 번에 생성할 후보 수 (1 이면 기존처럼 순차 생성 → 컴파일 → 재시도)
+SPECULATIVE_CANDIDATES = int(os.getenv('SPECULATIVE_CANDIDATES', '1'))
+# 후보마다 돌아가며 사용할 temperature 목록
+SPECULATIVE_TEMPERATURES = [float(t) for t in os.getenv('SPECULATIVE_TEMPERATURES', '0.2,0.7,1.0,1.3').split(',')]
+# 요청 하나에서 사용할 수 있는 최대 코드 생성 횟수 (비용 상한)
+SPECULATIVE_MAX_GENERATIONS = int(os.getenv('SPECULATIVE_MAX_GENERATIONS', '8'))
+
+
+async def _generate_candidate(prompt, game_name, original_code, candidate_id, temperature, on_event=None):
+    """후보 하나를 생성하고 게임 폴더 안의 _candidates 폴더에서 (작업 파일은 건드리지 않고) 타입 검사합니다. (responseData, error) 를 반환합니다."""
+    config = types.GenerateContentConfig(temperature=temperature)
+    # 후보의 에셋은 게임 폴더에 바로 만들어지므로, 채택된 후보만 _apply_code_response 에서 생성합니다.
+    responseData, _ = await _generate_code_response(prompt, game_name, config=config, early_assets=False)
+
+    game_code = remove_code_fences_safe(responseData['game_code'])
+    error = ""
+    for key in ('game_data', 'new_asset_list'):
+        text = remove_code_fences_safe(responseData[key])
+        if text != '':
+            error = error + validate_json(text)
+
+    compile_error = await asyncio.to_thread(check_typescript_candidate, GAME_DIR(game_name), candidate_id, game_code or original_code)
+    error = compile_error if error == "" else error + '\n' + compile_error
+    await _emit(on_event, "candidate", candidate=candidate_id, temperature=temperature, success=(error == ""))
+    return responseData, error
+
+
+async def speculate_code(request, question, game_name, candidates, on_event=None):
+    """
+    modify_code 의 병렬 버전입니다. 후보 N 개를 서로 다른 temperature 로 동시에 생성하고 병렬로 타입 검사해,
+    가장 먼저 오류 없이 통과한 후보를 채택하고 나머지는 취소합니다.
+    통과한 후보가 없으면 오류가 가장 적은 후보를 채택해 다음 시도에서 그 오류를 고치게 합니다.
+    (이미 모델에 보낸 요청은 취소해도 응답까지 비용이 발생할 수 있으므로 SPECULATIVE_MAX_GENERATIONS 로 제한합니다)
+    """
+    prompt, original_code, isFirstCreated = _prepare_modify_prompt(request, question, game_name)
+    round_id = generate_uuid4()[:8]
+
+    tasks = [
+        asyncio.create_task(_generate_candidate(
+            prompt, game_name, original_code, f"{round_id}/{i}",
+            SPECULATIVE_TEMPERATURES[i % len(SPECULATIVE_TEMPERATURES)], on_event
+        ))
+        for i in range(candidates)
+    ]
+
+    best = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                responseData, error = await next_done
+            except Exception as e:
+                print(f"❌ 후보 생성 실패: {e}")
+                continue
+            if best is None or len(error.splitlines()) < len(best[1].splitlines()):
+                best = (responseData, error)
+            if error == "":
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        # 취소해도 이미 스레드에서 돌고 있는 타입 검사는 끝까지 실행되므로, 후보 폴더는 check_typescript_candidate 가 직접 지웁니다.
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if best is None:
+        raise RuntimeError("모든 후보 생성에 실패했습니다.")
+
+    print(f"🏁 후보 채택 ({'컴파일 통과' if best[1] == '' else '오류 최소'})")
+    return await _apply_code_response(game_name, best[0], isFirstCreated, on_event=on_event)
+
+
 
 
 @app.get("/spec")
@@ -738,8 +841,26 @@ qtp = QuestionTemplateProcessor()
 
 MAX_ATTEMPTS = 5
 
+
+async def _emit(on_event, stage, **data):
+    """파이프라인 진행 이벤트를 콜백(on_event)에 전달합니다. 콜백이 없으면 아무것도 하지 않습니다."""
+    if on_event is not None:
+        await on_event(stage, data)
+
+
 @app.post("/process-code")
 async def process_code(request: CodeRequest):
+    return await run_process_code(request)
+
+
+async def run_process_code(request: CodeRequest, on_event=None):
+    """
+    /process-code 파이프라인 본체입니다. (분류 → 수정/답변 → 컴파일 → 버전 생성)
+
+    Args:
+        request: 사용자 요청.
+        on_event: 진행 이벤트를 받을 async 콜백 (stage: str, data: dict). 작업 큐/스트리밍에서 사용합니다.
+    """
     game_name = request.game_name
 
 
@@ -750,11 +871,7 @@ async def process_code(request: CodeRequest):
     for i in range(MAX_ATTEMPTS):    
         try:
             print(f"프롬프트 분류 중 입니다: {model_name}...")
-            response = gemini_client.models.generate_content(
-                model=model_name,
-                #config = config,
-                contents=prompt
-            )
+            response = await generate_content_async(prompt)
 
             success = True
             break
@@ -804,6 +921,7 @@ async def process_code(request: CodeRequest):
 
     devide_result = f"요청:\n{user_requests}\n질문:\n{user_question}\n부적절:\n{Inappropriate_answer}\n"
     print(devide_result)
+    await _emit(on_event, "divide", requests=Modification_Requests, questions=Questions, inappropriate=Inappropriate)
 
     if len(Modification_Requests) == 0: 
         save_chat(CHAT_PATH(game_name), "user", request.message)       
@@ -829,19 +947,19 @@ async def process_code(request: CodeRequest):
                 original_data = ""
 
             q_prompt = qtp.get_final_prompt(user_question, original_code, original_data)
+            await _emit(on_event, "answer")
 
             answer = ""            
             success = False
             for i in range(MAX_ATTEMPTS):    
                 try:
                     print(f"AI 모델이 작업 중 입니다: {model_name}...")
-                    response = gemini_client.models.generate_content(
-                        model=model_name,
-                        #config = config,
-                        contents=q_prompt
-                    )
+                    response = await generate_content_async(q_prompt)
 
-                    answer = parse_ai_answer_response(response.text)['answer']
+                    parsed_answer = parse_ai_answer_response(response.text)
+                    if 'answer' in parsed_answer['missing']:
+                        raise ValueError("응답에 ANSWER 섹션이 없습니다.")
+                    answer = parsed_answer['answer']
 
                     success = True
                     break
@@ -886,10 +1004,22 @@ async def process_code(request: CodeRequest):
 
             success = False
             fail_message = ""
+            generations = 0
             for i in range(MAX_ATTEMPTS):    
                 try:
-                    game_code, game_data, description, error = modify_code(message, q_msg, game_name) 
+                    await _emit(on_event, "modify", attempt=i + 1, max_attempts=MAX_ATTEMPTS)
+                    if SPECULATIVE_CANDIDATES > 1:
+                        candidates = min(SPECULATIVE_CANDIDATES, SPECULATIVE_MAX_GENERATIONS - generations)
+                        if candidates <= 0:
+                            fail_message = fail_message or "❌ 코드 생성 예산(SPECULATIVE_MAX_GENERATIONS)을 모두 사용했습니다."
+                            print(fail_message)
+                            break
+                        generations += candidates
+                        game_code, game_data, description, error = await speculate_code(message, q_msg, game_name, candidates, on_event)
+                    else:
+                        game_code, game_data, description, error = await modify_code(message, q_msg, game_name, on_event) 
                     description_total = description_total + description
+                    await _emit(on_event, "compiled", attempt=i + 1, success=(error == ""), error=error)
                     
                     if error == "":
                         # 에러가 빈 문자열이라면 (에러 해결 성공)
@@ -910,13 +1040,14 @@ async def process_code(request: CodeRequest):
                 q_msg = ""
 
             if success:
+                await _emit(on_event, "snapshot")
                 if game_code != '' or game_data != '':
                     if is_first_created:
-                        create_version(GAME_DIR(game_name), summary=user_requests)
+                        await asyncio.to_thread(create_version, GAME_DIR(game_name), summary=user_requests)
                     else:
-                        version_info = find_current_version_from_file(ARCHIVE_LOG_PATH(game_name))
+                        version_info = await asyncio.to_thread(find_current_version_from_file, ARCHIVE_LOG_PATH(game_name))
                         current_ver = version_info.get("version")
-                        create_version(GAME_DIR(game_name), parent_name=current_ver, summary=user_requests)
+                        await asyncio.to_thread(create_version, GAME_DIR(game_name), parent_name=current_ver, summary=user_requests)
                         
                 metadata_file = GAME_METADATA_PATH(game_name)
                 if metadata_file.exists():
@@ -947,6 +1078,129 @@ async def process_code(request: CodeRequest):
             raise HTTPException(status_code=500, detail=str(e))
 
 
+# --------------------------------------------------------------------------------
+# /process-code 백그라운드 작업 (작업 ID 를 즉시 반환하고 /jobs/{id} 로 상태 조회)
+# --------------------------------------------------------------------------------
+async def _process_code_job(payload, report):
+    request = CodeRequest(**payload)
+
+    async def on_event(stage, data):
+        if stage == "divide":
+            await report("divide", 0.1)
+        elif stage == "answer":
+            await report("answer", 0.5)
+        elif stage == "modify":
+            await report(f"modify {data['attempt']}/{data['max_attempts']}", 0.1 + 0.8 * (data['attempt'] - 1) / data['max_attempts'])
+        elif stage == "snapshot":
+            await report("snapshot", 0.95)
+
+    try:
+        return await run_process_code(request, on_event)
+    except HTTPException as e:
+        raise RuntimeError(e.detail)
+
+
+@app.post("/process-code/jobs")
+async def process_code_job(request: CodeRequest):
+    job_id = await asyncio.to_thread(create_job, "process-code", request.model_dump())
+    return {"status": "queued", "job_id": job_id}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = await asyncio.to_thread(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return job
+
+
+# --------------------------------------------------------------------------------
+# /process-code 스트리밍 (Server-Sent Events)
+# 모델 출력 청크(chunk)와 파이프라인 단계 이벤트를 바로 브라우저로 전달합니다.
+# --------------------------------------------------------------------------------
+# 실행 중인 백그라운드 태스크가 GC 되지 않도록 참조를 보관합니다.
+_background_tasks = set()
+
+
+def _sse_format(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/process-code/stream")
+async def process_code_stream(request: CodeRequest):
+    queue = asyncio.Queue()
+
+    async def on_event(stage, data):
+        await queue.put((stage, data))
+
+    async def run():
+        try:
+            result = await run_process_code(request, on_event)
+            await queue.put(("result", result))
+        except HTTPException as e:
+            await queue.put(("error", {"detail": e.detail}))
+        except Exception as e:
+            await queue.put(("error", {"detail": str(e)}))
+        finally:
+            await queue.put(None)
+
+    async def event_stream():
+        # 연결이 끊겨도 파이프라인은 끝까지 실행되어 코드/버전/채팅이 저장되도록 별도 태스크로 실행합니다.
+        task = asyncio.create_task(run())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        yield _sse_format("start", {"game_name": request.game_name})
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            stage, data = item
+            yield _sse_format(stage, data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _snapshot_gc_loop():
+    """SNAPSHOT_GC_INTERVAL_HOURS 마다 모든 게임의 아카이브에 보존 정책을 적용합니다."""
+    while True:
+        await asyncio.sleep(SNAPSHOT_GC_INTERVAL_HOURS * 3600)
+        try:
+            await asyncio.to_thread(gc_all_games)
+        except Exception as e:
+            print(f"❌ 스냅샷 GC 실패: {e}")
+
+
+async def _chat_compact_loop():
+    """CHAT_COMPACT_INTERVAL_HOURS 마다 모든 게임의 채팅 로그를 정리합니다."""
+    while True:
+        await asyncio.sleep(CHAT_COMPACT_INTERVAL_HOURS * 3600)
+        try:
+            await asyncio.to_thread(compact_all_chats, BASE_PUBLIC_DIR())
+        except Exception as e:
+            print(f"❌ 채팅 기록 정리 실패: {e}")
+
+
+@app.on_event("startup")
+async def start_background_workers():
+    app.state.job_workers = start_job_workers({"process-code": _process_code_job})
+    if SNAPSHOT_GC_INTERVAL_HOURS > 0:
+        app.state.job_workers.append(asyncio.create_task(_snapshot_gc_loop()))
+    if CHAT_COMPACT_INTERVAL_HOURS > 0:
+        app.state.job_workers.append(asyncio.create_task(_chat_compact_loop()))
+    get_counter().start()
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    for task in getattr(app.state, "job_workers", []):
+        task.cancel()
+    await asyncio.to_thread(get_counter().stop)
+
+
 # 클라이언트가 전송하는 JSON 본문 구조
 class RestoreRequest(BaseModel):
     version: str          # 복원할 버전 이름 (예: "v4-4")
@@ -965,7 +1219,7 @@ async def restore_version_request(request_data: RestoreRequest):
             detail="복원할 버전(version) 정보가 누락되었습니다."
         )
 
-    restore_success = restore_version(GAME_DIR(game_name), version_to_restore)
+    restore_success = await asyncio.to_thread(restore_version, GAME_DIR(game_name), version_to_restore)
     
     # 3. 결과 반환
     if restore_success:
@@ -982,46 +1236,90 @@ async def restore_version_request(request_data: RestoreRequest):
     
 
 @app.get("/snapshot-log")
-async def get_snapshot_log(game_name: str):    
-    SNAPSHOT_LOG_PATH = ARCHIVE_LOG_PATH(game_name)
-    # 1. 파일 존재 여부 확인
-    if not SNAPSHOT_LOG_PATH.exists():
-        return {"versions":[]}
-        # 파일이 없을 경우 404 (Not Found) 오류를 반환
-        # raise HTTPException(
-        #     status_code=404, 
-        #     detail=f"스냅샷 로그 파일이 존재하지 않습니다: {SNAPSHOT_LOG_PATH}"
-        # )
-    
+async def get_snapshot_log(game_name: str, offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1, le=500)):    
+    """
+    버전 목록을 예전 change_log.json 형식({"versions": [...]})으로 반환합니다.
+    limit 을 주면 offset 부터 limit 개만 반환하고 total/offset/limit 을 함께 돌려줍니다.
+    """
     try:
-        # 2. JSON 파일 읽기 및 파싱
-        # with open을 사용하여 파일을 안전하게 열고 닫습니다.
-        with open(SNAPSHOT_LOG_PATH, 'r', encoding='utf-8') as f:
-            # json.load()를 사용하여 파일 내용을 파이썬 딕셔너리로 변환합니다.
-            snapshot_data = json.load(f)
-        
-        # 3. 데이터 반환
-        # FastAPI는 파이썬 딕셔너리(snapshot_data)를 받으면 
-        # Content-Type: application/json 헤더와 함께 JSON 문자열로 자동 변환하여 전송합니다.
-        return snapshot_data
-        
-    except json.JSONDecodeError:
-        # 파일 내용이 JSON 형식이 아닐 경우 500 (Internal Server Error) 오류 반환
-        raise HTTPException(
-            status_code=500, 
-            detail="스냅샷 로그 파일의 내용이 유효한 JSON 형식이 아닙니다."
-        )
+        return await asyncio.to_thread(load_change_log, GAME_DIR(game_name), offset, limit)
     except Exception as e:
-        # 기타 파일 접근 오류 발생 시
+        # 버전 인덱스 접근 오류 발생 시
         raise HTTPException(
             status_code=500, 
-            detail=f"파일을 읽는 중 알 수 없는 오류가 발생했습니다: {e}"
+            detail=f"버전 기록을 읽는 중 알 수 없는 오류가 발생했습니다: {e}"
         )
 
 
 
+@app.get("/snapshot-diff")
+async def get_snapshot_diff(game_name: str, from_version: str = Query(..., alias="from"), to_version: str = Query(..., alias="to")):
+    """
+    두 버전 사이의 파일별 변경 상태와 텍스트 파일(game.ts, data.json 등)의 unified diff 를 반환합니다.
+    작업 폴더는 건드리지 않고 아카이브에서 바로 계산합니다.
+    """
+    try:
+        return await asyncio.to_thread(diff_versions, GAME_DIR(game_name), from_version, to_version)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/snapshot-diff/file")
+async def get_snapshot_file_diff(game_name: str, path: str, from_version: str = Query(..., alias="from"), to_version: str = Query(..., alias="to")):
+    """큰 파일 하나의 unified diff 를 text/plain 으로 스트리밍합니다."""
+    lines = iter_file_diff(GAME_DIR(game_name), from_version, to_version, path)
+    try:
+        # 버전이 없으면 스트리밍을 시작하기 전에 404 를 돌려주기 위해 첫 줄을 먼저 계산합니다.
+        first = await asyncio.to_thread(next, lines, None)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    def stream():
+        if first is not None:
+            yield first
+            yield from lines
+
+    return StreamingResponse(stream(), media_type="text/plain; charset=utf-8")
+
+
+@app.get("/snapshot-export")
+def export_snapshots(game_name: str, gzip: bool = False):
+    """게임의 전체 버전 기록(버전 메타 + 블롭)을 tar 파일 하나로 스트리밍합니다."""
+    game_dir = GAME_DIR(game_name)
+    if not (game_dir / "archive").exists():
+        raise HTTPException(status_code=404, detail="스냅샷 기록이 없습니다.")
+    filename = f"{game_name}.snap.tar" + (".gz" if gzip else "")
+    return StreamingResponse(
+        iter_export_archive(game_dir, compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-tar",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.post("/snapshot-import")
+async def import_snapshots(
+    game_name: str = Form(...),
+    file: UploadFile = File(...),
+):
+    """
+    /snapshot-export 로 받은 파일을 게임으로 가져옵니다. 이미 있는 블롭은 건너뛰고, 새 블롭은 해시를 검증합니다.
+    기록이 없던 게임이면 현재 버전을 작업 폴더에 복원합니다.
+    """
+    if not game_name.strip():
+        raise HTTPException(status_code=400, detail="game_name is required")
+    game_dir = GAME_DIR(game_name)
+    game_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        return await asyncio.to_thread(import_archive, game_dir, file.file)
+    except (ValueError, tarfile.TarError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.get("/load-chat")
-def load_chat_request(game_name: str = Query(..., min_length=1)):
+def load_chat_request(
+    game_name: str = Query(..., min_length=1),
+    last: Optional[int] = Query(None, ge=1, description="Return only the last N messages."),
+):
     # # 경로 안전화(간단)
     # safe_name = "".join(c for c in game_name if c.isalnum() or c in "-_")
     # path = DATA_ROOT / safe_name / "chat.json"
@@ -1034,7 +1332,7 @@ def load_chat_request(game_name: str = Query(..., min_length=1)):
         #     data = json.load(f)
         # chat = data.get("chat")
 
-        chat = load_chat(CHAT_PATH(game_name))
+        chat = load_chat(CHAT_PATH(game_name), last=last)
         return chat
     
         # if not isinstance(chat, list):
@@ -1154,11 +1452,7 @@ async def process_code(request: CodeRequest):
         prompt = sqtp.get_final_prompt(history, request.message, old_spec)
 
         print(f"AI 모델이 작업 중 입니다: {model_name}...")
-        response = gemini_client.models.generate_content(
-            model=model_name,
-            #config = config,
-            contents=prompt
-        )
+        response = await generate_content_async(prompt)
 
         return {
             "reply": remove_code_fences_safe(response.text)
@@ -1244,9 +1538,9 @@ async def process_chat_data(update: DataUpdatePayload):
         # indent=4는 사람이 읽기 쉬운 형태로 정렬해줍니다.
         json.dump(update_data, f, ensure_ascii=False, indent=4)
         
-    version_info = find_current_version_from_file(ARCHIVE_LOG_PATH(game_name))
+    version_info = await asyncio.to_thread(find_current_version_from_file, ARCHIVE_LOG_PATH(game_name))
     current_ver = version_info.get("version")
-    create_version(GAME_DIR(game_name), parent_name=current_ver, summary='게임 데이터 수정')
+    await asyncio.to_thread(create_version, GAME_DIR(game_name), parent_name=current_ver, summary='게임 데이터 수정')
 
     return {
                 "status": "success",
@@ -1292,15 +1586,14 @@ async def process_chat_data(data: WrappedSubmitData):   #      game_name: str, d
     prompt = atp.get_final_prompt(old_spec, result)
 
     print(f"AI 모델이 작업 중 입니다: {model_name}...")
-    response = gemini_client.models.generate_content(
-            model=model_name,
-            #config = config,
-            contents=prompt
-        )
+    response = await generate_content_async(prompt)
 
     print(response.text)
 
     parse = parse_ai_qna_response(response.text)
+    if 'specification' in parse['missing']:
+        # 기존 사양서를 빈 내용으로 덮어쓰지 않도록 중단합니다.
+        raise HTTPException(status_code=500, detail="AI 응답에 사양서(SPECIFICATION) 섹션이 없습니다.")
     spec = parse['specification']
 
     directory_path = os.path.dirname(SPEC_PATH(game_name)) 
@@ -1309,16 +1602,14 @@ async def process_chat_data(data: WrappedSubmitData):   #      game_name: str, d
 
     with open(SPEC_PATH(game_name), 'w', encoding='utf-8') as f:
         f.write(spec)
+    # 사양서도 검색 대상이므로 색인을 갱신합니다.
+    await asyncio.to_thread(reindex_game_search, game_name)
 
     history = ""#format_chat_history(get_session_history(0))
     prompt = sqtp.get_final_prompt(history, "", spec)
 
     print(f"AI 모델이 작업 중 입니다: {model_name}...")
-    response = gemini_client.models.generate_content(
-        model=model_name,
-        #config = config,
-        contents=prompt
-    )
+    response = await generate_content_async(prompt)
 
     return {
                 "status": "success",
@@ -1352,9 +1643,9 @@ async def revert_code(request: RevertRequest):
     game_name = request.game_name
     """코드를 이전 버전으로 되돌리는 엔드포인트"""
     try:        
-        version_info = find_current_version_from_file(ARCHIVE_LOG_PATH(game_name))
+        version_info = await asyncio.to_thread(find_current_version_from_file, ARCHIVE_LOG_PATH(game_name))
         parent_version = version_info.get("parent")
-        restore_success = restore_version(GAME_DIR(game_name), parent_version)
+        restore_success = await asyncio.to_thread(restore_version, GAME_DIR(game_name), parent_version)
 
         if restore_success:
             reply = f"코드를 이전 버전으로 되돌렸습니다."            
@@ -1571,6 +1862,8 @@ async def replace_asset(
 
     try:
         ext = Path(file.filename).suffix.lower()
+        # 스냅샷 블롭과 하드링크로 연결된 파일이면 덮어쓰기 전에 연결을 끊습니다.
+        detach_hardlink(dst_path)
 
         if type == "image":
             if ext == ".png":
@@ -1607,9 +1900,9 @@ async def replace_asset(
         except Exception:
             pass
         
-        version_info = find_current_version_from_file(ARCHIVE_LOG_PATH(game_name))
+        version_info = await asyncio.to_thread(find_current_version_from_file, ARCHIVE_LOG_PATH(game_name))
         current_ver = version_info.get("version")
-        create_version(GAME_DIR(game_name), parent_name=current_ver, summary=f'{new_name}파일을 다른 파일로 교체 했습니다.')
+        await asyncio.to_thread(create_version, GAME_DIR(game_name), parent_name=current_ver, summary=f'{new_name}파일을 다른 파일로 교체 했습니다.')
 
 
     except HTTPException:
@@ -1636,42 +1929,85 @@ async def replace_asset(
 
 
 
+def _parse_fields(fields: Optional[str]) -> Optional[list]:
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()]
+
+
+def _list_games_page(category=None, author=None, sort="default", cursor=None, limit=None, fields=None):
+    try:
+        return list_metadata(category=category, author=author, sort=sort, cursor=cursor, limit=limit, fields=_parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.get("/arcade/games")
 def get_arcade_games_endpoint(
-    category: Optional[str] = Query("all", description="Category filter ('all', 'action', 'puzzle', etc.)")
+    category: Optional[str] = Query("all", description="Category filter ('all', 'action', 'puzzle', etc.)"),
+    sort: str = Query("default", description=f"Sort order: {', '.join(SORT_ORDERS)}"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page."),
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Page size (default: all games)."),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (e.g. 'game_title,thumbnail')."),
 ):
     """
     모든 아케이드 게임 목록을 반환합니다. 선택적으로 카테고리 필터링을 지원합니다.
+    limit/cursor 로 페이지 단위로, fields 로 필요한 필드만 받을 수 있습니다. (응답에 next_cursor 포함)
     """
-    games = search_metadata_by_category(category)
-    
-    if not games:
-        # 카테고리에 해당하는 게임이 없는 경우
-        return []
-    
-    return {"games": games}
+    if limit is None and cursor is None and fields is None and sort == "default":
+        # 예전 호출 방식: 전체 목록
+        games = search_metadata_by_category(category)
+        
+        if not games:
+            # 카테고리에 해당하는 게임이 없는 경우
+            return []
+        
+        return {"games": games}
+
+    return _list_games_page(category=category, sort=sort, cursor=cursor, limit=limit, fields=fields)
+
+
+@app.get("/arcade/search")
+def search_arcade_games_endpoint(
+    q: str = Query(..., min_length=1, description="Search text (title, description, category, spec)."),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of games to return."),
+    offset: int = Query(0, ge=0, description="Number of results to skip."),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return."),
+):
+    """
+    게임 제목/설명/카테고리/사양서 전문 검색. 관련도 순으로 반환합니다. (한국어는 두 글자 단위로 부분 일치)
+    """
+    projection = _parse_fields(fields)
+    games = search_metadata(q, limit, offset)
+    return {"games": [project_fields(g, projection) for g in games]}
 
 
 @app.get("/arcade/trending")
-def get_trending_game_endpoint():
+def get_trending_game_endpoint(
+    category: Optional[str] = Query(None, description="Category leaderboard to pick from (default: all games).")
+):
     """
     트렌딩/주요 아케이드 게임 하나를 배너용으로 반환합니다.
     """
-    all_games = search_metadata_by_category('all')
+    # 트렌딩 상위 몇 개 중에서 골라 배너가 매번 같지 않도록 합니다.
+    top_games = get_ranking().top_trending(TRENDING_BANNER_POOL, category)
     
-    if not all_games:
+    if not top_games:
         # 게임이 없는 경우 404를 반환하거나 빈 객체를 반환할 수 있지만, 여기서는 404를 사용
         raise HTTPException(status_code=404, detail="No games available for trending banner.")
     
-    # plays가 가장 높은 게임을 선택하거나, 임의의 게임을 반환 (여기서는 간단히 임의 선택)
-    trending_game = random.choice(all_games)
+    trending_game = random.choice(top_games)
     
     return {"game": trending_game}
 
 
 @app.get("/user/created")
 def get_user_created_games_endpoint(
-    user_id: Optional[str] = Query(None, description="User ID to filter games by author.")
+    user_id: Optional[str] = Query(None, description="User ID to filter games by author."),
+    sort: str = Query("default", description=f"Sort order: {', '.join(SORT_ORDERS)}"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page."),
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Page size (default: all games)."),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return."),
 ):
     """
     특정 사용자가 만든 게임 목록을 반환합니다. (author 필드 사용)
@@ -1680,6 +2016,9 @@ def get_user_created_games_endpoint(
         # user_id가 없으면 빈 리스트 반환 (세션 인증이 없다는 가정 하에)
         return []
         
+    if limit is not None or cursor is not None or fields is not None or sort != "default":
+        return _list_games_page(author=user_id, sort=sort, cursor=cursor, limit=limit, fields=fields)
+
     # user_id를 author로 간주하고 검색
     games = search_metadata_by_author(user_id)
     
@@ -1698,36 +2037,70 @@ def get_user_liked_games_endpoint(
         return []
 
     # --- 실제 환경에서는 DB에서 해당 user_id의 좋아요 목록을 조회해야 합니다. ---
-    # 임시: 모든 게임을 불러와서 무작위로 2개를 '좋아요' 데이터로 반환합니다.
-    all_games = search_metadata_by_category('all')
-    
-    if not all_games:
-        return []
-
-    # 최대 2개만 선택
-    liked_games = random.sample(all_games, k=min(2, len(all_games)))
+    # 임시: 사용자별 좋아요 기록이 없으므로 좋아요 순위 상위 2개를 반환합니다.
+    liked_games = get_ranking().top_liked(2)
     
     return {"games": liked_games}
 
 
 
+def _count_game_event(game_id: str, plays: int = 0, likes: int = 0):
+    game = get_catalog().snapshot().by_id.get(game_id)
+    if game is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    counter = get_counter()
+    counter.add(game_id, plays=plays, likes=likes)
+    # DB 값 + 아직 반영되지 않은 증가분 (다른 워커의 미반영분은 포함되지 않습니다)
+    pending = counter.pending(game_id)
+    return {
+        "game_id": game_id,
+        "plays": int(game.get("plays") or 0) + pending["plays"],
+        "likes": int(game.get("likes") or 0) + pending["likes"],
+    }
+
+
+@app.post("/games/{game_id}/play")
+def play_game_endpoint(game_id: str):
+    """게임 플레이 1회를 기록합니다. DB 에는 COUNTER_FLUSH_INTERVAL 마다 모아서 반영됩니다."""
+    return _count_game_event(game_id, plays=1)
+
+
+@app.post("/games/{game_id}/like")
+def like_game_endpoint(game_id: str):
+    """게임 좋아요 1개를 기록합니다. DB 에는 COUNTER_FLUSH_INTERVAL 마다 모아서 반영됩니다."""
+    return _count_game_event(game_id, likes=1)
+
+
 @app.get("/showcase/games")
 def get_showcase_games_endpoint(
-    limit: int = Query(4, ge=1, description="Maximum number of games to return.")
+    limit: int = Query(4, ge=1, description="Maximum number of games to return."),
+    category: Optional[str] = Query(None, description="Category leaderboard (default: all games)."),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page."),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return."),
 ):
     """
-    홈페이지 쇼케이스에 표시할 게임 목록을 반환합니다.
+    홈페이지 쇼케이스에 표시할 게임 목록을 반환합니다. (트렌딩 점수 순)
+    트렌딩 순위는 계속 바뀌므로 커서는 순위 위치입니다.
     """
-    all_games = search_metadata_by_category('all')
+    try:
+        offset = int(decode_cursor(cursor, "trending")[0]) if cursor else 0
+        if offset < 0:
+            raise ValueError("잘못된 cursor 입니다.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 한 개 더 가져와서 다음 페이지가 있는지 확인합니다.
+    showcase_games = get_ranking().top_trending(limit + 1, category, offset=offset)
     
-    if not all_games:
+    if not showcase_games:
         return []
-
-    # plays 점수가 높은 순으로 정렬하거나 (실제 로직), 무작위로 선택 (임시 로직)
-    # 임시 로직: 무작위 선택 후 limit 수만큼 반환
-    showcase_games = random.sample(all_games, k=min(limit, len(all_games)))
     
-    return {"games": showcase_games}
+    next_cursor = encode_cursor("trending", [offset + limit]) if len(showcase_games) > limit else None
+    projection = _parse_fields(fields)
+    return {
+        "games": [project_fields(g, projection) for g in showcase_games[:limit]],
+        "next_cursor": next_cursor,
+    }
 
 
 
@@ -1736,16 +2109,18 @@ def get_showcase_games_endpoint(
 # uvicorn gemini:app --reload --port 8000
 
 # 서버 실행 방법 2: Python 스크립트로 직접 실행
+# 스냅샷 작업은 게임별 파일 잠금으로 보호되므로 여러 워커로 실행해도 됩니다. (UVICORN_WORKERS)
 if __name__ == "__main__":
     import uvicorn
+    workers = int(os.getenv('UVICORN_WORKERS', '1'))
     print("서버를 시작합니다... http://localhost:8000")
     uvicorn.run(
         "gemini:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,      # 코드 변경 감지
+        reload=workers == 1,      # 코드 변경 감지 (단일 워커일 때만)
         log_level="debug",  # 디버그 로그 활성화
-        workers=1        # 디버깅을 위해 단일 워커 사용
+        workers=workers
     )
 
 
@@ -6,6 +6,9 @@ from google import genai
 from google.genai import types
 from PIL import Image
 
+from llm_gateway import generate_content
+from snapshot_manager import detach_hardlink
+
 # # ⚠️ API 키가 환경 변수 'GEMINI_API_KEY'에 설정되어 있어야 합니다.
 # try:
 #     client = genai.Client()
@@ -82,10 +85,11 @@ def nano_banana_style_image_editing(
         image_config = types.GenerateContentConfig()
         
         # 4. 모델 호출 (config 매개변수 사용)
-        response = gemini_client.models.generate_content(
+        response = generate_content(
+            contents,
             model=model_name,
-            contents=contents,
-            config=image_config 
+            config=image_config,
+            client=gemini_client
         )
         
         # 5. 생성된 이미지 데이터를 추출하여 파일로 저장
@@ -97,6 +101,7 @@ def nano_banana_style_image_editing(
                 # Base64 디코딩 (응답은 Base64로 인코딩되어 돌아옵니다)
                 image_bytes = base64.b64decode(image_part.inline_data.data)
                 
+                detach_hardlink(output_filename)
                 with open(output_filename, "wb") as f:
                     f.write(image_bytes)
                 print(f"✅ 이미지 편집 완료 및 '{output_filename}'에 저장됨.")
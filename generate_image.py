@@ -10,6 +10,7 @@ import random # 예시를 위한 임시 모듈
 
 
 from base_dir import BASE_PUBLIC_DIR, GAME_DIR, CODE_PATH, DATA_PATH, SPEC_PATH, CHAT_PATH, ASSETS_PATH, ARCHIVE_LOG_PATH
+from snapshot_manager import detach_hardlink
 
 def pil_image_to_bytes(pil_img: Image.Image, format="PNG") -> bytes:
     buffered = BytesIO()
@@ -70,6 +71,7 @@ def remove_background_from_file(input_path: str, output_path: str) -> bool:
         
         if result:
             # 결과 저장
+            detach_hardlink(output_path)
             with open(output_path, 'wb') as f:
                 f.write(result)
             print(f"💾 저장 완료: {output_path}")
@@ -92,6 +94,7 @@ def generate_image(game_name, file_name, description, isBackgroundImage, width,
         nobg_data = result_image
 
     if nobg_data:        
+        detach_hardlink(file_path)
         with open(file_path, 'wb') as f:
             f.write(nobg_data)
     else:
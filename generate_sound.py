@@ -3,8 +3,10 @@ import os
 import shutil
 from base_dir import ASSETS_PATH, PROJECT_ROOT
 from classes import SoundSelecterProcessor
-from model_info_gemini import gemini_client, model_name
+from model_info_gemini import model_name
+from llm_gateway import generate_content
 from remove_code_fences_safe import remove_code_fences_safe
+from snapshot_manager import detach_hardlink
 
 
 
@@ -25,11 +27,7 @@ def generate_sounds(game_name, sound_asset_info):
     prompt = ssp.get_final_prompt(sound_asset_info)
 
     print(f"AI 모델이 사운드를 선택 중 입니다: {model_name}...")
-    response = gemini_client.models.generate_content(
-        model=model_name,
-        #config = config,
-        contents=prompt
-    )
+    response = generate_content(prompt)
     
     match_result = json.loads(remove_code_fences_safe(response.text))    
 
@@ -51,6 +49,7 @@ def generate_sounds(game_name, sound_asset_info):
         
         try:
             # 3. 파일 복사 및 이름 변경
+            detach_hardlink(destination_file_path)
             shutil.copyfile(source_file_path, destination_file_path)
             print(f"✅ 복사 완료: '{source_file_path}' -> '{destination_file_path}'")
             
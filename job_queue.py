@@ -0,0 +1,270 @@
+import asyncio
+import datetime
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from base_dir import JOBS_DB_PATH
+from tools.uuid import generate_uuid4
+
+load_dotenv()
+
+# 워커 프로세스 하나가 동시에 실행하는 작업 수
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# 대기 중인 작업이 없을 때 다시 확인하기까지의 간격(초)
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1.0'))
+# heartbeat 가 이 시간(초) 이상 갱신되지 않은 running 작업은 죽은 것으로 보고 다시 대기열에 넣습니다.
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '300'))
+# 중단된 작업을 찾는 간격(초). 프로세스마다 하나의 태스크가 이 간격으로만 쓰기 잠금을 잡습니다.
+JOB_STALE_SWEEP_INTERVAL = float(os.getenv('JOB_STALE_SWEEP_INTERVAL', str(JOB_STALE_SECONDS / 2)))
+JOB_HEARTBEAT_INTERVAL = 15
+# 재시작으로 인해 다시 실행될 수 있는 최대 횟수
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+
+# 작업 핸들러: (payload, report) -> result
+# report(stage, progress) 로 진행 상황을 기록합니다.
+JobHandler = Callable[[Dict[str, Any], Callable[[str, float], Awaitable[None]]], Awaitable[Dict[str, Any]]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at);
+"""
+
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def _now_iso():
+    return datetime.datetime.now().isoformat()
+
+
+def _connect() -> sqlite3.Connection:
+    """작업 DB 연결을 엽니다. 여러 uvicorn 워커가 공유하므로 WAL 모드를 사용합니다."""
+    global _initialized
+    db_path = JOBS_DB_PATH()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 30000")
+    if not _initialized:
+        # 여러 스레드가 처음 동시에 연결해도 스키마 초기화는 한 번만 합니다.
+        with _init_lock:
+            if not _initialized:
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.executescript(_SCHEMA)
+                _initialized = True
+    return conn
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "stage": row["stage"],
+        "progress": row["progress"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "attempts": row["attempts"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+
+def create_job(kind: str, payload: Dict[str, Any]) -> str:
+    """새 작업을 queued 상태로 등록하고 작업 ID를 반환합니다."""
+    job_id = generate_uuid4()
+    now = _now_iso()
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, status, stage, progress, payload, created_at, updated_at) "
+            "VALUES (?, ?, 'queued', 'queued', 0, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload, ensure_ascii=False), now, now)
+        )
+    finally:
+        conn.close()
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return _row_to_job(row) if row else None
+
+
+def claim_next_job(worker: str) -> Optional[Dict[str, Any]]:
+    """
+    가장 오래된 queued 작업 하나를 running 으로 바꾸고 반환합니다.
+    BEGIN IMMEDIATE 로 쓰기 잠금을 잡으므로 여러 프로세스가 같은 작업을 가져가지 않습니다.
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'running', stage = 'started', worker = ?, attempts = attempts + 1, "
+            "heartbeat = ?, updated_at = ? WHERE id = ?",
+            (worker, time.time(), _now_iso(), row["id"])
+        )
+        conn.execute("COMMIT")
+        job = _row_to_job(row)
+        job["payload"] = json.loads(row["payload"])
+        return job
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def update_job(job_id: str, stage: Optional[str] = None, progress: Optional[float] = None):
+    """진행 단계/진행률을 기록하고 heartbeat 를 갱신합니다."""
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET stage = COALESCE(?, stage), progress = COALESCE(?, progress), "
+            "heartbeat = ?, updated_at = ? WHERE id = ?",
+            (stage, progress, time.time(), _now_iso(), job_id)
+        )
+    finally:
+        conn.close()
+
+
+def finish_job(job_id: str, result: Dict[str, Any]):
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = 'done', stage = 'done', progress = 1, result = ?, updated_at = ? WHERE id = ?",
+            (json.dumps(result, ensure_ascii=False), _now_iso(), job_id)
+        )
+    finally:
+        conn.close()
+
+
+def fail_job(job_id: str, error: str):
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+            (error, _now_iso(), job_id)
+        )
+    finally:
+        conn.close()
+
+
+def requeue_stale_jobs() -> int:
+    """
+    heartbeat 가 끊긴 running 작업(워커가 죽거나 재시작된 경우)을 다시 queued 로 돌립니다.
+    재시도 한도를 넘긴 작업은 failed 로 처리합니다.
+    """
+    deadline = time.time() - JOB_STALE_SECONDS
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = '워커 재시작으로 작업이 중단되었습니다.', updated_at = ? "
+            "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+            (_now_iso(), deadline, JOB_MAX_ATTEMPTS)
+        )
+        cur = conn.execute(
+            "UPDATE jobs SET status = 'queued', stage = 'requeued', worker = NULL, updated_at = ? "
+            "WHERE status = 'running' AND heartbeat < ?",
+            (_now_iso(), deadline)
+        )
+        conn.execute("COMMIT")
+        if cur.rowcount:
+            print(f"🔁 중단된 작업 {cur.rowcount}개를 다시 대기열에 넣었습니다.")
+        return cur.rowcount
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+async def _heartbeat(job_id: str):
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+        await asyncio.to_thread(update_job, job_id)
+
+
+async def _stale_sweep_loop():
+    # 작업 워커마다 폴링할 때 훑으면 1초마다 BEGIN IMMEDIATE 를 잡으므로, 프로세스당 이 태스크 하나만 주기적으로 훑습니다.
+    while True:
+        try:
+            await asyncio.to_thread(requeue_stale_jobs)
+        except Exception as e:
+            print(f"❌ 중단된 작업 확인 오류: {e}")
+        await asyncio.sleep(JOB_STALE_SWEEP_INTERVAL)
+
+
+async def _worker_loop(worker: str, handlers: Dict[str, JobHandler]):
+    while True:
+        try:
+            job = await asyncio.to_thread(claim_next_job, worker)
+        except Exception as e:
+            print(f"❌ 작업 대기열 조회 오류: {e}")
+            job = None
+
+        if job is None:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            continue
+
+        job_id = job["id"]
+        handler = handlers.get(job["kind"])
+        if handler is None:
+            await asyncio.to_thread(fail_job, job_id, f"알 수 없는 작업 종류: {job['kind']}")
+            continue
+
+        async def report(stage: str, progress: float):
+            await asyncio.to_thread(update_job, job_id, stage, progress)
+
+        heartbeat_task = asyncio.create_task(_heartbeat(job_id))
+        try:
+            result = await handler(job["payload"], report)
+            await asyncio.to_thread(finish_job, job_id, result)
+        except asyncio.CancelledError:
+            # 서버 종료: running 상태로 남겨두면 재시작 후 requeue_stale_jobs 가 다시 실행합니다.
+            raise
+        except Exception as e:
+            print(f"❌ 작업 {job_id} 실패: {e}")
+            await asyncio.to_thread(fail_job, job_id, str(e))
+        finally:
+            heartbeat_task.cancel()
+
+
+def start_job_workers(handlers: Dict[str, JobHandler], count: int = JOB_WORKERS):
+    """현재 이벤트 루프에 작업 워커 태스크들과 중단된 작업 확인 태스크를 띄우고 태스크 리스트를 반환합니다."""
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    tasks = [asyncio.create_task(_worker_loop(f"{prefix}:{i}", handlers)) for i in range(count)]
+    tasks.append(asyncio.create_task(_stale_sweep_loop()))
+    return tasks
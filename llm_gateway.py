@@ -0,0 +1,100 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from dotenv import load_dotenv
+
+from model_info_gemini import gemini_client, model_name
+
+load_dotenv()
+
+# 동시에 Gemini 에 보낼 수 있는 최대 요청 수 (워커 프로세스 단위)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+
+# 모든 LLM 호출은 이 스레드 풀에서 실행됩니다.
+# google-genai 의 동기 클라이언트를 그대로 사용하면서도 이벤트 루프는 막지 않습니다.
+_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+
+# 동기 호출 경로도 같은 한도를 공유하도록 세마포어로 묶습니다.
+_semaphore = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+
+def _call_generate_content(contents, model, config, client):
+    with _semaphore:
+        kwargs = {"model": model, "contents": contents}
+        if config is not None:
+            kwargs["config"] = config
+        return client.models.generate_content(**kwargs)
+
+
+def generate_content(contents, model=None, config=None, client=None):
+    """
+    동기 코드(스레드, 스크립트)에서 사용하는 Gemini 호출 진입점입니다.
+
+    Args:
+        contents: 모델에 전달할 프롬프트 (문자열 또는 Part 리스트).
+        model: 사용할 모델 이름 (None 이면 model_info_gemini.model_name).
+        config: types.GenerateContentConfig (선택).
+        client: 사용할 genai.Client (None 이면 공용 gemini_client).
+
+    Returns:
+        GenerateContentResponse
+    """
+    return _call_generate_content(contents, model or model_name, config, client or gemini_client)
+
+
+async def generate_content_async(contents, model=None, config=None, client=None):
+    """
+    FastAPI 엔드포인트 등 비동기 코드에서 사용하는 Gemini 호출 진입점입니다.
+    실제 호출은 제한된 스레드 풀에서 실행되므로 이벤트 루프가 멈추지 않습니다.
+    """
+    loop = asyncio.get_running_loop()
+    call = partial(_call_generate_content, contents, model or model_name, config, client or gemini_client)
+    return await loop.run_in_executor(_executor, call)
+
+
+_STREAM_END = object()
+
+
+def _pump_stream(contents, model, config, client, loop, queue, stop_event):
+    """스레드에서 동기 스트림을 읽어 이벤트 루프의 큐로 청크를 넘깁니다."""
+    with _semaphore:
+        try:
+            kwargs = {"model": model, "contents": contents}
+            if config is not None:
+                kwargs["config"] = config
+            for chunk in client.models.generate_content_stream(**kwargs):
+                if stop_event.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
+
+
+async def generate_content_stream_async(contents, model=None, config=None, client=None):
+    """
+    generate_content_stream 의 비동기 버전입니다. 응답 청크를 받는 즉시 yield 합니다.
+    소비자가 중간에 멈추면(break/취소) 스트림 읽기도 중단됩니다.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop_event = threading.Event()
+    future = loop.run_in_executor(
+        _executor,
+        partial(_pump_stream, contents, model or model_name, config, client or gemini_client, loop, queue, stop_event)
+    )
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop_event.set()
+    await future
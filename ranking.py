@@ -0,0 +1,237 @@
+import math
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from all_games_metadata import add_change_listener, get_catalog, trend_score_at
+
+load_dotenv()
+
+# 트렌딩 점수의 반감기(시간). 이 시간이 지난 플레이/좋아요는 가중치가 절반이 됩니다.
+RANKING_HALF_LIFE_HOURS = float(os.getenv('RANKING_HALF_LIFE_HOURS', '24'))
+# 플레이 1회 / 좋아요 1개의 가중치
+RANKING_PLAY_WEIGHT = float(os.getenv('RANKING_PLAY_WEIGHT', '1'))
+RANKING_LIKE_WEIGHT = float(os.getenv('RANKING_LIKE_WEIGHT', '5'))
+# /arcade/trending 배너를 고를 트렌딩 상위 게임 수
+TRENDING_BANNER_POOL = int(os.getenv('TRENDING_BANNER_POOL', '5'))
+
+TREND_WEIGHTS = (RANKING_PLAY_WEIGHT, RANKING_LIKE_WEIGHT)
+
+# 가중치 지수가 이 값을 넘으면 기준 시각을 옮겨 float 오버플로를 막습니다.
+_MAX_EXPONENT = 500.0
+
+
+class RankingEngine:
+    """
+    트렌딩/좋아요 순위를 점진적으로 유지하는 정렬 인덱스입니다.
+
+    트렌딩 점수는 forward decay 방식입니다. 시각 t 의 이벤트는 exp(λ·(t - 기준 시각)) 만큼 더해지므로,
+    시간이 흘러도 기존 점수를 다시 계산할 필요 없이 이벤트가 올 때 해당 게임의 키만 옮기면 됩니다.
+    카운터를 DB 에 반영할 때 그 시각까지 감쇠된 점수(trend_score, trend_at)를 같이 저장하므로, 프로세스를 다시 시작해도
+    예전 플레이/좋아요는 지난 시간만큼 줄어든 채로 이어집니다. 기본 점수는 저장된 점수를 기준 시각으로 옮긴 값입니다.
+
+    전체/카테고리별 트렌딩, 좋아요 순 목록을 (정렬 키, 게임 id) 리스트로 들고 있어 상위 K 개 조회는 O(K) 입니다.
+    이 프로세스의 메타데이터 변경(게임 추가/수정/삭제, 카운터 반영)도 해당 게임의 키만 옮기고,
+    다른 프로세스가 메타데이터를 바꿨을 때(CatalogState.generation 이 바뀔 때)만 통째로 다시 만듭니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 초당 감쇠율 λ (counters.py 가 DB 의 trend_score 를 갱신할 때도 씁니다)
+        self.decay = math.log(2) / (RANKING_HALF_LIFE_HOURS * 3600)
+        self._landmark = time.time()
+        self._generation = None
+
+        self._games: Dict[str, Dict[str, Any]] = {}
+        self._position: Dict[str, int] = {}
+        # DB 에 저장된 (trend_score, trend_at)
+        self._trend: Dict[str, tuple] = {}
+        # 실시간으로 기록된 이벤트 (메타데이터를 다시 읽어도 유지됩니다)
+        self._boost: Dict[str, float] = {}
+        self._live_likes: Dict[str, int] = {}
+
+        self._score: Dict[str, float] = {}
+        self._likes: Dict[str, int] = {}
+        self._trending: List[tuple] = []
+        self._trending_by_category: Dict[str, List[tuple]] = {}
+        self._liked: List[tuple] = []
+
+        add_change_listener(self._on_change)
+
+    def _category(self, game_id: str) -> str:
+        return str(self._games[game_id].get('category', '')).lower()
+
+    def _trend_key(self, game_id: str):
+        return (-self._score[game_id], self._position[game_id], game_id)
+
+    def _like_key(self, game_id: str):
+        return (-self._likes[game_id], self._position[game_id], game_id)
+
+    @staticmethod
+    def _remove(keys: List[tuple], key: tuple):
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    def _rescore(self, game_id: str):
+        # DB 에 저장된 트렌딩 점수를 기준 시각으로 옮긴 값(기본 점수)과 실시간 이벤트로 점수를 계산합니다.
+        item = self._games[game_id]
+        plays = _to_int(item.get('plays'))
+        likes = _to_int(item.get('likes'))
+        base = trend_score_at(
+            self._trend.get(game_id, (None, None)), plays, likes, self._landmark, self.decay, TREND_WEIGHTS
+        )
+        self._score[game_id] = base + self._boost.get(game_id, 0.0)
+        self._likes[game_id] = likes + self._live_likes.get(game_id, 0)
+
+    def _unlink(self, game_id: str):
+        # 게임의 현재 키를 모든 정렬 인덱스에서 뺍니다. (점수/카테고리를 바꾸기 전에 호출)
+        key = self._trend_key(game_id)
+        self._remove(self._trending, key)
+        self._remove(self._trending_by_category.get(self._category(game_id), []), key)
+        self._remove(self._liked, self._like_key(game_id))
+
+    def _link(self, game_id: str):
+        key = self._trend_key(game_id)
+        insort(self._trending, key)
+        insort(self._trending_by_category.setdefault(self._category(game_id), []), key)
+        insort(self._liked, self._like_key(game_id))
+
+    def _on_change(self, game_id: str, rowid: Optional[int], entry: Optional[Dict[str, Any]], trend: Optional[tuple],
+                   flushed: Optional[Dict[str, int]] = None):
+        """
+        이 프로세스에서 게임 하나가 추가/수정/삭제되었을 때 (all_games_metadata 의 변경 알림) 해당 게임의 키만 옮깁니다.
+        카운터 반영(flushed)이면 DB 에 들어간 만큼을 실시간 값에서 같은 잠금 안에서 빼므로, 새 trend_score 와
+        실시간 값이 함께 보이는(두 번 세는) 순간이 없습니다.
+        """
+        with self._lock:
+            if self._generation is None:
+                # 아직 인덱스를 만들지 않았습니다. 처음 조회할 때 최신 상태로 만듭니다.
+                return
+            if game_id in self._games:
+                self._unlink(game_id)
+            if entry is None:
+                for table in (self._games, self._position, self._trend, self._score, self._likes, self._boost, self._live_likes):
+                    table.pop(game_id, None)
+                return
+            self._games[game_id] = entry
+            self._position[game_id] = rowid
+            self._trend[game_id] = trend
+            if flushed:
+                self._absorb(game_id, flushed, trend[1])
+            self._rescore(game_id)
+            self._link(game_id)
+
+    def _absorb(self, game_id: str, flushed: Dict[str, int], flushed_at: float):
+        # DB 에는 반영 시각(trend_at)의 이벤트로 더해졌으므로 같은 시각의 가중치로 뺍니다.
+        plays, likes = flushed.get('plays', 0), flushed.get('likes', 0)
+        if game_id in self._boost:
+            amount = _weight(plays, likes) * math.exp(self.decay * (flushed_at - self._landmark))
+            self._boost[game_id] = max(0.0, self._boost[game_id] - amount)
+        if likes and game_id in self._live_likes:
+            self._live_likes[game_id] = max(0, self._live_likes[game_id] - likes)
+
+    def _sync(self):
+        # 다른 프로세스가 메타데이터를 바꿨을 때만 기본 점수로 정렬 인덱스를 통째로 다시 만듭니다.
+        # (이 프로세스의 변경은 _on_change 가 바로 반영합니다)
+        state = get_catalog().snapshot()
+        if state.generation == self._generation:
+            return
+        self._generation = state.generation
+        self._games = dict(state.by_id)
+        self._position = dict(state.position)
+        self._trend = dict(state.trend)
+        # 다른 프로세스가 방금 저장한 trend_at 이 기준 시각보다 너무 뒤라면 기준 시각부터 옮깁니다.
+        now = time.time()
+        if self.decay * (now - self._landmark) > _MAX_EXPONENT:
+            self._renormalize(now)
+        self._score = {}
+        self._likes = {}
+        for game_id in self._games:
+            self._rescore(game_id)
+
+        self._trending = sorted(self._trend_key(g) for g in self._games)
+        self._trending_by_category = {}
+        for key in self._trending:
+            self._trending_by_category.setdefault(self._category(key[2]), []).append(key)
+        self._liked = sorted(self._like_key(g) for g in self._games)
+
+    def _renormalize(self, now: float):
+        # 모든 점수에 같은 배율을 곱하므로 순서는 바뀌지 않습니다. 정렬 키만 새 값으로 바꿔 둡니다.
+        factor = math.exp(-self.decay * (now - self._landmark))
+        # 기본 점수는 _rescore 가 새 기준 시각으로 계산하므로 실시간 이벤트만 줄이면 됩니다.
+        self._landmark = now
+        self._boost = {g: v * factor for g, v in self._boost.items()}
+        for game_id in self._score:
+            self._score[game_id] *= factor
+        self._trending = [self._trend_key(key[2]) for key in self._trending]
+        self._trending_by_category = {
+            category: [self._trend_key(key[2]) for key in keys]
+            for category, keys in self._trending_by_category.items()
+        }
+
+    def record(self, game_id: str, plays: int = 0, likes: int = 0, at: Optional[float] = None):
+        """플레이/좋아요 이벤트를 반영합니다. 해당 게임의 정렬 키만 옮기므로 O(log n + 이동 비용) 입니다."""
+        at = at or time.time()
+        with self._lock:
+            self._sync()
+            if game_id not in self._games:
+                return
+            if self.decay * (at - self._landmark) > _MAX_EXPONENT:
+                self._renormalize(at)
+
+            delta = _weight(plays, likes) * math.exp(self.decay * (at - self._landmark))
+            if delta:
+                old_key = self._trend_key(game_id)
+                category_keys = self._trending_by_category.setdefault(self._category(game_id), [])
+                self._remove(self._trending, old_key)
+                self._remove(category_keys, old_key)
+                self._boost[game_id] = self._boost.get(game_id, 0.0) + delta
+                self._score[game_id] += delta
+                new_key = self._trend_key(game_id)
+                insort(self._trending, new_key)
+                insort(category_keys, new_key)
+
+            if likes:
+                self._remove(self._liked, self._like_key(game_id))
+                self._live_likes[game_id] = self._live_likes.get(game_id, 0) + likes
+                self._likes[game_id] += likes
+                insort(self._liked, self._like_key(game_id))
+
+    def top_trending(self, k: int, category: Optional[str] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """트렌딩 점수 상위 k 개 게임 (category 가 있으면 해당 카테고리 안에서, offset 번째부터)."""
+        with self._lock:
+            self._sync()
+            if category and category.lower() != "all":
+                keys = self._trending_by_category.get(category.lower(), [])
+            else:
+                keys = self._trending
+            return [dict(self._games[key[2]]) for key in keys[offset:offset + k]]
+
+    def top_liked(self, k: int) -> List[Dict[str, Any]]:
+        """좋아요 수 상위 k 개 게임."""
+        with self._lock:
+            self._sync()
+            return [dict(self._games[key[2]]) for key in self._liked[:k]]
+
+
+def _weight(plays: int, likes: int) -> float:
+    return RANKING_PLAY_WEIGHT * plays + RANKING_LIKE_WEIGHT * likes
+
+
+def _to_int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+_engine = RankingEngine()
+
+
+def get_ranking() -> RankingEngine:
+    return _engine
@@ -1,116 +1,289 @@
 import json
+import os
+import struct
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Literal
+from typing import Literal, Optional
+
+from dotenv import load_dotenv
 
 from realtime import Dict, List, Union
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+load_dotenv()
+
 # 'from' 필드에 들어갈 수 있는 값의 타입을 명확히 정의
 Sender = Literal["user", "bot"]
 
-def save_chat(file_path: str, sender: Sender, text: str):
-    """
-    채팅 내용을 지정된 JSON 파일에 새로운 배열 항목으로 추가합니다.
+# 채팅 기록 저장 방식
+#   chat.jsonl : 메시지 한 줄에 하나씩 추가만 하는 로그 (추가할 때 기존 내용을 읽거나 다시 쓰지 않습니다)
+#   chat.idx   : 메시지마다 chat.jsonl 안의 시작 위치(8바이트 정수)를 차례로 적은 색인. 마지막 N 개를 바로 읽을 때 사용
+#   chat.lock  : 여러 워커/스레드의 추가를 직렬화하는 잠금 파일
+# 함수들은 예전처럼 chat.json 경로를 받고, 같은 폴더의 위 파일들을 사용합니다.
+CHAT_LOG_SUFFIX = ".jsonl"
+CHAT_INDEX_SUFFIX = ".idx"
+CHAT_LOCK_SUFFIX = ".lock"
+_OFFSET = struct.Struct("<Q")
 
-    Args:
-        file_path (str): chat.json 파일의 경로.
-        sender (Sender): 메시지 발신자 ("user" 또는 "bot").
-        text (str): 채팅 내용.
-    """
-    
+# 압축(compact_chat) 시 남길 최대 메시지 수 (0 이면 모두 보관)
+CHAT_MAX_ENTRIES = int(os.getenv('CHAT_MAX_ENTRIES', '0'))
+# 서버가 모든 게임의 채팅 로그를 정리하는 주기(시간). 0 이면 하지 않습니다.
+CHAT_COMPACT_INTERVAL_HOURS = float(os.getenv('CHAT_COMPACT_INTERVAL_HOURS', '24'))
+
+
+def _chat_files(file_path):
     file = Path(file_path)
-    
-    # 1. 파일이 없으면 초기 JSON 구조 생성 및 저장
-    if not file.exists():
-        initial_data = {"chat": []}
+    return file, file.with_suffix(CHAT_LOG_SUFFIX), file.with_suffix(CHAT_INDEX_SUFFIX), file.with_suffix(CHAT_LOCK_SUFFIX)
+
+
+@contextmanager
+def _chat_lock(lock_path: Path):
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
         try:
-            file.parent.mkdir(parents=True, exist_ok=True) # 부모 폴더가 없다면 생성
-            with open(file, 'w', encoding='utf-8') as f:
-                json.dump(initial_data, f, ensure_ascii=False, indent=4)
-            #print(f"💡 {file_path} 파일이 새로 생성되었습니다.")
-        except Exception as e:
-            print(f"❌ 파일 생성 오류: {e}")
-            return
-
-    # 2. 파일에서 기존 JSON 데이터 읽어오기
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _encode_entry(entry) -> bytes:
+    return (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+
+
+def _write_log(log_path: Path, index_path: Path, entries):
+    """entries 로 chat.jsonl / chat.idx 를 새로 만들어 원자적으로 교체합니다."""
+    tmp_log = log_path.with_name(f".{log_path.name}.{os.getpid()}.tmp")
+    tmp_index = index_path.with_name(f".{index_path.name}.{os.getpid()}.tmp")
+    offsets = []
+    with open(tmp_log, 'wb') as f:
+        for entry in entries:
+            offsets.append(f.tell())
+            f.write(_encode_entry(entry))
+        f.flush()
+        os.fsync(f.fileno())
+    with open(tmp_index, 'wb') as f:
+        f.write(b"".join(_OFFSET.pack(o) for o in offsets))
+    # 색인을 먼저 바꿔도 로그 크기와 맞지 않으면 읽을 때 다시 만들어지므로 안전합니다.
+    os.replace(tmp_index, index_path)
+    os.replace(tmp_log, log_path)
+
+
+def _migrate_json_chat(file: Path, log_path: Path, index_path: Path):
+    """예전 chat.json 을 chat.jsonl 로 한 번 옮기고, chat.json 은 chat.json.migrated 로 이름을 바꿉니다. (잠금 안에서 호출)"""
+    if log_path.exists() or not file.exists():
+        return
     try:
         with open(file, 'r', encoding='utf-8') as f:
-            # json.load()로 파일 내용을 파이썬 딕셔너리로 읽습니다.
             data = json.load(f)
-            
+        entries = data.get("chat") if isinstance(data, dict) else None
+        if not isinstance(entries, list):
+            entries = []
     except json.JSONDecodeError:
-        print(f"❌ 오류: {file_path} 파일의 JSON 형식이 올바르지 않아 초기화합니다.")
-        data = {"chat": []}
-        
-    except Exception as e:
-        print(f"❌ 파일 읽기 오류: {e}")
-        return
+        print(f"❌ 오류: {file} 파일의 JSON 형식이 올바르지 않아 빈 기록으로 옮깁니다.")
+        entries = []
+    _write_log(log_path, index_path, entries)
+    file.replace(file.with_name(file.name + ".migrated"))
+    print(f"📦 {file.name} → {log_path.name} 이전 완료 ({len(entries)}개)")
+
+
+def _scan_log(log_path: Path):
+    """chat.jsonl 을 처음부터 읽어 (시작 위치, 메시지) 리스트를 만듭니다. 깨진 줄(중간에 끊긴 마지막 줄 등)은 건너뜁니다."""
+    result = []
+    if not log_path.exists():
+        return result
+    with open(log_path, 'rb') as f:
+        offset = 0
+        for line in f:
+            start, offset = offset, offset + len(line)
+            if not line.endswith(b"\n"):
+                break
+            try:
+                result.append((start, json.loads(line)))
+            except json.JSONDecodeError:
+                continue
+    return result
+
+
+def _read_offsets(log_path: Path, index_path: Path) -> Optional[List[int]]:
+    """chat.idx 를 읽습니다. 로그와 맞지 않으면(추가 도중 중단 등) None."""
+    try:
+        raw = index_path.read_bytes()
+        size = log_path.stat().st_size
+    except FileNotFoundError:
+        return None
+    if len(raw) % _OFFSET.size:
+        return None
+    offsets = [o for (o,) in _OFFSET.iter_unpack(raw)]
+    if offsets and offsets[-1] >= size:
+        return None
+    if not offsets and size:
+        return None
+    # 마지막 메시지가 로그 끝까지 이어지는지 확인 (색인에 없는 줄이 뒤에 있으면 다시 만듭니다)
+    if offsets:
+        with open(log_path, 'rb') as f:
+            f.seek(offsets[-1])
+            if offsets[-1] + len(f.readline()) != size:
+                return None
+    return offsets
+
+
+def _rebuild_index(log_path: Path, index_path: Path):
+    """로그를 훑어 색인을 다시 만듭니다. 끝이 끊긴 줄은 잘라 냅니다. (잠금 안에서 호출)"""
+    scanned = _scan_log(log_path)
+    end = 0
+    if scanned:
+        with open(log_path, 'rb') as f:
+            f.seek(scanned[-1][0])
+            end = scanned[-1][0] + len(f.readline())
+    if log_path.exists() and log_path.stat().st_size != end:
+        with open(log_path, 'r+b') as f:
+            f.truncate(end)
+    with open(index_path, 'wb') as f:
+        f.write(b"".join(_OFFSET.pack(o) for o, _ in scanned))
+    print(f"🔧 채팅 색인을 다시 만들었습니다: {log_path}")
+
+
+def save_chat(file_path: str, sender: Sender, text: str):
+    """
+    채팅 내용을 기록에 한 줄 추가합니다. 기존 기록을 읽거나 다시 쓰지 않으므로 기록 길이와 상관없이 일정한 시간이 걸립니다.
+
+    Args:
+        file_path (str): chat.json 파일의 경로. (같은 폴더의 chat.jsonl / chat.idx 에 저장)
+        sender (Sender): 메시지 발신자 ("user" 또는 "bot").
+        text (str): 채팅 내용.
+    """
+    file, log_path, index_path, lock_path = _chat_files(file_path)
 
-    # 3. 새로운 채팅 항목 생성 및 배열에 추가
     new_entry = {
         "from": sender,
         "text": text
     }
-    
-    # 'chat' 배열이 있는지 확인하고 배열이 아니면 초기화
-    if "chat" not in data or not isinstance(data["chat"], list):
-         data["chat"] = []
-         
-    data["chat"].append(new_entry)
+    line = _encode_entry(new_entry)
 
-    # 4. 수정된 데이터를 파일에 다시 덮어쓰기
     try:
-        # 'w' 모드로 파일을 다시 열어 기존 내용을 덮어씁니다.
-        with open(file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-            
-        #print(f"✅ 채팅 기록 추가 성공: [{sender}] '{text[:20]}...' -> {file_path}")
+        with _chat_lock(lock_path):
+            _migrate_json_chat(file, log_path, index_path)
+            if log_path.exists() and _read_offsets(log_path, index_path) is None:
+                _rebuild_index(log_path, index_path)
+
+            # 로그에 먼저 쓰고 색인을 나중에 씁니다. 그 사이에 죽으면 다음 읽기/추가에서 색인을 다시 만듭니다.
+            with open(log_path, 'ab') as f:
+                offset = f.tell()
+                f.write(line)
+            with open(index_path, 'ab') as f:
+                f.write(_OFFSET.pack(offset))
+
         print(f"✅ 채팅 기록 추가 성공: [{sender}] '{text[:20]}...'")
-        
+
     except Exception as e:
         print(f"❌ 파일 쓰기 오류: {e}")
 
 
 
-def load_chat(file_path: str) -> Union[Dict[str, List[Dict[str, str]]], None]:
+def load_chat(file_path: str, last: Optional[int] = None) -> Union[Dict[str, List[Dict[str, str]]], None]:
     """
-    지정된 경로의 JSON 파일에서 채팅 내용을 불러옵니다.
+    채팅 기록을 불러옵니다.
 
     Args:
         file_path (str): chat.json 파일의 경로.
+        last (int, optional): 주어지면 마지막 last 개 메시지만 읽습니다. (색인으로 바로 찾아가므로 앞부분은 읽지 않습니다)
 
     Returns:
         Union[Dict[str, List[Dict[str, str]]], None]: 
-        파일 내용이 담긴 딕셔너리 ({"chat": [...]}) 또는 오류 시 None.
+        채팅 내용이 담긴 딕셔너리 ({"chat": [...]}) 또는 오류 시 None.
     """
-    file = Path(file_path)
+    file, log_path, index_path, lock_path = _chat_files(file_path)
 
-    # 1. 파일 존재 여부 확인
-    if not file.exists():
-        print(f"⚠️ 경고: 채팅 파일 '{file_path}'이 존재하지 않습니다. 빈 데이터 반환.")
-        return {"chat": []} # 파일이 없으면 빈 채팅 구조 반환
-    
-    # 2. 파일 읽기 및 JSON 파싱
     try:
-        with open(file, 'r', encoding='utf-8') as f:
-            # json.load()로 파일 내용을 파이썬 딕셔너리로 읽습니다.
-            data = json.load(f)
-            
-            # 'chat' 키가 없거나 리스트가 아니면 빈 구조 반환 (데이터 무결성 확인)
-            if not isinstance(data.get("chat"), list):
-                print(f"⚠️ 경고: '{file_path}' 파일의 'chat' 키가 유효하지 않습니다. 빈 구조 반환.")
-                return {"chat": []}
-                
-            return data
-            
-    except json.JSONDecodeError:
-        print(f"❌ 오류: '{file_path}' 파일의 JSON 형식이 올바르지 않습니다.")
-        return None
-        
+        if not log_path.exists():
+            if not file.exists():
+                print(f"⚠️ 경고: 채팅 파일 '{file_path}'이 존재하지 않습니다. 빈 데이터 반환.")
+                return {"chat": []} # 파일이 없으면 빈 채팅 구조 반환
+            with _chat_lock(lock_path):
+                _migrate_json_chat(file, log_path, index_path)
+
+        offsets = _read_offsets(log_path, index_path)
+        if offsets is None:
+            with _chat_lock(lock_path):
+                if _read_offsets(log_path, index_path) is None:
+                    _rebuild_index(log_path, index_path)
+            offsets = _read_offsets(log_path, index_path) or []
+
+        start = offsets[-last] if last and last < len(offsets) else 0
+        chat = []
+        with open(log_path, 'rb') as f:
+            f.seek(start)
+            # 색인의 마지막 위치 이후(다른 워커가 방금 추가한 줄)까지 읽되, 끝이 끊긴 줄은 무시합니다.
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    chat.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        if last:
+            chat = chat[-last:]
+        return {"chat": chat}
+
     except Exception as e:
         print(f"❌ 파일 읽기 중 알 수 없는 오류가 발생했습니다: {e}")
         return None
 
 
+def compact_chat(file_path: str, max_entries: Optional[int] = None) -> int:
+    """
+    채팅 로그를 정리합니다. 깨진 줄을 없애고 색인을 다시 만들며, max_entries(기본 CHAT_MAX_ENTRIES)가 있으면 오래된 메시지를 잘라 냅니다.
+    남은 메시지 수를 반환합니다.
+    """
+    max_entries = CHAT_MAX_ENTRIES if max_entries is None else max_entries
+    file, log_path, index_path, lock_path = _chat_files(file_path)
+    with _chat_lock(lock_path):
+        _migrate_json_chat(file, log_path, index_path)
+        if not log_path.exists():
+            return 0
+        entries = [entry for _, entry in _scan_log(log_path)]
+        if max_entries and len(entries) > max_entries:
+            entries = entries[-max_entries:]
+        _write_log(log_path, index_path, entries)
+    return len(entries)
+
+
+def compact_all_chats(root: Path) -> Dict[str, int]:
+    """root 아래 모든 게임 폴더의 채팅 로그를 정리합니다."""
+    results = {}
+    if not root.exists():
+        return results
+    for game_dir in root.iterdir():
+        if not game_dir.is_dir():
+            continue
+        chat_file = game_dir / "chat.json"
+        if chat_file.with_suffix(CHAT_LOG_SUFFIX).exists() or chat_file.exists():
+            try:
+                results[game_dir.name] = compact_chat(chat_file)
+            except Exception as e:
+                print(f"❌ 채팅 기록 정리 실패 ({game_dir.name}): {e}")
+    return results
+
+
 
 # --- 실행 예시 ---
 if __name__ == "__main__":
@@ -127,8 +300,4 @@ if __name__ == "__main__":
     save_chat(FILE_PATH, "user", "이제 비행기 게임을 만들어줘. 파일이 계속 업데이트 되고 있죠?")
     
     print("\n--- 최종 파일 내용 확인 ---")
-    try:
-        with open(FILE_PATH, 'r', encoding='utf-8') as f:
-            print(f.read())
-    except:
-        print("파일 읽기 실패.")
\ No newline at end of file
+    print(load_chat(FILE_PATH))
\ No newline at end of file
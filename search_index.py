@@ -0,0 +1,111 @@
+import os
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from base_dir import SPEC_PATH
+
+load_dotenv()
+
+# 게임 검색용 전문 색인 (all_games_metadata.db 안의 FTS5 테이블)
+# FTS5 기본 토크나이저는 한국어 단어를 통째로 한 토큰으로 보므로 "게임" 으로 "슈팅게임을" 을 찾을 수 없습니다.
+# 그래서 넣기 전에 직접 토큰화합니다: 한글/CJK 는 두 글자씩 겹치는 bigram, 그 외(영문/숫자)는 단어 단위.
+# 이렇게 만든 토큰을 공백으로 이어 저장하면 기본 토크나이저가 그대로 나눠서 색인합니다.
+# 색인 행의 rowid 는 games 테이블의 rowid 와 같습니다. (rowid 로 지워야 전체를 훑지 않습니다)
+# prefix 색인은 마지막 검색어의 접두어 검색(입력 중인 단어, 한 글자 한글)을 빠르게 합니다.
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS games_fts USING fts5(title, body, prefix='1 2 3');
+"""
+
+# bm25 로 순위를 매길 최대 후보 수. "게임" 처럼 거의 모든 게임에 있는 검색어는 일치 항목 전부에 점수를 매기면
+# 수만 개에서 수십 ms 가 걸리므로, 최근에 추가된 일치 항목 이만큼만 점수를 매깁니다.
+SEARCH_CANDIDATE_LIMIT = int(os.getenv('SEARCH_CANDIDATE_LIMIT', '1000'))
+
+# 제목이 일치하면 본문(설명/카테고리/사양서)보다 점수를 더 줍니다. (bm25 열 가중치: title, body)
+_TITLE_WEIGHT = 5.0
+_BODY_WEIGHT = 1.0
+
+# 사양서는 앞부분만 색인합니다. (게임 성격은 대부분 앞에 있고, 색인 크기를 제한하기 위해)
+SPEC_INDEX_MAX_CHARS = 20000
+
+_CJK = "ᄀ-ᇿ㄰-㆏가-힣぀-ヿ㐀-䶿一-鿿"
+_RUN_PATTERN = re.compile(f"([{_CJK}]+)|([^\\W_{_CJK}]+)")
+
+
+def tokenize(text: str) -> List[str]:
+    """검색용 토큰 리스트. 한글/CJK 구간은 bigram (한 글자면 그대로), 그 외는 소문자 단어."""
+    tokens = []
+    for cjk, word in _RUN_PATTERN.findall((text or "").lower()):
+        if word:
+            tokens.append(word)
+        elif len(cjk) == 1:
+            tokens.append(cjk)
+        else:
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return tokens
+
+
+def init_search_index(conn: sqlite3.Connection):
+    conn.executescript(_SCHEMA)
+
+
+def _read_spec(game_id: str) -> str:
+    try:
+        with open(SPEC_PATH(game_id), 'r', encoding='utf-8') as f:
+            return f.read(SPEC_INDEX_MAX_CHARS)
+    except (OSError, ValueError):
+        return ""
+
+
+def index_game(conn: sqlite3.Connection, rowid: int, entry: Dict[str, Any], spec: Optional[str] = None):
+    """
+    게임 하나(games 테이블의 rowid)의 색인을 교체합니다. spec 이 없으면 게임 폴더의 spec.md 를 읽습니다.
+    (호출자의 트랜잭션 안에서 실행)
+    """
+    if spec is None:
+        spec = _read_spec(entry['id'])
+    title = " ".join(tokenize(str(entry.get('game_title') or '')))
+    body = " ".join(tokenize(" ".join([
+        str(entry.get('description') or ''),
+        str(entry.get('category') or ''),
+        spec,
+    ])))
+    conn.execute("DELETE FROM games_fts WHERE rowid = ?", (rowid,))
+    conn.execute("INSERT INTO games_fts (rowid, title, body) VALUES (?, ?, ?)", (rowid, title, body))
+
+
+def remove_game(conn: sqlite3.Connection, rowid: int):
+    conn.execute("DELETE FROM games_fts WHERE rowid = ?", (rowid,))
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    검색어를 FTS5 MATCH 식으로 바꿉니다. 모든 토큰이 들어 있는 게임만 찾습니다. (AND)
+    마지막 토큰은 접두어 검색이라 입력 중인 단어나 한 글자 한글도 찾을 수 있습니다.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    quoted = ['"' + t.replace('"', '""') + '"' for t in tokens]
+    quoted[-1] += "*"
+    return " AND ".join(quoted)
+
+
+def search_ids(conn: sqlite3.Connection, query: str, limit: int = 20, offset: int = 0) -> List[str]:
+    """관련도(bm25) 순으로 게임 id 리스트를 반환합니다."""
+    match = build_match_query(query)
+    if match is None:
+        return []
+    rows = conn.execute(
+        """
+        SELECT games.id FROM (
+            SELECT rowid, bm25(games_fts, ?, ?) AS score FROM games_fts
+            WHERE games_fts MATCH ? ORDER BY rowid DESC LIMIT ?
+        ) AS hits JOIN games ON games.rowid = hits.rowid
+        ORDER BY hits.score LIMIT ? OFFSET ?
+        """,
+        (_TITLE_WEIGHT, _BODY_WEIGHT, match, SEARCH_CANDIDATE_LIMIT, limit, offset)
+    )
+    return [row[0] for row in rows]
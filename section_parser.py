@@ -0,0 +1,94 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def _start_marker(name: str) -> str:
+    return f"###{name}_START###"
+
+
+def _end_marker(name: str) -> str:
+    return f"###{name}_END###"
+
+
+class SectionStreamParser:
+    """
+    ###NAME_START### ... ###NAME_END### 형식의 AI 응답을 한 번만 훑으며 파싱하는 상태 머신입니다.
+
+    스트리밍 청크를 feed() 로 넣으면, END 마커가 도착한 섹션부터 바로 (이름, 내용) 으로 돌려줍니다.
+    close() 는 끝까지 나타나지 않은 섹션(missing)과 END 없이 끝난 섹션(truncated)을 알려줍니다.
+    같은 섹션이 여러 번 나오면 처음 것을 사용합니다.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names = list(names)
+        self.sections: Dict[str, str] = {}
+        self.truncated: Optional[str] = None
+        self._buffer = ""
+        self._current: Optional[str] = None
+        self._content: List[str] = []
+        self._start_pattern = re.compile(
+            "|".join(re.escape(_start_marker(n)) for n in self.names)
+        )
+        # 청크 경계에 마커가 걸쳐 있을 수 있으므로 그만큼은 버퍼에 남겨 둡니다.
+        self._start_keep = max(len(_start_marker(n)) for n in self.names) - 1
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """청크를 소비하고, 이번에 완성된 섹션들을 [(이름, 내용), ...] 으로 반환합니다."""
+        completed = []
+        self._buffer += chunk
+
+        while True:
+            if self._current is None:
+                match = self._start_pattern.search(self._buffer)
+                if match is None:
+                    # 섹션 밖의 텍스트는 버리고 마커 일부일 수 있는 꼬리만 남깁니다.
+                    if len(self._buffer) > self._start_keep:
+                        self._buffer = self._buffer[-self._start_keep:]
+                    break
+                self._current = match.group(0)[3:-len("_START###")]
+                self._content = []
+                self._buffer = self._buffer[match.end():]
+            else:
+                end_marker = _end_marker(self._current)
+                idx = self._buffer.find(end_marker)
+                if idx == -1:
+                    keep = len(end_marker) - 1
+                    if len(self._buffer) > keep:
+                        self._content.append(self._buffer[:-keep])
+                        self._buffer = self._buffer[-keep:]
+                    break
+                self._content.append(self._buffer[:idx])
+                self._buffer = self._buffer[idx + len(end_marker):]
+                name = self._current
+                self._current = None
+                if name not in self.sections:
+                    text = "".join(self._content).strip()
+                    self.sections[name] = text
+                    completed.append((name, text))
+                self._content = []
+
+        return completed
+
+    def close(self) -> Dict[str, object]:
+        """
+        스트림 종료를 알립니다.
+
+        Returns:
+            dict: {
+                'sections': {이름: 내용},
+                'missing': END 까지 받지 못한 섹션 이름 리스트,
+                'truncated': START 는 있었지만 END 없이 끝난 섹션 이름 (없으면 None)
+            }
+        """
+        if self._current is not None:
+            self.truncated = self._current
+            self._current = None
+        missing = [n for n in self.names if n not in self.sections]
+        return {"sections": dict(self.sections), "missing": missing, "truncated": self.truncated}
+
+
+def parse_sections(response_text: str, names: Iterable[str]) -> Dict[str, object]:
+    """버퍼링된 전체 응답을 한 번에 파싱합니다. 반환 형식은 SectionStreamParser.close() 와 같습니다."""
+    parser = SectionStreamParser(names)
+    parser.feed(response_text)
+    return parser.close()
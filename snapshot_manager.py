@@ -2,30 +2,108 @@
 import argparse
 import json
 import hashlib
+import io
 import re
 import shutil
+import sqlite3
+import threading
 from pathlib import Path
 import datetime
+import difflib
 import fnmatch
 import os
 import sys
+import tarfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 
 from base_dir import BASE_PUBLIC_DIR, GAME_DIR, CODE_PATH, DATA_PATH, SPEC_PATH, CHAT_PATH, ASSETS_PATH, ARCHIVE_LOG_PATH
 
 DEFAULT_IGNORE = [
     "archive/**",
+    "_candidates/**",
     "change_log.json",
     "meta.json",
     "chat.json",
+    "chat.json.migrated",
+    "chat.jsonl",
+    "chat.idx",
+    "chat.lock",
     "index.html",
     "style.css",
     "tsconfig.json",
     "*.bak",
+    ".*.tmp",
+    "*/.*.tmp",
     "game_metadata.json"
 ]
 
 ARCHIVE_DIRNAME = "archive"
+# GC 보존 정책: 최근 N 개 버전은 항상 보존
+SNAPSHOT_KEEP_LAST = int(os.getenv('SNAPSHOT_KEEP_LAST', '50'))
+# 그보다 오래된 버전은 최근 D 일 동안은 하루에 하나, 최근 W 주 동안은 한 주에 하나만 보존 (그 이전은 삭제)
+SNAPSHOT_KEEP_DAILY_DAYS = int(os.getenv('SNAPSHOT_KEEP_DAILY_DAYS', '30'))
+SNAPSHOT_KEEP_WEEKLY_WEEKS = int(os.getenv('SNAPSHOT_KEEP_WEEKLY_WEEKS', '52'))
+# 이 시간(초)보다 최근에 쓰이거나 재사용된 블롭은 참조가 없어도 지우지 않습니다. (진행 중인 create_version 보호)
+SNAPSHOT_GC_GRACE_SECONDS = int(os.getenv('SNAPSHOT_GC_GRACE_SECONDS', '3600'))
+# 백그라운드 GC 주기(시간). 0 이면 실행하지 않습니다.
+SNAPSHOT_GC_INTERVAL_HOURS = float(os.getenv('SNAPSHOT_GC_INTERVAL_HOURS', '0'))
+
+# 버전 쌍별 diff 결과 캐시 (archive/diff_cache/<from>..<to>.json). 버전은 바뀌지 않으므로 만료 없음
+DIFF_CACHE_DIRNAME = "diff_cache"
+# 이 크기(바이트)보다 큰 텍스트 파일은 diff 를 응답에 넣지 않고 파일별 스트리밍으로 제공합니다.
+SNAPSHOT_DIFF_INLINE_MAX = int(os.getenv('SNAPSHOT_DIFF_INLINE_MAX', str(256 * 1024)))
+
+# export/import 묶음 파일 형식 버전
+PACK_FORMAT = 1
+
+# 게임별 잠금 파일과 복원 저널 (archive/.lock, archive/restore.journal)
+LOCK_FILENAME = ".lock"
+# 내보내기(공유) ↔ GC(배타) 잠금 파일. 내보내기는 스트리밍이 끝날 때까지 잡고 있습니다.
+EXPORT_LOCK_FILENAME = ".export.lock"
+RESTORE_JOURNAL_FILENAME = "restore.journal"
+STAGING_PREFIX = ".staging-"
+
+# 버전 그래프 인덱스 (archive/versions.db). 예전 change_log.json 은 처음 열 때 옮겨 옵니다.
+VERSIONS_DB_FILENAME = "versions.db"
+CHANGE_LOG_FILENAME = "change_log.json"
+# 내용 주소 기반 블롭 저장소: archive/objects/<해시 앞 2자리>/<sha256>
+OBJECTS_DIRNAME = "objects"
+# 경로별 (size, mtime_ns, inode, hash) 캐시. stat 이 그대로인 파일은 다시 해시하지 않습니다.
+STAT_CACHE_FILENAME = "stat_cache.json"
+# 캐시에 없는 파일을 해시할 스레드 수 (1 이면 순차 처리)
+SNAPSHOT_HASH_WORKERS = int(os.getenv('SNAPSHOT_HASH_WORKERS', '4'))
+# 복원 시 파일을 준비(복사/델타 복원)할 스레드 수 (1 이면 순차 처리)
+SNAPSHOT_RESTORE_WORKERS = int(os.getenv('SNAPSHOT_RESTORE_WORKERS', '4'))
+# 이 시간(초) 안에 수정된 파일은 같은 mtime 으로 다시 바뀔 수 있으므로 캐시하지 않습니다.
+STAT_CACHE_RACY_SECONDS = 2
+
+# 스냅샷 저장/복원 시 파일 내용을 옮기는 방식
+#   copy     : 항상 복사
+#   reflink  : FICLONE 으로 블록 공유 (btrfs, xfs 등 CoW 파일시스템). 지원하지 않으면 복사
+#   hardlink : SNAPSHOT_HARDLINK_PATTERNS 에 맞는 파일은 하드링크, 나머지는 reflink/복사
+#   auto     : reflink 를 시도하고 안 되면 복사 (기본값)
+SNAPSHOT_LINK_MODE = os.getenv('SNAPSHOT_LINK_MODE', 'auto')
+# 하드링크는 작업 폴더 파일과 블롭이 inode 를 공유하므로, 제자리 쓰기 전에 detach_hardlink() 를 부르는 에셋에만 사용합니다.
+SNAPSHOT_HARDLINK_PATTERNS = [p.strip() for p in os.getenv('SNAPSHOT_HARDLINK_PATTERNS', 'assets/**').split(',') if p.strip()]
+FICLONE = 0x40049409
+
+# 장치(st_dev)별 reflink 지원 여부 (한 번 실패하면 다시 시도하지 않습니다)
+_reflink_supported = {}
+
+# 텍스트 파일은 부모 버전 내용 대비 줄 단위 델타(zlib 압축)로 저장합니다: archive/objects/<aa>/<sha256>.delta
+DELTA_SUFFIXES = {".ts", ".js", ".json", ".md", ".txt", ".css", ".html"}
+# 델타 체인 최대 길이. 이보다 길어지면 전체 내용(키프레임)을 저장해 복원 비용을 제한합니다.
+SNAPSHOT_KEYFRAME_INTERVAL = int(os.getenv('SNAPSHOT_KEYFRAME_INTERVAL', '10'))
 
 ### 보조
 # 파일 내용의 해시값을 계산
@@ -39,6 +117,278 @@ def sha256_of_file(path: Path):
             h.update(chunk)
     return h.hexdigest()
 
+### 보조
+def _reflink(src: Path, dst: Path):
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+### 보조
+def _tmp_path(dst: Path) -> Path:
+    return dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+
+### 보조
+def fsync_file(path: Path):
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+### 보조
+# rename 결과가 디스크에 남도록 폴더도 fsync 합니다. (Windows 는 폴더를 열 수 없으므로 생략)
+def fsync_dir(path: Path):
+    if os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+### 보조
+def write_bytes_atomic(dst: Path, data: bytes):
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_path(dst)
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+### 보조
+# src 의 내용을 dst 옆의 임시 파일로 준비합니다(fsync 포함). 반환: (임시 파일 경로, 사용한 방식)
+def stage_file(src: Path, dst: Path, rel: str = None, mode: str = None):
+    mode = mode or SNAPSHOT_LINK_MODE
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_path(dst)
+    method = None
+    try:
+        if mode == 'hardlink' and rel is not None and matches_any_pattern(rel, SNAPSHOT_HARDLINK_PATTERNS):
+            try:
+                os.link(src, tmp)
+                method = 'hardlink'
+            except OSError:
+                pass
+
+        if method is None and mode in ('reflink', 'hardlink', 'auto') and fcntl is not None:
+            dev = dst.parent.stat().st_dev
+            if _reflink_supported.get(dev, True):
+                try:
+                    _reflink(src, tmp)
+                    method = 'reflink'
+                    _reflink_supported[dev] = True
+                except OSError:
+                    _reflink_supported[dev] = False
+                    tmp.unlink(missing_ok=True)
+
+        if method is None:
+            shutil.copyfile(src, tmp)
+            method = 'copy'
+
+        if method != 'hardlink':
+            fsync_file(tmp)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return tmp, method
+
+### 보조
+# src 의 내용을 dst 에 둡니다. 임시 파일을 만든 뒤 os.replace 하므로 dst 가 반쯤 쓰인 상태로 보이지 않습니다.
+# 실제로 사용한 방식('hardlink' / 'reflink' / 'copy')을 반환합니다.
+def place_file(src: Path, dst: Path, rel: str = None, mode: str = None) -> str:
+    tmp, method = stage_file(src, dst, rel, mode)
+    try:
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return method
+
+# 스레드별로 이미 잡고 있는 게임 잠금 (같은 스레드에서 다시 잡으면 그대로 통과)
+_lock_state = threading.local()
+
+### 보조
+def _lock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+### 보조
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+### 보조
+def _lock_file_shared(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+    else:
+        # msvcrt 에는 공유 잠금이 없어 배타 잠금으로 대신합니다. (내보내기끼리도 차례로 진행)
+        _lock_file(f)
+
+### 보조
+# 기다리지 않고 배타 잠금을 시도합니다. 다른 쪽이 잡고 있으면 False.
+def _try_lock_file(f) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+@contextmanager
+def game_lock(root: Path):
+    """
+    게임 하나의 스냅샷 작업(create/restore/gc)을 직렬화하는 advisory 파일 잠금(archive/.lock).
+    여러 uvicorn 워커 프로세스, 여러 스레드 사이에서 모두 동작합니다.
+    잠금을 잡으면 중단된 복원이 남아 있는지 확인하고 먼저 마무리합니다.
+    """
+    archive_root = root / ARCHIVE_DIRNAME
+    archive_root.mkdir(parents=True, exist_ok=True)
+    key = str(archive_root.resolve())
+    held = getattr(_lock_state, "held", None)
+    if held is None:
+        held = _lock_state.held = set()
+    if key in held:
+        yield
+        return
+
+    with open(archive_root / LOCK_FILENAME, 'a+b') as f:
+        _lock_file(f)
+        held.add(key)
+        try:
+            recover_interrupted_restore(root)
+            yield
+        finally:
+            held.discard(key)
+            _unlock_file(f)
+
+# 하드링크로 복원/저장된 파일(블롭과 inode 공유)이면 링크를 끊습니다.
+# 파일을 제자리에서 다시 쓰기 직전에 불러야 아카이브의 블롭이 함께 바뀌지 않습니다.
+def detach_hardlink(path):
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+### 보조
+# 해시에 해당하는 블롭 경로 (git 처럼 앞 2자리로 폴더를 나눠 한 폴더에 파일이 몰리지 않게 합니다)
+def object_path(archive_root: Path, file_hash: str) -> Path:
+    return archive_root / OBJECTS_DIRNAME / file_hash[:2] / file_hash
+
+### 보조
+def delta_path(archive_root: Path, file_hash: str) -> Path:
+    return archive_root / OBJECTS_DIRNAME / file_hash[:2] / (file_hash + ".delta")
+
+### 보조
+def object_exists(archive_root: Path, file_hash: str) -> bool:
+    return object_path(archive_root, file_hash).exists() or delta_path(archive_root, file_hash).exists()
+
+### 보조
+def touch_object(archive_root: Path, file_hash: str):
+    for p in (object_path(archive_root, file_hash), delta_path(archive_root, file_hash)):
+        try:
+            os.utime(p)
+        except FileNotFoundError:
+            pass
+
+### 보조
+def _read_delta(archive_root: Path, file_hash: str):
+    return json.loads(zlib.decompress(delta_path(archive_root, file_hash).read_bytes()))
+
+### 보조
+# 델타 체인 길이 (전체 내용으로 저장된 블롭은 0)
+def object_depth(archive_root: Path, file_hash: str) -> int:
+    if object_path(archive_root, file_hash).exists():
+        return 0
+    return _read_delta(archive_root, file_hash)["depth"]
+
+### 보조
+# 해시에 해당하는 내용을 읽습니다. 델타면 키프레임부터 차례로 적용해 복원합니다.
+def read_object(archive_root: Path, file_hash: str) -> bytes:
+    blob = object_path(archive_root, file_hash)
+    if blob.exists():
+        return blob.read_bytes()
+
+    chain = []
+    current = file_hash
+    while not object_path(archive_root, current).exists():
+        delta = _read_delta(archive_root, current)
+        chain.append(delta)
+        current = delta["base"]
+
+    lines = object_path(archive_root, current).read_bytes().decode('utf-8').splitlines(keepends=True)
+    for delta in reversed(chain):
+        new_lines = []
+        for op in delta["ops"]:
+            if op[0] == "=":
+                new_lines.extend(lines[op[1]:op[2]])
+            else:
+                new_lines.extend(op[1])
+        lines = new_lines
+    return "".join(lines).encode('utf-8')
+
+### 보조
+# 부모 내용(base_hash) 대비 줄 단위 델타를 만듭니다. 델타가 이득이 없으면 None
+def make_delta(archive_root: Path, src: Path, base_hash: str):
+    try:
+        base_lines = read_object(archive_root, base_hash).decode('utf-8').splitlines(keepends=True)
+        new_lines = src.read_bytes().decode('utf-8').splitlines(keepends=True)
+    except (UnicodeDecodeError, OSError):
+        return None
+
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, base_lines, new_lines, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i1, i2])
+        elif j2 > j1:
+            ops.append(["+", new_lines[j1:j2]])
+
+    data = zlib.compress(json.dumps({
+        "base": base_hash,
+        "depth": object_depth(archive_root, base_hash) + 1,
+        "ops": ops,
+    }, ensure_ascii=False).encode('utf-8'), 9)
+    # 전체 내용을 압축한 것과 비슷하면 델타로 둘 이유가 없습니다.
+    if len(data) * 2 > src.stat().st_size:
+        return None
+    return data
+
+### 보조
+# 파일 내용을 블롭으로 저장 (같은 내용은 한 번만 저장됩니다). 새로 저장했으면 True
+# base_hash 가 주어진 텍스트 파일은 체인이 SNAPSHOT_KEYFRAME_INTERVAL 보다 짧으면 델타로 저장합니다.
+def store_object(archive_root: Path, src: Path, file_hash: str, rel: str = None, base_hash: str = None) -> bool:
+    if object_exists(archive_root, file_hash):
+        # 재사용한 블롭은 mtime 을 갱신해 GC 유예 기간 안에 지워지지 않게 합니다.
+        touch_object(archive_root, file_hash)
+        return False
+
+    if (base_hash and base_hash != file_hash and Path(rel or src.name).suffix in DELTA_SUFFIXES
+            and object_exists(archive_root, base_hash)
+            and object_depth(archive_root, base_hash) + 1 < SNAPSHOT_KEYFRAME_INTERVAL):
+        data = make_delta(archive_root, src, base_hash)
+        if data is not None:
+            write_bytes_atomic(delta_path(archive_root, file_hash), data)
+            return True
+
+    place_file(src, object_path(archive_root, file_hash), rel)
+    return True
+
 ### 보조
 # 어떤 파일이 무시해도 되는 케이스인지 판단
 def matches_any_pattern(relpath: str, patterns):
@@ -50,8 +400,34 @@ def matches_any_pattern(relpath: str, patterns):
     return False
 
 ### 보조
-def scan_tree(root: Path, ignore_patterns):
+def load_stat_cache(root: Path):
+    cache_file = root / ARCHIVE_DIRNAME / STAT_CACHE_FILENAME
+    if not cache_file.exists():
+        return {}
+    try:
+        return json.loads(cache_file.read_text(encoding='utf-8'))
+    except Exception:
+        return {}
+
+### 보조
+def save_stat_cache(root: Path, cache):
+    archive_root = root / ARCHIVE_DIRNAME
+    if not archive_root.exists():
+        return
+    cache_file = archive_root / STAT_CACHE_FILENAME
+    tmp = cache_file.with_name(f".{STAT_CACHE_FILENAME}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(cache), encoding='utf-8')
+    os.replace(tmp, cache_file)
+
+### 보조
+def scan_tree(root: Path, ignore_patterns, use_cache=True):
+    """
+    추적 대상 파일의 해시/크기/mtime 을 수집합니다.
+    archive/stat_cache.json 에 기록된 (size, mtime_ns, inode) 가 그대로인 파일은 해시를 다시 계산하지 않습니다.
+    """
+    cache = load_stat_cache(root) if use_cache else {}
     files = {}
+    misses = []
     for p in root.rglob('*'):
         if p.is_file():
             rel = p.relative_to(root).as_posix()
@@ -60,12 +436,41 @@ def scan_tree(root: Path, ignore_patterns):
                 continue
             if matches_any_pattern(rel, ignore_patterns):
                 continue
+            st = p.stat()
             files[rel] = {
                 "path": p,
-                "hash": sha256_of_file(p),
-                "mtime": p.stat().st_mtime,
-                "size": p.stat().st_size
+                "hash": None,
+                "mtime": st.st_mtime,
+                "size": st.st_size
             }
+            key = [st.st_size, st.st_mtime_ns, st.st_ino]
+            cached = cache.get(rel)
+            if cached and cached[:3] == key:
+                files[rel]["hash"] = cached[3]
+            else:
+                misses.append((rel, key))
+
+    if misses:
+        paths = [files[rel]["path"] for rel, _ in misses]
+        if SNAPSHOT_HASH_WORKERS > 1 and len(misses) > 1:
+            with ThreadPoolExecutor(max_workers=SNAPSHOT_HASH_WORKERS) as pool:
+                hashes = list(pool.map(sha256_of_file, paths))
+        else:
+            hashes = [sha256_of_file(path) for path in paths]
+        for (rel, _), file_hash in zip(misses, hashes):
+            files[rel]["hash"] = file_hash
+
+    if use_cache:
+        racy_ns = time.time_ns() - STAT_CACHE_RACY_SECONDS * 1_000_000_000
+        # 적중한 항목은 그대로 두고, 새로 해시한 파일을 추가하고, 사라진 파일은 제거합니다.
+        new_cache = {rel: cache[rel] for rel in files if rel in cache}
+        for rel, key in misses:
+            new_cache.pop(rel, None)
+            if key[1] < racy_ns:
+                new_cache[rel] = key + [files[rel]["hash"]]
+        if new_cache != cache:
+            save_stat_cache(root, new_cache)
+
     return files
 
 ### 보조
@@ -163,6 +568,14 @@ def check_version_exists(archive_root: Path, version_name: str) -> bool:
 
 # 주요 함수
 def create_version(root: Path, parent_name = None, chat=None, summary=""):
+    """
+    현재 게임 폴더의 스냅샷을 만듭니다. 게임별 잠금 안에서 실행되며,
+    블롭 → 스테이징 폴더의 meta.json → 버전 폴더 rename → 인덱스 커밋 순서라 중간에 죽어도 반쯤 만든 버전이 보이지 않습니다.
+    """
+    with game_lock(root):
+        return _create_version(root, parent_name, chat, summary)
+
+def _create_version(root: Path, parent_name = None, chat=None, summary=""):
     ignore_patterns = DEFAULT_IGNORE.copy()
 
     archive_root = root / ARCHIVE_DIRNAME
@@ -272,19 +685,22 @@ def create_version(root: Path, parent_name = None, chat=None, summary=""):
                     "last_version": last_version
                 })
 
-    # create version folder and copy changed/added files
+    # create version folder (스테이징 폴더에 만든 뒤 마지막에 rename)
     version_name = make_new_version_name(archive_root, parent_name)
     version_dir = archive_root / version_name
-    files_store = version_dir / "files"
-    files_store.mkdir(parents=True, exist_ok=True)
-
-    # Copy Add and Change files
-    for item in added + changed:
-        rel = item["path"]
-        src = root / rel
-        dst = files_store / rel
-        dst.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(src, dst)
+    staging_dir = archive_root / f"{STAGING_PREFIX}{version_name}-{os.getpid()}"
+    if staging_dir.exists():
+        shutil.rmtree(staging_dir)
+    staging_dir.mkdir(parents=True)
+
+    # 파일 내용은 archive/objects 에 해시 이름으로 한 번만 저장합니다.
+    # (예전 files/ 방식 버전에서 이어지는 경우 변경 없는 파일도 블롭이 없으면 이때 채워집니다)
+    # 변경된 텍스트 파일은 부모 버전 내용 대비 델타로 저장합니다.
+    stored = 0
+    for rel, info in current_files.items():
+        base_hash = parent_files[rel]["hash"] if rel in parent_files else None
+        if store_object(archive_root, info["path"], info["hash"], rel, base_hash):
+            stored += 1
 
     # build file_index for meta: map rel -> {hash, size, mtime}
     file_index = {}
@@ -302,41 +718,155 @@ def create_version(root: Path, parent_name = None, chat=None, summary=""):
         "file_index": file_index,
     }
 
-    # write meta.json
-    version_dir.mkdir(parents=True, exist_ok=True)
-    meta_path = version_dir / "meta.json"
-    meta_path.write_text(json.dumps(meta, indent=4, ensure_ascii=False), encoding='utf-8')
+    # write meta.json → 버전 폴더로 원자적 rename
+    write_bytes_atomic(staging_dir / "meta.json", json.dumps(meta, indent=4, ensure_ascii=False).encode('utf-8'))
+    os.rename(staging_dir, version_dir)
+    fsync_dir(archive_root)
 
-    print(f"Created version {version_name} at {version_dir}")
+    print(f"Created version {version_name} at {version_dir} (new objects: {stored})")
 
     append_change_log(root, version_name, summary, parent_name=parent_name, is_current=True)
 
     return version_name
 
+_VERSIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    version TEXT NOT NULL UNIQUE,
+    parent TEXT,
+    timestamp TEXT NOT NULL,
+    summary TEXT,
+    restored INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_versions_parent ON versions(parent);
+CREATE TABLE IF NOT EXISTS head (
+    name TEXT PRIMARY KEY,
+    version TEXT
+);
+"""
+
 ### 보조
-def append_change_log(root: Path, version_name, summary, parent_name=None, is_current=True):
-    log_path = root / ARCHIVE_DIRNAME / "change_log.json"
+# 게임별 버전 인덱스 DB 를 엽니다. 처음 만들 때 change_log.json 이 있으면 옮겨 옵니다.
+def open_version_index(root: Path) -> sqlite3.Connection:
+    archive_root = root / ARCHIVE_DIRNAME
+    archive_root.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(archive_root / VERSIONS_DB_FILENAME, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 30000")
+    conn.executescript(_VERSIONS_SCHEMA)
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(versions)")}
+    if "restored" not in columns:
+        conn.execute("ALTER TABLE versions ADD COLUMN restored INTEGER NOT NULL DEFAULT 0")
+
+    log_path = archive_root / CHANGE_LOG_FILENAME
     if log_path.exists():
+        migrate_change_log(conn, log_path)
+    return conn
+
+### 보조
+def migrate_change_log(conn: sqlite3.Connection, log_path: Path):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # 다른 프로세스가 먼저 옮겼으면 아무것도 하지 않습니다.
+        if not log_path.exists():
+            conn.execute("ROLLBACK")
+            return
         log_data = json.loads(log_path.read_text(encoding="utf-8"))
-    else:
-        log_data = {"versions": []}
+        current = None
+        for v in log_data.get("versions", []):
+            conn.execute(
+                "INSERT OR IGNORE INTO versions (version, parent, timestamp, summary) VALUES (?, ?, ?, ?)",
+                (v["version"], v.get("parent"), v.get("timestamp") or datetime.datetime.now().isoformat(), v.get("summary", ""))
+            )
+            if v.get("is_current"):
+                current = v["version"]
+        if current:
+            conn.execute("INSERT OR REPLACE INTO head (name, version) VALUES ('current', ?)", (current,))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    log_path.replace(log_path.with_name(CHANGE_LOG_FILENAME + ".migrated"))
+    print(f"📦 {log_path} → {VERSIONS_DB_FILENAME} 이전 완료")
 
-    # 이전 최신 버전은 is_latest=False로
-    for v in log_data["versions"]:
-        v["is_latest"] = False
+### 보조
+def _version_row_to_dict(row, current, latest_seq):
+    return {
+        "version": row["version"],
+        "parent": row["parent"],
+        "timestamp": row["timestamp"],
+        "summary": row["summary"],
+        "is_latest": row["seq"] == latest_seq,
+        "is_current": row["version"] == current,
+    }
+
+### 보조
+def append_change_log(root: Path, version_name, summary, parent_name=None, is_current=True):
+    conn = open_version_index(root)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO versions (version, parent, timestamp, summary) VALUES (?, ?, ?, ?)",
+            (version_name, parent_name, datetime.datetime.now().isoformat(), summary)
+        )
         if is_current:
-            v["is_current"] = False
+            conn.execute("INSERT OR REPLACE INTO head (name, version) VALUES ('current', ?)", (version_name,))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
 
-    log_data["versions"].append({
-        "version": version_name,
-        "parent": parent_name,
-        "timestamp": datetime.datetime.now().isoformat(),
-        "summary": summary,
-        "is_latest": True,
-        "is_current": is_current
-    })
+### 보조
+def set_current_version(root: Path, version_name: str):
+    conn = open_version_index(root)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT OR REPLACE INTO head (name, version) VALUES ('current', ?)", (version_name,))
+        # 사용자가 직접 되돌아간 버전은 GC 에서 보존합니다.
+        conn.execute("UPDATE versions SET restored = 1 WHERE version = ?", (version_name,))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+def get_current_version(root: Path):
+    """현재 버전 정보(change_log.json 항목과 같은 형식)를 반환합니다. 없으면 None."""
+    conn = open_version_index(root)
+    try:
+        head = conn.execute("SELECT version FROM head WHERE name = 'current'").fetchone()
+        if head is None:
+            return None
+        row = conn.execute("SELECT * FROM versions WHERE version = ?", (head["version"],)).fetchone()
+        if row is None:
+            return None
+        latest_seq = conn.execute("SELECT MAX(seq) FROM versions").fetchone()[0]
+        return _version_row_to_dict(row, head["version"], latest_seq)
+    finally:
+        conn.close()
+
+def load_change_log(root: Path, offset: int = 0, limit: int = None):
+    """
+    예전 change_log.json 과 같은 형식({"versions": [...]}, 오래된 순)으로 버전 목록을 반환합니다.
+    limit 을 주면 해당 구간만 반환하고 전체 개수(total)를 함께 돌려줍니다.
+    """
+    if not (root / ARCHIVE_DIRNAME).exists():
+        return {"versions": []}
 
-    log_path.write_text(json.dumps(log_data, indent=4, ensure_ascii=False), encoding="utf-8")
+    conn = open_version_index(root)
+    try:
+        head = conn.execute("SELECT version FROM head WHERE name = 'current'").fetchone()
+        current = head["version"] if head else None
+        latest_seq = conn.execute("SELECT MAX(seq) FROM versions").fetchone()[0]
+        if limit is None:
+            rows = conn.execute("SELECT * FROM versions ORDER BY seq LIMIT -1 OFFSET ?", (offset,)).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM versions ORDER BY seq LIMIT ? OFFSET ?", (limit, offset)).fetchall()
+        result = {"versions": [_version_row_to_dict(r, current, latest_seq) for r in rows]}
+        if limit is not None:
+            result["total"] = conn.execute("SELECT COUNT(*) FROM versions").fetchone()[0]
+            result["offset"] = offset
+            result["limit"] = limit
+        return result
+    finally:
+        conn.close()
 
 # 주요 함수
 def list_versions(root: Path):
@@ -345,7 +875,7 @@ def list_versions(root: Path):
         print("No archive found.")
         return
     for p in sorted(archive_root.iterdir()):
-        if p.is_dir():
+        if p.is_dir() and p.name != OBJECTS_DIRNAME:
             print(p.name)
 
 # 주요 함수
@@ -413,7 +943,73 @@ def restore_version2(root: Path, version_name: str, overwrite=False):
 
 
 
+### 보조
+# 버전의 각 파일 내용이 어디에 있는지 찾습니다. {rel: 블롭/예전 files 경로(Path) 또는 델타 해시(str)}
+def find_version_sources(archive_root: Path, version_name: str, meta):
+    version_dir = archive_root / version_name
+    file_index = meta.get("file_index", {})
+    nochange_map = {item["path"]: item["last_version"] for item in meta.get("no_changes", [])}
+
+    sources = {}
+    for rel, info in file_index.items():
+        # 블롭 저장소에서 해시로 바로 찾습니다.
+        blob = object_path(archive_root, info["hash"])
+        if blob.exists():
+            sources[rel] = blob
+            continue
+        if delta_path(archive_root, info["hash"]).exists():
+            sources[rel] = info["hash"]
+            continue
+
+        # (예전 files/ 방식 버전) 우선 이 버전에서 변경된 파일 확인
+        src_in_version = version_dir / "files" / rel
+        if src_in_version.exists():
+            sources[rel] = src_in_version
+            continue
+
+        # 변경되지 않았으면 last_version에서 복사
+        if rel in nochange_map:
+            last_ver = nochange_map[rel]
+            candidate = archive_root / last_ver / "files" / rel
+            if candidate.exists():
+                sources[rel] = candidate
+            else:
+                print(f"⚠️ Warning: {rel} not found in {last_ver}")
+    return sources
+
 def restore_version(root: Path, version_name: str, overwrite=True):
+    """
+    버전을 게임 폴더에 복원합니다. 게임별 잠금 안에서 실행됩니다.
+    모든 파일을 임시 파일로 먼저 준비(fsync)한 뒤 한꺼번에 rename 하고, 마지막에 남는 파일을 지웁니다.
+    도중에 프로세스가 죽으면 archive/restore.journal 이 남고, 다음 스냅샷 작업이 잠금을 잡을 때 복원을 이어서 끝냅니다.
+    """
+    with game_lock(root):
+        return _restore_version(root, version_name, overwrite)
+
+### 보조
+def recover_interrupted_restore(root: Path):
+    journal = root / ARCHIVE_DIRNAME / RESTORE_JOURNAL_FILENAME
+    if not journal.exists():
+        return
+    try:
+        pending = json.loads(journal.read_text(encoding='utf-8'))
+    except Exception:
+        journal.unlink(missing_ok=True)
+        return
+    print(f"♻️ 중단된 복원을 이어서 진행합니다: {pending.get('version')}")
+    # 이전 프로세스가 남긴 임시 파일 정리
+    for p in root.rglob('.*.tmp'):
+        rel = p.relative_to(root).as_posix()
+        if not rel.startswith(ARCHIVE_DIRNAME + "/"):
+            p.unlink(missing_ok=True)
+    try:
+        if not _restore_version(root, pending["version"], pending.get("overwrite", True)):
+            journal.unlink(missing_ok=True)
+    except Exception as e:
+        print(f"❌ 중단된 복원을 마무리하지 못했습니다: {e}")
+        journal.unlink(missing_ok=True)
+
+def _restore_version(root: Path, version_name: str, overwrite=True):
     archive_root = root / ARCHIVE_DIRNAME
     version_dir = archive_root / version_name
     if not version_dir.exists():
@@ -427,79 +1023,85 @@ def restore_version(root: Path, version_name: str, overwrite=True):
 
     ignore_patterns = DEFAULT_IGNORE
     file_index = meta.get("file_index", {})
-    no_changes = meta.get("no_changes", [])
-    nochange_map = {item["path"]: item["last_version"] for item in no_changes}
 
-    # 현재 폴더 스캔
-    current_files = scan_tree(root, ignore_patterns)
+    # 1️⃣ 복원할 파일의 원본(블롭) 찾기 — 하나라도 없으면 작업 폴더를 건드리지 않고 중단
+    sources = find_version_sources(archive_root, version_name, meta)
+    missing = [rel for rel in file_index if rel not in sources]
+    if missing:
+        print(f"❌ {version_name} 복원 불가, 내용을 찾을 수 없는 파일: {missing}")
+        return False
 
-    # 1️⃣ 현재 폴더에만 있는 파일 삭제
-    current_rels = set(current_files.keys())
-    target_rels = set(file_index.keys())
-    extra_files = current_rels - target_rels
-    for rel in extra_files:
+    # 2️⃣ 저널 기록 (이 시점 이후 중단되면 다음 잠금 때 이어서 복원)
+    journal = archive_root / RESTORE_JOURNAL_FILENAME
+    write_bytes_atomic(journal, json.dumps({"version": version_name, "overwrite": overwrite}).encode('utf-8'))
+
+    # 3️⃣ 현재 작업 폴더와 비교해 내용이 다른 파일만 고릅니다. (stat 캐시 덕분에 해시 재계산은 거의 없습니다)
+    current_files = scan_tree(root, ignore_patterns)
+    targets = []
+    for rel, src in sources.items():
+        if matches_any_pattern(rel, ignore_patterns):
+            continue
+        dst = root / rel
+        current = current_files.get(rel)
+        if current is not None and current["hash"] == file_index[rel]["hash"]:
+            continue
+        if dst.exists() and not overwrite:
+            print(f"Skipping {dst} (use overwrite=True to force)")
+            continue
+        targets.append((rel, src, dst))
+
+    def stage(target):
+        rel, src, dst = target
+        if isinstance(src, Path):
+            return stage_file(src, dst, rel)[0], dst
+        # 델타로 저장된 텍스트 파일: 내용을 복원해 준비합니다.
+        tmp = _tmp_path(dst)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, 'wb') as f:
+            f.write(read_object(archive_root, src))
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp, dst
+
+    # 4️⃣ 바뀐 파일을 대상 위치 옆 임시 파일로 준비 (fsync 포함, 스레드 풀)
+    staged = []
+    try:
+        if SNAPSHOT_RESTORE_WORKERS > 1 and len(targets) > 1:
+            with ThreadPoolExecutor(max_workers=SNAPSHOT_RESTORE_WORKERS) as pool:
+                futures = [pool.submit(stage, t) for t in targets]
+                errors = []
+                for future in futures:
+                    try:
+                        staged.append(future.result())
+                    except BaseException as e:
+                        errors.append(e)
+                if errors:
+                    raise errors[0]
+        else:
+            for t in targets:
+                staged.append(stage(t))
+    except BaseException:
+        for tmp, _ in staged:
+            tmp.unlink(missing_ok=True)
+        journal.unlink(missing_ok=True)
+        raise
+
+    # 5️⃣ 한꺼번에 rename
+    for tmp, dst in staged:
+        os.replace(tmp, dst)
+    for parent in {dst.parent for _, dst in staged}:
+        fsync_dir(parent)
+
+    # 6️⃣ 현재 폴더에만 있는 파일 삭제 (새 내용이 모두 자리 잡은 뒤)
+    for rel in set(current_files.keys()) - set(file_index.keys()):
         p = root / rel
         if p.exists():
             p.unlink()
             print(f"🗑 Deleted extra file: {rel}")
 
-    # 2️⃣ 복원용 임시폴더
-    restore_tmp = root / f"_restore_{version_name}"
-    if restore_tmp.exists():
-        shutil.rmtree(restore_tmp)
-    restore_tmp.mkdir(parents=True)
-
-    # 3️⃣ 복원 파일 복사
-    for rel, info in file_index.items():
-        dst = restore_tmp / rel
-        dst.parent.mkdir(parents=True, exist_ok=True)
-
-        # 우선 이 버전에서 변경된 파일 확인
-        src_in_version = version_dir / "files" / rel
-        if src_in_version.exists():
-            shutil.copy2(src_in_version, dst)
-            continue
-
-        # 변경되지 않았으면 last_version에서 복사
-        if rel in nochange_map:
-            last_ver = nochange_map[rel]
-            candidate = archive_root / last_ver / "files" / rel
-            if candidate.exists():
-                shutil.copy2(candidate, dst)
-            else:
-                print(f"⚠️ Warning: {rel} not found in {last_ver}")
-
-    # 4️⃣ 실제 루트로 반영
-    for p in restore_tmp.rglob('*'):
-        if p.is_file():
-            rel = p.relative_to(restore_tmp)
-            if matches_any_pattern(str(rel), ignore_patterns):
-                continue
-            dst = root / rel
-            dst.parent.mkdir(parents=True, exist_ok=True)
-            if dst.exists() and not overwrite:
-                print(f"Skipping {dst} (use overwrite=True to force)")
-            else:
-                if dst.exists():
-                    dst.unlink()  # 기존 파일을 먼저 제거 (명시적 덮어쓰기)
-                shutil.copy(p, dst)
-
-    shutil.rmtree(restore_tmp)
-    
-    log_path = root / ARCHIVE_DIRNAME / "change_log.json"
-    if log_path.exists():
-        log_data = json.loads(log_path.read_text(encoding="utf-8"))
-    else:
-        log_data = {"versions": []}
-
-    # 이전 최신 버전은 is_latest=False로
-    for v in log_data["versions"]:
-        if v["version"] == version_name:
-            v["is_current"] = True
-        else:            
-            v["is_current"] = False
-
-    log_path.write_text(json.dumps(log_data, indent=4, ensure_ascii=False), encoding="utf-8")
+    print(f"📝 {version_name}: {len(staged)}개 파일 갱신, {len(file_index) - len(targets)}개는 변경 없음")
+    set_current_version(root, version_name)
+    journal.unlink(missing_ok=True)
 
     print(f"✅ Restore complete: {version_name}")
     return True
@@ -508,37 +1110,19 @@ def restore_version(root: Path, version_name: str, overwrite=True):
 
 def find_current_version_from_file(file_path: str) -> str:
     """
-    주어진 경로의 JSON 파일에서 'is_current' 필드가 True인 버전 정보를 찾아 반환합니다.
+    현재 버전 정보('is_current' 가 True 인 항목)를 반환합니다.
+    예전처럼 archive/change_log.json 경로를 받으며, 실제 조회는 같은 폴더의 versions.db 에서 합니다.
 
     Args:
-        file_path (str): 읽어올 JSON 파일의 경로입니다.
+        file_path (str): archive/change_log.json 경로입니다.
     """
-    
-    file = Path(file_path)
-    
-    # 1. 파일 존재 여부 확인
-    if not file.exists():
-        print(f"❌ 오류: 파일 경로를 찾을 수 없습니다: {file_path}")
+    archive_root = Path(file_path).parent
+    if not (archive_root / VERSIONS_DB_FILENAME).exists() and not (archive_root / CHANGE_LOG_FILENAME).exists():
+        print(f"❌ 오류: 버전 기록을 찾을 수 없습니다: {archive_root}")
         return None
-    
+
     try:
-        # 2. 파일 읽기 및 JSON 파싱
-        # with open을 사용하여 파일을 안전하게 열고 닫습니다.
-        with open(file, 'r', encoding='utf-8') as f:
-            data = json.load(f) # json.load()는 파일 객체에서 직접 JSON을 읽어 파싱합니다.
-            
-        # 3. 'versions' 리스트에서 현재 버전 찾기
-        for version_info in data.get("versions", []):
-            if version_info.get("is_current") is True:
-                # 4. 찾은 버전을 반환
-                return version_info#.get("version")
-        
-        # 5. 찾지 못한 경우 None 반환
-        return None
-        
-    except json.JSONDecodeError:
-        print(f"❌ 오류: 파일 '{file_path}'의 내용이 유효한 JSON 형식이 아닙니다.")
-        return None
+        return get_current_version(archive_root.parent)
     except Exception as e:
         print(f"❌ 오류가 발생했습니다: {e}")
         return None
@@ -546,6 +1130,498 @@ def find_current_version_from_file(file_path: str) -> str:
 
 
 
+### 보조
+def _load_version_manifest(archive_root: Path, version_name: str):
+    # 요청 값이 그대로 경로가 되므로 버전 이름 형식만 허용합니다.
+    if not re.fullmatch(r"v\d+-\d+", version_name or ""):
+        raise FileNotFoundError(f"Version not found: {version_name}")
+    meta = read_meta(archive_root / version_name)
+    if meta is None:
+        raise FileNotFoundError(f"Version not found: {version_name}")
+    return meta
+
+### 보조
+# 작업 폴더를 건드리지 않고 아카이브에서 버전의 파일 내용을 읽습니다.
+def read_version_file(archive_root: Path, version_name: str, meta, rel: str) -> bytes:
+    info = meta.get("file_index", {}).get(rel)
+    if info is None:
+        return b""
+    if object_exists(archive_root, info["hash"]):
+        return read_object(archive_root, info["hash"])
+    src = find_version_sources(archive_root, version_name, meta).get(rel)
+    if src is None:
+        raise FileNotFoundError(f"{rel} not found in {version_name}")
+    return src.read_bytes() if isinstance(src, Path) else read_object(archive_root, src)
+
+### 보조
+def _is_text_path(rel: str) -> bool:
+    return Path(rel).suffix in DELTA_SUFFIXES
+
+def iter_file_diff(root: Path, from_version: str, to_version: str, rel: str, context: int = 3):
+    """두 버전 사이 파일 하나의 unified diff 를 줄 단위로 yield 합니다. (큰 파일 스트리밍용)"""
+    archive_root = root / ARCHIVE_DIRNAME
+    from_meta = _load_version_manifest(archive_root, from_version)
+    to_meta = _load_version_manifest(archive_root, to_version)
+    a = read_version_file(archive_root, from_version, from_meta, rel).decode('utf-8', errors='replace').splitlines(keepends=True)
+    b = read_version_file(archive_root, to_version, to_meta, rel).decode('utf-8', errors='replace').splitlines(keepends=True)
+    for line in difflib.unified_diff(a, b, f"{from_version}/{rel}", f"{to_version}/{rel}", n=context):
+        yield line if line.endswith("\n") else line + "\n"
+
+def diff_versions(root: Path, from_version: str, to_version: str):
+    """
+    두 버전의 manifest(meta.json file_index)를 비교해 파일별 상태(added/deleted/modified)를 반환합니다.
+    텍스트 파일(game.ts, data.json 등)은 unified diff 를 함께 넣고, SNAPSHOT_DIFF_INLINE_MAX 보다 크면
+    "streamed": True 로 표시해 iter_file_diff 로 따로 받게 합니다. 결과는 버전 쌍별로 캐시됩니다.
+    """
+    archive_root = root / ARCHIVE_DIRNAME
+    # 캐시 파일 이름에 버전 이름이 들어가므로, 두 버전이 실제로 있는지 먼저 확인합니다.
+    from_meta = _load_version_manifest(archive_root, from_version)
+    to_meta = _load_version_manifest(archive_root, to_version)
+
+    cache_file = archive_root / DIFF_CACHE_DIRNAME / f"{from_version}..{to_version}.json"
+    if cache_file.exists():
+        try:
+            return json.loads(cache_file.read_text(encoding='utf-8'))
+        except Exception:
+            pass
+
+    from_index = from_meta.get("file_index", {})
+    to_index = to_meta.get("file_index", {})
+
+    files = []
+    for rel in sorted(set(from_index) | set(to_index)):
+        a = from_index.get(rel)
+        b = to_index.get(rel)
+        if a and b and a["hash"] == b["hash"]:
+            continue
+        entry = {
+            "path": rel,
+            "status": "added" if a is None else "deleted" if b is None else "modified",
+            "from_hash": a["hash"] if a else None,
+            "to_hash": b["hash"] if b else None,
+            "from_size": a["size"] if a else 0,
+            "to_size": b["size"] if b else 0,
+        }
+        if _is_text_path(rel):
+            if max(entry["from_size"], entry["to_size"]) > SNAPSHOT_DIFF_INLINE_MAX:
+                entry["streamed"] = True
+            else:
+                entry["diff"] = "".join(iter_file_diff(root, from_version, to_version, rel))
+        files.append(entry)
+
+    result = {"from": from_version, "to": to_version, "files": files}
+    try:
+        write_bytes_atomic(cache_file, json.dumps(result, ensure_ascii=False).encode('utf-8'))
+    except OSError as e:
+        print(f"⚠️ diff 캐시 저장 실패: {e}")
+    return result
+
+
+### 보조
+# tarfile 스트림 모드의 출력을 모아 두었다가 청크 단위로 꺼내기 위한 파일 객체
+class _ChunkBuffer:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+### 보조
+def _add_tar_bytes(tar, name: str, data: bytes, mtime=None):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime or time.time()
+    tar.addfile(info, fileobj=io.BytesIO(data))
+
+def iter_export_archive(root: Path, compress: bool = False):
+    """
+    게임의 전체 버전 기록을 tar 스트림 하나로 내보냅니다. (청크 bytes 를 yield)
+    순서: manifest.json → objects/<aa>/<hash>[.delta] → versions/<버전>/meta.json
+    예전 files/ 방식 버전의 파일도 해시 이름의 블롭으로 변환해 넣습니다.
+    스트리밍이 끝날 때까지 내보내기 잠금(공유)을 잡고 있어, 그동안 gc_archive 는 이 게임을 건너뜁니다.
+    """
+    archive_root = root / ARCHIVE_DIRNAME
+    archive_root.mkdir(parents=True, exist_ok=True)
+    with open(archive_root / EXPORT_LOCK_FILENAME, 'a+b') as export_lock:
+        _lock_file_shared(export_lock)
+        try:
+            yield from _iter_export_locked(root, compress)
+        finally:
+            _unlock_file(export_lock)
+
+### 보조
+# iter_export_archive 본체. 목록을 정하는 동안만 game_lock 을 잡아 create_version 을 오래 막지 않습니다.
+# (스트리밍 중 블롭/버전 폴더를 지울 수 있는 건 GC 뿐이고, GC 는 내보내기 잠금으로 막혀 있습니다)
+def _iter_export_locked(root: Path, compress: bool):
+    archive_root = root / ARCHIVE_DIRNAME
+    with game_lock(root):
+        conn = open_version_index(root)
+        try:
+            rows = [dict(r) for r in conn.execute("SELECT version, parent, timestamp, summary, restored FROM versions ORDER BY seq")]
+            head = conn.execute("SELECT version FROM head WHERE name = 'current'").fetchone()
+        finally:
+            conn.close()
+
+        metas = {}
+        objects = {}
+        for row in rows:
+            meta = read_meta(archive_root / row["version"])
+            if meta is None:
+                continue
+            metas[row["version"]] = meta
+            sources = None
+            for rel, info in meta.get("file_index", {}).items():
+                file_hash = info["hash"]
+                if file_hash in objects:
+                    continue
+                if object_path(archive_root, file_hash).exists():
+                    objects[file_hash] = object_path(archive_root, file_hash)
+                elif delta_path(archive_root, file_hash).exists():
+                    objects[file_hash] = delta_path(archive_root, file_hash)
+                else:
+                    sources = sources or find_version_sources(archive_root, row["version"], meta)
+                    if isinstance(sources.get(rel), Path):
+                        objects[file_hash] = sources[rel]
+        # 델타의 기준 블롭도 함께 넣습니다.
+        pending = [h for h, p in objects.items() if p.name.endswith(".delta")]
+        while pending:
+            base = _read_delta(archive_root, pending.pop())["base"]
+            if base not in objects:
+                objects[base] = object_path(archive_root, base) if object_path(archive_root, base).exists() else delta_path(archive_root, base)
+                if objects[base].name.endswith(".delta"):
+                    pending.append(base)
+
+    manifest = {
+        "format": PACK_FORMAT,
+        "game": root.name,
+        "current": head["version"] if head else None,
+        "versions": [r for r in rows if r["version"] in metas],
+        "objects": len(objects),
+    }
+
+    buffer = _ChunkBuffer()
+    with tarfile.open(fileobj=buffer, mode="w|gz" if compress else "w|") as tar:
+        _add_tar_bytes(tar, "manifest.json", json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+        for file_hash, path in objects.items():
+            suffix = ".delta" if path.name.endswith(".delta") else ""
+            tar.add(path, arcname=f"{OBJECTS_DIRNAME}/{file_hash[:2]}/{file_hash}{suffix}", recursive=False)
+            data = buffer.drain()
+            if data:
+                yield data
+        for version_name, meta in metas.items():
+            _add_tar_bytes(tar, f"versions/{version_name}/meta.json", json.dumps(meta, indent=4, ensure_ascii=False).encode('utf-8'))
+    yield buffer.drain()
+
+def export_archive(root: Path, out_path: Path, compress: bool = False):
+    """iter_export_archive 결과를 파일로 저장합니다."""
+    with open(out_path, 'wb') as f:
+        for chunk in iter_export_archive(root, compress):
+            f.write(chunk)
+    print(f"📦 Exported {root.name} → {out_path}")
+
+def import_archive(root: Path, fileobj, restore_current: bool = True):
+    """
+    iter_export_archive 로 만든 tar 스트림을 게임 폴더로 가져옵니다. (gzip 여부는 자동 판별)
+    블롭은 해시를 검증하고, 이미 로컬에 있는 블롭은 건너뜁니다. 같은 이름의 버전이 다른 내용으로 있으면 중단합니다.
+    중간에 실패하면 이번에 쓴 블롭/버전 폴더를 모두 지워, 검증되지 않은 블롭이 "이미 있음" 으로 남지 않게 합니다.
+    restore_current 가 True 이고 기존 기록이 없던 게임이면, 가져온 기록의 현재 버전을 작업 폴더에 복원합니다.
+    """
+    with game_lock(root):
+        written = []
+        try:
+            result, set_head = _import_archive_locked(root, fileobj, written)
+        except BaseException:
+            for path in reversed(written):
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    path.unlink(missing_ok=True)
+            raise
+
+        # 이미 기록이 있던 게임이면 작업 폴더는 그대로 둡니다.
+        if restore_current and set_head:
+            _restore_version(root, result["current"])
+        return result
+
+### 보조
+# import_archive 본체 (game_lock 안에서 실행). 새로 만든 블롭/버전 폴더 경로를 written 에 모읍니다.
+def _import_archive_locked(root: Path, fileobj, written):
+    archive_root = root / ARCHIVE_DIRNAME
+    manifest = None
+    imported_deltas = []
+    imported = 0
+    skipped = 0
+    metas = {}
+
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            name = member.name
+            if manifest is None:
+                if name != "manifest.json":
+                    raise ValueError("manifest.json 이 첫 항목이 아닙니다.")
+                manifest = json.loads(tar.extractfile(member).read())
+                if manifest.get("format") != PACK_FORMAT:
+                    raise ValueError(f"지원하지 않는 형식: {manifest.get('format')}")
+                continue
+
+            m = re.fullmatch(r"objects/([0-9a-f]{2})/([0-9a-f]{64})(\.delta)?", name)
+            if m:
+                file_hash, is_delta = m.group(2), bool(m.group(3))
+                if m.group(1) != file_hash[:2]:
+                    raise ValueError(f"잘못된 항목: {name}")
+                if object_exists(archive_root, file_hash):
+                    skipped += 1
+                    continue
+                data = tar.extractfile(member).read()
+                if is_delta:
+                    # 델타는 기준 블롭이 모두 들어온 뒤에야 검증할 수 있으므로, 실패하면 import_archive 가 지웁니다.
+                    write_bytes_atomic(delta_path(archive_root, file_hash), data)
+                    written.append(delta_path(archive_root, file_hash))
+                    imported_deltas.append(file_hash)
+                else:
+                    if hashlib.sha256(data).hexdigest() != file_hash:
+                        raise ValueError(f"해시 불일치: {name}")
+                    write_bytes_atomic(object_path(archive_root, file_hash), data)
+                    written.append(object_path(archive_root, file_hash))
+                imported += 1
+                continue
+
+            m = re.fullmatch(r"versions/(v\d+-\d+)/meta\.json", name)
+            if m:
+                metas[m.group(1)] = tar.extractfile(member).read()
+                continue
+
+            print(f"⚠️ 알 수 없는 항목 무시: {name}")
+
+    if manifest is None:
+        raise ValueError("빈 묶음 파일입니다.")
+
+    # 델타는 기준 블롭이 모두 들어온 뒤에 복원해서 검증합니다.
+    # 기준 블롭이 없거나 압축 데이터가 깨진 델타도 잘못된 묶음 파일로 처리합니다.
+    for file_hash in imported_deltas:
+        try:
+            restored = read_object(archive_root, file_hash)
+        except (OSError, zlib.error, ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"델타를 복원할 수 없습니다: {file_hash} ({e})")
+        if hashlib.sha256(restored).hexdigest() != file_hash:
+            raise ValueError(f"해시 불일치(델타): {file_hash}")
+
+    # 버전 폴더 (스테이징 → rename). 이미 있으면 내용이 같아야 합니다.
+    existing_versions = 0
+    for version_name, data in metas.items():
+        version_dir = archive_root / version_name
+        if version_dir.exists():
+            existing = read_meta(version_dir)
+            if existing is None or existing.get("file_index") != json.loads(data).get("file_index"):
+                raise ValueError(f"이미 다른 내용의 버전이 있습니다: {version_name}")
+            existing_versions += 1
+            continue
+        staging_dir = archive_root / f"{STAGING_PREFIX}{version_name}-{os.getpid()}"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        write_bytes_atomic(staging_dir / "meta.json", data)
+        os.rename(staging_dir, version_dir)
+        written.append(version_dir)
+    fsync_dir(archive_root)
+
+    conn = open_version_index(root)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for row in manifest["versions"]:
+            if row["version"] not in metas:
+                continue
+            conn.execute(
+                "INSERT OR IGNORE INTO versions (version, parent, timestamp, summary, restored) VALUES (?, ?, ?, ?, ?)",
+                (row["version"], row.get("parent"), row["timestamp"], row.get("summary"), row.get("restored", 0))
+            )
+        has_head = conn.execute("SELECT 1 FROM head WHERE name = 'current'").fetchone()
+        set_head = not has_head and bool(manifest.get("current"))
+        if set_head:
+            conn.execute("INSERT INTO head (name, version) VALUES ('current', ?)", (manifest["current"],))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+    print(f"📥 Imported {len(metas) - existing_versions} versions, {imported} objects ({skipped} already present)")
+    result = {"versions": len(metas) - existing_versions, "objects_imported": imported, "objects_skipped": skipped, "current": manifest.get("current")}
+    return result, set_head
+
+
+### 보조
+# 보존 정책에 따라 남길 버전 이름 집합을 고릅니다. rows 는 오래된 순서.
+def select_versions_to_keep(rows, current, keep_last, keep_daily_days, keep_weekly_weeks, now=None):
+    now = now or datetime.datetime.now()
+    keep = set()
+    if current:
+        keep.add(current)
+    keep.update(r["version"] for r in rows if r["restored"])
+    keep.update(r["version"] for r in rows[-keep_last:] if keep_last > 0)
+
+    # 시간 버킷별로 가장 최근 버전 하나씩 (새 것부터 보면서 처음 본 버킷만 보존)
+    seen_buckets = set()
+    for r in reversed(rows):
+        try:
+            ts = datetime.datetime.fromisoformat(r["timestamp"])
+        except (TypeError, ValueError):
+            keep.add(r["version"])
+            continue
+        age = now - ts
+        if age <= datetime.timedelta(days=keep_daily_days):
+            bucket = ("day", ts.date())
+        elif age <= datetime.timedelta(weeks=keep_weekly_weeks):
+            bucket = ("week",) + tuple(ts.isocalendar()[:2])
+        else:
+            continue
+        if bucket not in seen_buckets:
+            seen_buckets.add(bucket)
+            keep.add(r["version"])
+    return keep
+
+### 보조
+# 예전 files/ 방식으로 저장된 버전의 파일을 블롭 저장소로 옮깁니다. (다른 버전 폴더를 지워도 복원할 수 있도록)
+def migrate_version_to_objects(archive_root: Path, version_name: str, meta) -> bool:
+    file_index = meta.get("file_index", {})
+    sources = find_version_sources(archive_root, version_name, meta)
+    for rel, info in file_index.items():
+        if object_exists(archive_root, info["hash"]):
+            continue
+        src = sources.get(rel)
+        if not isinstance(src, Path):
+            print(f"⚠️ Warning: {version_name} 의 {rel} 내용을 찾을 수 없습니다.")
+            return False
+        store_object(archive_root, src, info["hash"], rel)
+    shutil.rmtree(archive_root / version_name / "files", ignore_errors=True)
+    return True
+
+def gc_archive(root: Path, keep_last: int = None, keep_daily_days: int = None, keep_weekly_weeks: int = None,
+               grace_seconds: int = None, dry_run: bool = False):
+    """
+    보존 정책에 맞지 않는 버전을 지우고, 남은 버전이 참조하지 않는 블롭을 회수합니다.
+
+    보존: 현재 버전, 사용자가 복원한 적 있는 버전, 최근 keep_last 개,
+          최근 keep_daily_days 일은 하루 1개, 최근 keep_weekly_weeks 주는 한 주 1개.
+    지운 버전의 자식은 가장 가까운 남은 조상을 부모로 갖게 됩니다.
+    블롭은 grace_seconds 보다 최근에 쓰였거나 재사용된 것은 남겨 두므로, 동시에 진행 중인 create_version 이 쓰는 블롭을 지우지 않습니다.
+    """
+    with game_lock(root):
+        # 내보내기가 스트리밍 중이면 지울 블롭을 읽고 있을 수 있으므로 이번에는 건너뜁니다.
+        with open(root / ARCHIVE_DIRNAME / EXPORT_LOCK_FILENAME, 'a+b') as export_lock:
+            if not _try_lock_file(export_lock):
+                print(f"⏭️ GC {root.name}: 내보내기가 진행 중이라 건너뜁니다.")
+                return {"versions_deleted": 0, "objects_deleted": 0, "bytes_freed": 0}
+            try:
+                return _gc_archive(root, keep_last, keep_daily_days, keep_weekly_weeks, grace_seconds, dry_run)
+            finally:
+                _unlock_file(export_lock)
+
+def _gc_archive(root: Path, keep_last, keep_daily_days, keep_weekly_weeks, grace_seconds, dry_run):
+    keep_last = SNAPSHOT_KEEP_LAST if keep_last is None else keep_last
+    keep_daily_days = SNAPSHOT_KEEP_DAILY_DAYS if keep_daily_days is None else keep_daily_days
+    keep_weekly_weeks = SNAPSHOT_KEEP_WEEKLY_WEEKS if keep_weekly_weeks is None else keep_weekly_weeks
+    grace_seconds = SNAPSHOT_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+
+    archive_root = root / ARCHIVE_DIRNAME
+    conn = open_version_index(root)
+    try:
+        rows = conn.execute("SELECT * FROM versions ORDER BY seq").fetchall()
+        head = conn.execute("SELECT version FROM head WHERE name = 'current'").fetchone()
+        current = head["version"] if head else None
+        keep = select_versions_to_keep(rows, current, keep_last, keep_daily_days, keep_weekly_weeks)
+        parents = {r["version"]: r["parent"] for r in rows}
+        drop = [r["version"] for r in rows if r["version"] not in keep]
+
+        # 1️⃣ 남길 버전의 내용을 모두 블롭 저장소에 둡니다.
+        referenced = set()
+        for version_name in keep:
+            meta = read_meta(archive_root / version_name)
+            if meta is None:
+                continue
+            if not dry_run and not migrate_version_to_objects(archive_root, version_name, meta):
+                # 내용을 다 찾지 못한 예전 버전이 있으면 안전하게 아무것도 지우지 않습니다.
+                print(f"⚠️ {version_name} 을 블롭 저장소로 옮기지 못해 GC 를 중단합니다.")
+                return {"versions_deleted": 0, "objects_deleted": 0, "bytes_freed": 0}
+            referenced.update(info["hash"] for info in meta.get("file_index", {}).values())
+
+        # 델타의 기준(base) 블롭도 참조된 것으로 봅니다.
+        pending = list(referenced)
+        while pending:
+            file_hash = pending.pop()
+            if delta_path(archive_root, file_hash).exists():
+                base = _read_delta(archive_root, file_hash)["base"]
+                if base not in referenced:
+                    referenced.add(base)
+                    pending.append(base)
+
+        if dry_run:
+            print(f"[dry-run] 삭제할 버전 {len(drop)}개: {drop}")
+        else:
+            # 2️⃣ 버전 삭제 + 자식의 부모를 가장 가까운 남은 조상으로 변경
+            def surviving_ancestor(name):
+                while name is not None and name not in keep:
+                    name = parents.get(name)
+                return name
+
+            conn.execute("BEGIN IMMEDIATE")
+            for version_name in drop:
+                conn.execute("UPDATE versions SET parent = ? WHERE parent = ?", (surviving_ancestor(parents.get(version_name)), version_name))
+                conn.execute("DELETE FROM versions WHERE version = ?", (version_name,))
+            conn.execute("COMMIT")
+            for version_name in drop:
+                shutil.rmtree(archive_root / version_name, ignore_errors=True)
+                for cached in (archive_root / DIFF_CACHE_DIRNAME).glob("*.json"):
+                    if version_name in cached.stem.split(".."):
+                        cached.unlink(missing_ok=True)
+
+            # 중단된 create_version 이 남긴 스테이징 폴더 정리 (잠금을 잡고 있으므로 진행 중인 것은 없습니다)
+            for staging_dir in archive_root.glob(STAGING_PREFIX + "*"):
+                shutil.rmtree(staging_dir, ignore_errors=True)
+    finally:
+        conn.close()
+
+    # 3️⃣ 참조되지 않는 블롭 회수
+    objects_deleted = 0
+    bytes_freed = 0
+    cutoff = time.time() - grace_seconds
+    objects_root = archive_root / OBJECTS_DIRNAME
+    if objects_root.exists():
+        for p in objects_root.glob("*/*"):
+            file_hash = p.name[:-len(".delta")] if p.name.endswith(".delta") else p.name
+            if p.name.startswith("."):
+                # 중단된 쓰기의 임시 파일
+                file_hash = None
+            if file_hash in referenced:
+                continue
+            st = p.stat()
+            if st.st_mtime > cutoff:
+                continue
+            objects_deleted += 1
+            bytes_freed += st.st_size
+            if not dry_run:
+                p.unlink(missing_ok=True)
+
+    result = {"versions_deleted": len(drop), "objects_deleted": objects_deleted, "bytes_freed": bytes_freed}
+    print(f"🧹 GC {root.name}: {result}")
+    return result
+
+def gc_all_games(**kwargs):
+    """BASE_PUBLIC_DIR 아래 아카이브가 있는 모든 게임에 gc_archive 를 실행합니다."""
+    results = {}
+    for game_dir in BASE_PUBLIC_DIR().iterdir():
+        if (game_dir / ARCHIVE_DIRNAME).is_dir():
+            try:
+                results[game_dir.name] = gc_archive(game_dir, **kwargs)
+            except Exception as e:
+                print(f"❌ GC 실패 ({game_dir.name}): {e}")
+    return results
+
+
 ### 보조
 def load_chat_history(root: Path):
     chat_file = root / "chat_history.json"
@@ -572,6 +1648,22 @@ def main():
     p_restore.add_argument('version', help='Version name to restore (e.g. V1-1-YYYY...)')
     p_restore.add_argument('--overwrite', action='store_true', help='Overwrite existing files when restoring')
 
+    p_export = sub.add_parser('export', help='Export the full version history as a single tar file')
+    p_export.add_argument('output', help='Output file path (e.g. game.snap.tar)')
+    p_export.add_argument('--gzip', action='store_true', help='Compress with gzip')
+
+    p_import = sub.add_parser('import', help='Import a tar file created by export into the current directory')
+    p_import.add_argument('input', help='Input file path')
+    p_import.add_argument('--no-restore', action='store_true', help='Do not restore the current version into the working tree')
+
+    p_gc = sub.add_parser('gc', help='Delete old versions by retention policy and reclaim unreferenced objects')
+    p_gc.add_argument('--keep-last', type=int, default=None, help=f'Always keep the last N versions (default {SNAPSHOT_KEEP_LAST})')
+    p_gc.add_argument('--keep-daily-days', type=int, default=None, help=f'Keep one version per day for D days (default {SNAPSHOT_KEEP_DAILY_DAYS})')
+    p_gc.add_argument('--keep-weekly-weeks', type=int, default=None, help=f'Keep one version per week for W weeks (default {SNAPSHOT_KEEP_WEEKLY_WEEKS})')
+    p_gc.add_argument('--grace-seconds', type=int, default=None, help=f'Never delete objects touched within this many seconds (default {SNAPSHOT_GC_GRACE_SECONDS})')
+    p_gc.add_argument('--all', action='store_true', help='Run on every game under BASE_PUBLIC_DIR instead of the current directory')
+    p_gc.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
     args = parser.parse_args()
     root = Path.cwd()
 
@@ -604,11 +1696,23 @@ def main():
         list_versions(root)
     elif args.cmd == 'restore':
         restore_version(root, args.version, overwrite=args.overwrite)
+    elif args.cmd == 'export':
+        export_archive(root, Path(args.output), compress=args.gzip)
+    elif args.cmd == 'import':
+        with open(args.input, 'rb') as f:
+            import_archive(root, f, restore_current=not args.no_restore)
+    elif args.cmd == 'gc':
+        options = dict(keep_last=args.keep_last, keep_daily_days=args.keep_daily_days,
+                       keep_weekly_weeks=args.keep_weekly_weeks, grace_seconds=args.grace_seconds, dry_run=args.dry_run)
+        if args.all:
+            gc_all_games(**options)
+        else:
+            gc_archive(root, **options)
     else:
         parser.print_help()
 
-# if __name__ == '__main__':
-#     main()
+if __name__ == '__main__':
+    main()
 
 
 
@@ -0,0 +1,101 @@
+// esbuild 상주 서비스 (esbuild_service.py 에서 실행)
+// stdin 으로 JSON 요청을 한 줄씩 받아 빌드하고, stdout 으로 JSON 응답을 한 줄씩 돌려줍니다.
+//   {"id": 1, "command": "build", "options": {...}}
+//   {"id": 2, "command": "buildMany", "builds": [{...}, {...}]}
+//   {"id": 3, "command": "dispose"} / {"id": 4, "command": "ping"}
+const path = require('path');
+const readline = require('readline');
+
+function loadEsbuild() {
+    const extra = (process.env.ESBUILD_RESOLVE_PATHS || '').split(path.delimiter).filter(Boolean);
+    return require(require.resolve('esbuild', { paths: [process.cwd(), ...extra, __dirname] }));
+}
+
+const esbuild = loadEsbuild();
+
+// 증분 빌드용 context (같은 옵션이면 재사용해서 ctx.rebuild() 로 다시 빌드)
+// Map 은 삽입 순서를 유지하므로, 가장 오래 쓰지 않은 context 부터 정리합니다.
+const contexts = new Map();
+const MAX_CONTEXTS = parseInt(process.env.ESBUILD_MAX_CONTEXTS || '32', 10);
+
+function formatMessages(messages) {
+    return (messages || []).map((m) => {
+        const loc = m.location ? `${m.location.file}:${m.location.line}:${m.location.column}: ` : '';
+        return `${loc}${m.text}`;
+    }).join('\n');
+}
+
+async function build(opts) {
+    const options = {
+        entryPoints: [opts.entry],
+        outfile: opts.outfile,
+        format: opts.format,
+        target: opts.target,
+        sourcemap: opts.sourcemap || false,
+        logLevel: 'silent',
+    };
+
+    try {
+        let result;
+        if (opts.incremental && typeof esbuild.context === 'function') {
+            const key = JSON.stringify(options);
+            let ctx = contexts.get(key);
+            if (ctx) {
+                contexts.delete(key);
+            } else {
+                ctx = await esbuild.context(options);
+                if (contexts.size >= MAX_CONTEXTS) {
+                    const [oldestKey, oldest] = contexts.entries().next().value;
+                    contexts.delete(oldestKey);
+                    await oldest.dispose();
+                }
+            }
+            contexts.set(key, ctx);
+            result = await ctx.rebuild();
+        } else {
+            result = await esbuild.build(options);
+        }
+        return { success: true, output: opts.outfile, message: formatMessages(result.warnings) };
+    } catch (e) {
+        return { success: false, output: null, error: e.errors ? formatMessages(e.errors) : String(e) };
+    }
+}
+
+async function dispose() {
+    for (const ctx of contexts.values()) {
+        await ctx.dispose();
+    }
+    contexts.clear();
+    return { success: true };
+}
+
+async function handle(request) {
+    switch (request.command) {
+        case 'build':
+            return build(request.options);
+        case 'buildMany':
+            return { success: true, results: await Promise.all(request.builds.map(build)) };
+        case 'dispose':
+            return dispose();
+        case 'ping':
+            return { success: true, version: esbuild.version };
+        default:
+            return { success: false, error: `unknown command: ${request.command}` };
+    }
+}
+
+const rl = readline.createInterface({ input: process.stdin });
+rl.on('line', async (line) => {
+    let request;
+    try {
+        request = JSON.parse(line);
+    } catch (e) {
+        return;
+    }
+    const response = await handle(request);
+    process.stdout.write(JSON.stringify({ id: request.id, ...response }) + '\n');
+});
+rl.on('close', async () => {
+    await dispose();
+    process.exit(0);
+});
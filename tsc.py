@@ -9,6 +9,9 @@ from typing import Dict, Any
 
 
 from base_dir import BASE_PUBLIC_DIR, GAME_DIR, CODE_PATH, DATA_PATH, SPEC_PATH, CHAT_PATH, ASSETS_PATH, ARCHIVE_LOG_PATH
+from tsc_daemon import check_with_daemon
+from build_cache import build_cache_key, load_cached_build, store_build
+from esbuild_service import build_many_with_service, build_with_service
 
 
 
@@ -183,6 +186,11 @@ def check_typescript_errors_with_options(ts_file_path: str) -> Dict[str, Any]:
     # tsconfig.json 파일이 있는 디렉터리 경로를 추출합니다.
     #config_dir = os.path.dirname(config_path)
 
+    # 상주 tsserver 풀이 있으면 먼저 사용하고, 사용할 수 없으면 아래 npx tsc 경로로 넘어갑니다.
+    daemon_result = check_with_daemon(ts_file_path)
+    if daemon_result is not None:
+        return daemon_result
+
     config_dir = os.path.dirname(ts_file_path)
 
     # 4. 명령어 실행 (shell=True가 포함되어 있다고 가정)
@@ -328,6 +336,11 @@ def build_with_esbuild(ts_file_path, output_path=None, format='esm', target='es2
     Returns:
         dict: {'success': bool, 'output': str, 'error': str}
     """
+    # 상주 esbuild 서비스가 있으면 먼저 사용합니다. (증분 빌드, 프로세스 생성 비용 없음)
+    service_result = build_with_service(ts_file_path, output_path, format=format, target=target, sourcemap=sourcemap)
+    if service_result is not None:
+        return service_result
+
     try:
         # 1. npx 실행 파일의 전체 경로를 찾습니다.
         npx_path = shutil.which('npx')
@@ -358,7 +371,7 @@ def build_with_esbuild(ts_file_path, output_path=None, format='esm', target='es2
             shell=False
         )
 
-        print(result)
+        print(f"esbuild 종료 코드: {result.returncode}")
         
         if result.returncode == 0:
             return {
@@ -379,6 +392,26 @@ def build_with_esbuild(ts_file_path, output_path=None, format='esm', target='es2
 
 
 
+def rebuild_all_games(format='esm', target='es2020', sourcemap='inline'):
+    """
+    BASE_PUBLIC_DIR 아래 모든 게임의 game.ts 를 다시 빌드합니다. (공용 템플릿 변경 후 사용)
+    esbuild 서비스가 있으면 한 번의 요청으로 병렬 빌드하고, 없으면 하나씩 npx esbuild 로 빌드합니다.
+    """
+    ts_files = [str(p / "game.ts") for p in BASE_PUBLIC_DIR().iterdir() if (p / "game.ts").is_file()]
+
+    results = build_many_with_service(ts_files, format=format, target=target, sourcemap=sourcemap)
+    if results is None:
+        results = [build_with_esbuild(p, format=format, target=target, sourcemap=sourcemap) for p in ts_files]
+
+    failed = [(p, r) for p, r in zip(ts_files, results) if not r.get('success')]
+    print(f"✅ 전체 빌드 완료: {len(ts_files) - len(failed)}/{len(ts_files)}개 성공")
+    for p, r in failed:
+        print(f"❌ {p}\n{r.get('error', '')}")
+    return results
+
+
+
+
 #CONFIG_FILE_NAME = "tsconfig.json"
 #CONFIG_CODE_PATH = BASE_DIR / CONFIG_FILE_NAME
 
@@ -388,13 +421,27 @@ def check_typescript_compile_error(file_path:Path):
 
     #analysis_result = check_typescript_errors(file_path)
     fix_file_imports(file_path)
-    analysis_result = check_typescript_errors_with_options(file_path)
 
-    build_with_esbuild(file_path)
+    # 같은 game.ts + tsconfig.json 이면 이전 결과(진단 + game.js)를 그대로 사용합니다.
+    output_path = Path(str(file_path).replace(".ts", ".js"))
+    cache_key = build_cache_key(file_path)
+    analysis_result = load_cached_build(cache_key, output_path)
+
+    if analysis_result is None:
+        analysis_result = check_typescript_errors_with_options(file_path)
+
+        build_result = build_with_esbuild(file_path)
+        if build_result['success']:
+            store_build(cache_key, analysis_result, build_result['output'])
 
+    return format_analysis_errors(analysis_result, file_path.name)
+
+
+def format_analysis_errors(analysis_result: Dict[str, Any], file_name: str) -> str:
+    """타입 검사 결과를 AI 에게 전달할 오류 메시지로 변환합니다. 오류가 없으면 빈 문자열."""
     print("\n--- 검사 결과 ---")
     if not analysis_result['success']:
-        print(f"🚨 파일 ({file_path.name}) 오류가 발견되었습니다.")
+        print(f"🚨 파일 ({file_name}) 오류가 발견되었습니다.")
         error_message = analysis_result['stdout']
         parts = error_message.split('\n')
 
@@ -405,7 +452,7 @@ def check_typescript_compile_error(file_path:Path):
         # 'parts'는 나눠진 오류 문자열들의 리스트라고 가정합니다.
         for p in parts:
             # 2. 함수를 호출하고 그 결과를 변수에 저장합니다.
-            formatted_p = format_error_message_simplified(p, file_path.name)
+            formatted_p = format_error_message_simplified(p, file_name)
             
             # 3. 리스트에 결과를 추가합니다.
             formatted_messages.append(formatted_p)    
@@ -416,11 +463,48 @@ def check_typescript_compile_error(file_path:Path):
         multi_line_string = "\n".join(formatted_messages)
         return multi_line_string
     else:
-        print(f"✅ 파일 game.ts에 오류가 없습니다.")
+        print(f"✅ 파일 {file_name}에 오류가 없습니다.")
         # 정상적인 경우 출력은 보통 비어있습니다.
         # print(analysis_result['stdout'])
         return ""
-    
+
+
+CANDIDATES_DIRNAME = "_candidates"
+
+
+def check_typescript_candidate(game_dir: Path, candidate_id: str, game_code: str) -> str:
+    """
+    후보 코드를 GAME_DIR/_candidates/<candidate_id>/game.ts 에 써서 타입 검사만 합니다. (esbuild 빌드 없음)
+    후보 폴더의 tsconfig.json 은 게임 폴더의 tsconfig.json 을 extends 하므로 같은 옵션으로 검사됩니다.
+    검사가 끝나면 후보 폴더를 직접 지웁니다. (호출한 작업이 취소되어도 이 스레드는 끝까지 돌기 때문)
+
+    Returns:
+        str: AI 에게 전달할 오류 메시지 (오류가 없으면 빈 문자열)
+    """
+    candidates_root = Path(game_dir) / CANDIDATES_DIRNAME
+    candidate_dir = candidates_root / candidate_id
+    candidate_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        base_config = Path(os.path.relpath(Path(game_dir) / "tsconfig.json", candidate_dir)).as_posix()
+        with open(candidate_dir / "tsconfig.json", 'w', encoding='utf-8') as f:
+            json.dump({"extends": base_config, "include": ["./game.ts"]}, f, indent=2)
+
+        ts_file = candidate_dir / "game.ts"
+        with open(ts_file, 'w', encoding='utf-8') as f:
+            f.write(game_code)
+        fix_file_imports(ts_file)
+
+        return format_analysis_errors(check_typescript_errors_with_options(str(ts_file)), ts_file.name)
+    finally:
+        shutil.rmtree(candidate_dir, ignore_errors=True)
+        # 비어 있게 된 상위 폴더(라운드, _candidates)도 지웁니다. 다른 후보가 아직 쓰고 있으면 그대로 둡니다.
+        for parent in candidate_dir.parents:
+            if parent == Path(game_dir):
+                break
+            try:
+                parent.rmdir()
+            except OSError:
+                break
 
 
 
@@ -441,3 +525,12 @@ def check_typescript_compile_error(file_path:Path):
 
 #check_typescript_compile_error(Path(BASE_PUBLIC_DIR()) / "sy_vampire_survivors" / "game.ts")
 #check_typescript_compile_error(Path(BASE_PUBLIC_DIR()) / "sy_scifi_snake" / "game.ts")
+
+
+
+# 공용 템플릿을 바꾼 뒤 모든 게임 다시 빌드: python tsc.py rebuild-all
+if __name__ == "__main__":
+    if sys.argv[1:] == ["rebuild-all"]:
+        rebuild_all_games()
+    else:
+        print("사용법: python tsc.py rebuild-all")
@@ -0,0 +1,257 @@
+import atexit
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from base_dir import BASE_PUBLIC_DIR
+
+load_dotenv()
+
+# 상주 tsserver 를 사용할지 여부 (False 면 항상 기존 npx tsc 경로 사용)
+TSC_DAEMON_ENABLED = os.getenv('TSC_DAEMON', 'True') == 'True'
+# 동시에 띄워 둘 tsserver 프로세스 수
+TSC_DAEMON_POOL_SIZE = int(os.getenv('TSC_DAEMON_POOL_SIZE', '2'))
+# 요청 하나당 최대 대기 시간(초). 첫 요청은 lib.d.ts / three.js 타입 로딩 때문에 오래 걸립니다.
+TSC_DAEMON_TIMEOUT = float(os.getenv('TSC_DAEMON_TIMEOUT', '60'))
+TSC_DAEMON_PING_TIMEOUT = 5
+
+
+def find_tsserver() -> Optional[str]:
+    """
+    tsserver.js 경로를 찾습니다.
+    1) 환경 변수 TSSERVER_PATH  2) 게임 폴더 기준 node_modules  3) 전역 npm 설치 (Dockerfile 의 npm install -g typescript)
+    """
+    env_path = os.getenv('TSSERVER_PATH')
+    if env_path and os.path.exists(env_path):
+        return env_path
+
+    node = shutil.which('node')
+    if not node:
+        return None
+
+    try:
+        result = subprocess.run(
+            [node, '-p', "require.resolve('typescript/lib/tsserver.js')"],
+            cwd=BASE_PUBLIC_DIR() if BASE_PUBLIC_DIR().exists() else None,
+            capture_output=True, text=True, timeout=10
+        )
+        if result.returncode == 0 and os.path.exists(result.stdout.strip()):
+            return result.stdout.strip()
+    except Exception:
+        pass
+
+    npm = shutil.which('npm')
+    if npm:
+        try:
+            result = subprocess.run([npm, 'root', '-g'], capture_output=True, text=True, timeout=10)
+            candidate = Path(result.stdout.strip()) / "typescript" / "lib" / "tsserver.js"
+            if candidate.exists():
+                return str(candidate)
+        except Exception:
+            pass
+
+    return None
+
+
+class TsServerWorker:
+    """tsserver 프로세스 하나를 감싸고, JSON 프로토콜로 요청/응답을 주고받습니다."""
+
+    def __init__(self, tsserver_path: str):
+        self.tsserver_path = tsserver_path
+        self.process: Optional[subprocess.Popen] = None
+        self._seq = 0
+        self._responses: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self.start()
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [shutil.which('node') or 'node', self.tsserver_path, '--disableAutomaticTypingAcquisition'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._responses = queue.Queue()
+        threading.Thread(target=self._read_loop, args=(self.process, self._responses), daemon=True).start()
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    @staticmethod
+    def _read_loop(process: subprocess.Popen, responses: "queue.Queue[Dict[str, Any]]"):
+        # tsserver 출력 형식: "Content-Length: N\r\n\r\n{json}\n"
+        stdout = process.stdout
+        while True:
+            header = stdout.readline()
+            if not header:
+                break
+            header = header.strip()
+            if not header.startswith(b'Content-Length:'):
+                continue
+            length = int(header.split(b':', 1)[1])
+            stdout.readline()  # 빈 줄
+            body = stdout.read(length)
+            try:
+                message = json.loads(body)
+            except json.JSONDecodeError:
+                continue
+            if message.get('type') == 'response':
+                responses.put(message)
+
+    def request(self, command: str, arguments: Dict[str, Any], timeout: float = TSC_DAEMON_TIMEOUT) -> Dict[str, Any]:
+        self._seq += 1
+        seq = self._seq
+        payload = {"seq": seq, "type": "request", "command": command, "arguments": arguments}
+        self.process.stdin.write((json.dumps(payload) + "\n").encode('utf-8'))
+        self.process.stdin.flush()
+
+        while True:
+            message = self._responses.get(timeout=timeout)
+            if message.get('request_seq') == seq:
+                if not message.get('success', False):
+                    raise RuntimeError(message.get('message', f"tsserver {command} 실패"))
+                return message
+
+    def ping(self) -> bool:
+        """헬스 체크: 빈 updateOpen 요청에 응답하는지 확인합니다."""
+        if not self.is_alive():
+            return False
+        try:
+            self.request("updateOpen", {"openFiles": [], "closedFiles": []}, timeout=TSC_DAEMON_PING_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    def diagnostics(self, ts_file_path: str) -> List[Dict[str, Any]]:
+        file = os.path.abspath(ts_file_path)
+        with open(file, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        self.request("updateOpen", {
+            "openFiles": [{"file": file, "fileContent": content, "projectRootPath": os.path.dirname(file)}],
+            "closedFiles": []
+        })
+        try:
+            syntactic = self.request("syntacticDiagnosticsSync", {"file": file, "includeLinePosition": False})
+            semantic = self.request("semanticDiagnosticsSync", {"file": file, "includeLinePosition": False})
+        finally:
+            # 열어 둔 파일을 닫아야 다음 요청에서 디스크의 최신 내용과 섞이지 않습니다.
+            self.request("updateOpen", {"openFiles": [], "closedFiles": [file]})
+
+        return (syntactic.get('body') or []) + (semantic.get('body') or [])
+
+
+def format_diagnostics(ts_file_path: str, diagnostics: List[Dict[str, Any]]) -> str:
+    """tsserver 진단 결과를 tsc 출력 형식(game.ts(줄,열): error TSxxxx: 메시지)으로 변환합니다."""
+    name = os.path.basename(ts_file_path)
+    lines = []
+    for d in diagnostics:
+        if d.get('category', 'error') != 'error':
+            continue
+        start = d.get('start', {})
+        lines.append(f"{name}({start.get('line', 0)},{start.get('offset', 0)}): error TS{d.get('code', 0)}: {d.get('text', '')}")
+    return "\n".join(lines)
+
+
+class TsServerPool:
+    """tsserver 워커 풀. 비어 있는 워커를 하나 꺼내 요청을 처리하고 다시 돌려놓습니다."""
+
+    def __init__(self, tsserver_path: str, size: int):
+        self._workers: "queue.Queue[TsServerWorker]" = queue.Queue()
+        self._all: List[TsServerWorker] = []
+        for _ in range(size):
+            worker = TsServerWorker(tsserver_path)
+            self._all.append(worker)
+            self._workers.put(worker)
+
+    def check(self, ts_file_path: str) -> Dict[str, Any]:
+        worker = self._workers.get()
+        try:
+            if not worker.ping():
+                print("⚠️ tsserver 응답 없음. 재시작합니다.")
+                worker.restart()
+            diagnostics = worker.diagnostics(ts_file_path)
+        except Exception:
+            # 요청 도중 실패한 워커는 상태를 알 수 없으므로 재시작해 둡니다.
+            worker.restart()
+            raise
+        finally:
+            self._workers.put(worker)
+
+        stdout = format_diagnostics(ts_file_path, diagnostics)
+        return {
+            'success': stdout == "",
+            'return_code': 0 if stdout == "" else 2,
+            'stdout': stdout,
+            'stderr': ''
+        }
+
+    def health(self) -> Dict[str, Any]:
+        alive = sum(1 for w in self._all if w.is_alive())
+        return {"workers": len(self._all), "alive": alive}
+
+    def shutdown(self):
+        for worker in self._all:
+            worker.stop()
+
+
+_pool: Optional[TsServerPool] = None
+_pool_lock = threading.Lock()
+_pool_unavailable = False
+
+
+def get_pool() -> Optional[TsServerPool]:
+    """tsserver 풀을 (처음 한 번) 생성해 반환합니다. 사용할 수 없으면 None."""
+    global _pool, _pool_unavailable
+    if not TSC_DAEMON_ENABLED or _pool_unavailable:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            tsserver_path = find_tsserver()
+            if not tsserver_path:
+                print("⚠️ tsserver 를 찾을 수 없어 npx tsc 로 검사합니다.")
+                _pool_unavailable = True
+                return None
+            _pool = TsServerPool(tsserver_path, TSC_DAEMON_POOL_SIZE)
+            atexit.register(_pool.shutdown)
+            print(f"✅ tsserver 풀 시작 ({TSC_DAEMON_POOL_SIZE}개): {tsserver_path}")
+        return _pool
+
+
+def check_with_daemon(ts_file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    상주 tsserver 로 타입 검사를 합니다.
+    데몬을 사용할 수 없거나 실패하면 None 을 반환하므로, 호출자는 기존 subprocess 경로로 넘어가면 됩니다.
+    """
+    pool = get_pool()
+    if pool is None:
+        return None
+    try:
+        return pool.check(ts_file_path)
+    except Exception as e:
+        print(f"⚠️ tsserver 검사 실패, npx tsc 로 대체합니다: {e}")
+        return None
+
+
+def daemon_health() -> Dict[str, Any]:
+    """tsserver 풀 상태 (헬스 체크 엔드포인트용)."""
+    if not TSC_DAEMON_ENABLED:
+        return {"enabled": False}
+    if _pool is None:
+        return {"enabled": True, "started": False, "available": not _pool_unavailable}
+    return {"enabled": True, "started": True, **_pool.health()}